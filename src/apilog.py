@@ -0,0 +1,212 @@
+"""
+SAEF API audit log.
+
+Structured log of the Dataverse API operations of SAEFDataset (create, upload, finalize,
+metadata, lock waits). Each event is one JSON line: time, process, thread, object_osn,
+pid, function, operation, status (HTTP status code, or a short text), latency (seconds),
+bytes and message.
+
+Callers never write to the file: an event is put on a queue by a QueueHandler and a
+single background thread (QueueListener) formats it and writes it to a rotating file.
+Upload threads therefore only pay for a queue put. Processes share the log through the
+queue of the writing process (see APILog.get_queue and attach).
+
+The log uses its own logger (saef.api), which does not propagate to the root logger.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+LOGGER_NAME = 'saef.api'
+
+# audit fields, in the order they are written
+FIELDS = ['object_osn', 'pid', 'function', 'operation', 'status', 'latency', 'bytes', 'message']
+
+class JSONLinesFormatter(logging.Formatter):
+    """
+    Format an audit event as a JSON line.
+    """
+    def format(self, record):
+        entry = {'time':datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                 'process':record.process, 'thread':record.threadName}
+        audit = getattr(record, 'audit', {})
+        for field in FIELDS:
+            entry[field] = audit.get(field)
+        entry['message'] = record.getMessage()
+        return json.dumps(entry, default=str)
+
+class _AuditQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that enqueues the record as is: formatting is left to the writer thread.
+    """
+    def prepare(self, record):
+        # the audit fields and message are plain values, so the record is picklable
+        # for a multiprocessing queue without being formatted first
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+class APILog:
+    """
+    Queue-backed JSON-lines audit log with rotation.
+
+    Methods
+    -------
+    open : str, int, int, context
+        Start writing the audit events to a file.
+    attach : queue
+        Send the audit events of this process to the queue of another process's log.
+    get_queue : void
+        Get the queue that the audit events are sent to.
+    close : void
+        Write the queued events and stop.
+    is_open : void
+        Get the status of the log.
+    """
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        self._logger = logging.getLogger(LOGGER_NAME)
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._handler = None
+        self._listener = None
+        # process that runs the listener; a forked child inherits it but must not stop it
+        self._owner = None
+
+    def open(self, filename, max_bytes=100 * 1024 * 1024, backup_count=10, context=None):
+        """
+        Start writing the audit events to a file (appended to).
+
+        Parameters
+        ----------
+        filename : str
+        max_bytes : int, optional
+            Size at which the file is rotated, 0 to never rotate (default: 100 MB).
+        backup_count : int, optional
+            Number of rotated files kept: filename.1 ... filename.N (default: 10).
+        context : multiprocessing context, optional
+            Use a queue of this context (e.g. multiprocessing.get_context('spawn')), that worker
+            processes of the same context can attach to (default: None, threads only).
+            Prefer spawn: forking a process whose writer thread is running can deadlock.
+
+        Catches
+        -------
+        File exceptions
+
+        Return
+        ------
+        bool
+        """
+        try:
+            writer = logging.handlers.RotatingFileHandler(filename, mode='a', maxBytes=max_bytes,
+                                                          backupCount=backup_count, encoding='utf-8')
+        except OSError as e:
+            print('APILog::open: Error - {}'.format(e))
+            return False
+        writer.setFormatter(JSONLinesFormatter())
+        self.close()
+        with self._lock:
+            self._queue = context.Queue() if (context != None) else queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self._queue, writer)
+            self._listener.start()
+            self._owner = os.getpid()
+            self.__set_handler(_AuditQueueHandler(self._queue))
+        return True
+
+    def attach(self, log_queue):
+        """
+        Send the audit events of this process to the queue of another process's log
+        (opened with a multiprocessing context), e.g. in a worker process.
+
+        Parameters
+        ----------
+        log_queue : multiprocessing.Queue
+        """
+        self.close()
+        with self._lock:
+            self._queue = log_queue
+            self.__set_handler(_AuditQueueHandler(log_queue))
+
+    def get_queue(self):
+        """
+        Get the queue that the audit events are sent to, if open.
+
+        Return
+        ------
+        queue
+        """
+        return self._queue
+
+    def close(self):
+        """
+        Write the queued events and stop.
+        """
+        with self._lock:
+            if (self._handler != None):
+                self._logger.removeHandler(self._handler)
+                self._handler = None
+            if (self._listener != None) and (self._owner == os.getpid()):
+                # the listener writes the remaining events before it stops
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+            self._listener = None
+            self._owner = None
+            self._queue = None
+
+    def is_open(self):
+        """
+        Get the status of the log.
+
+        Return
+        ------
+        bool
+        """
+        return (self._handler != None)
+
+    def log(self, message, **fields):
+        """
+        Queue an audit event.
+
+        Parameters
+        ----------
+        message : str
+        fields : optional
+            Audit fields (see FIELDS).
+        """
+        if (self._handler != None):
+            self._logger.info(message, extra={'audit':fields})
+
+    def __set_handler(self, handler):
+        """
+        Private: Route the logger to a handler.
+        """
+        self._handler = handler
+        self._logger.addHandler(handler)
+
+# shared log used by SAEFDataset
+_default_log = APILog()
+atexit.register(_default_log.close)
+
+def default_log():
+    """
+    Get the shared audit log that SAEFDataset writes to.
+    """
+    return _default_log
+
+def log(message, **fields):
+    """
+    Queue an audit event in the shared log (see APILog.log).
+    """
+    _default_log.log(message, **fields)
+
+# end file
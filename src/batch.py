@@ -0,0 +1,486 @@
+"""
+SAEF Batch Ingest
+
+Pipelined ingest of a SAEF inventory into a Dataverse collection.
+Each digital object passes through four stages: preparation (SAEFDigitalObject and
+SAEFDataset), dataset creation, file upload (datafiles and relationship files) and
+custom metadata update. Every stage has its own pool of worker threads, so the stages
+overlap: while one object's files upload, the next object's dataset is being created.
+The number of objects in the pipeline at any time is bounded, which keeps memory flat.
+With a journal, progress is recorded as it happens and a re-run skips completed work.
+Phase timings and byte/request counters (see metrics.py) can be exported when the run
+ends, and a progress readout with an ETA can be printed while it runs. With validation,
+the whole inventory is checked before any request is made and objects with errors are
+not ingested (see saef.SAEFInventoryValidation).
+
+Usage: python batch.py <config.ini> [--api-key KEY] [--journal FILE] [--max-in-flight N] [--progress SECONDS] [--validate] ...
+"""
+
+import apilog # local: api audit log
+import argparse
+import columnar # local: parquet i/o
+from concurrent.futures import ThreadPoolExecutor
+import dvclient # local: pooled dataverse http client
+import dvlocks # local: dataset lock waits
+import journal # local: ingest journal
+import lcd # local: library collections as data module
+import metrics # local: saef metrics
+import os
+import saef # local: saef classes
+import threading
+
+class SAEFBatch:
+    """
+    Staged, pipelined batch runner for a SAEF project inventory.
+
+    Methods
+    -------
+    initialize : SAEFProjectConfig, str
+        Initialize the batch from a project configuration.
+    run : void
+        Ingest every digital object in the inventory.
+    get_results : void
+        Get the per-object results of the last run.
+    initd : void
+        Get the initialization status of the instance.
+    """
+
+    # pipeline stages, in order
+    STAGES = ['prepare', 'create', 'upload', 'metadata']
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        # project configuration
+        self._config = None
+        # pooled http client
+        self._client = None
+        # api used by SAEFDataset (pyDataverse api or the client itself)
+        self._api = None
+        # number of worker threads per stage
+        self._workers = {'prepare':2, 'create':2, 'upload':4, 'metadata':2}
+        # number of concurrent file uploads per dataset
+        self._file_workers = 4
+        # maximum number of objects in the pipeline
+        self._max_in_flight = 16
+        # ingest journal (SAEFJournal), if any
+        self._journal = None
+        # one lock poller shared by every dataset
+        self._lock_watcher = None
+        # seconds between two progress readouts (None: no readout)
+        self._progress_interval = None
+        # validate the inventory before the run?
+        self._validate = False
+        # validation report file, if any
+        self._validation_report = None
+        # per-object results keyed by object_osn
+        self._results = {}
+        # guards self._results
+        self._lock = threading.Lock()
+        # is instance initialized?
+        self._initd = False
+
+    def initialize(self, saef_project_config, api_key=None, api=None, max_in_flight=16, workers=None,
+                   file_workers=4, journal_filename=None, throttles=None, progress_interval=None,
+                   validate=False, validation_report=None):
+        """
+        Initialize the batch from a project configuration.
+
+        Parameters
+        ----------
+        saef_project_config : SAEFProjectConfig
+            Initialized project configuration.
+        api_key : str, optional
+            Dataverse API key; defaults to the dataverse_api_key option.
+        api : pyDataverse api, optional
+            Defaults to the batch's DataverseClient, which provides base_url and api_token.
+        max_in_flight : int, optional
+            Maximum number of objects in the pipeline (default: 16).
+        workers : dict, optional
+            Worker threads per stage, e.g. {'upload':8}; see SAEFBatch.STAGES.
+        file_workers : int, optional
+            Concurrent file uploads within one dataset (default: 4).
+        journal_filename : str, optional
+            Ingest journal (SQLite) file; created if missing. Objects completed in an
+            earlier run are skipped, partially ingested objects are resumed.
+        throttles : dict, optional
+            dvclient.Throttle options per endpoint class, e.g. {'api':{'rate':10}, 'storage':{'max_concurrency':16}}.
+            By default both classes adapt their concurrency (up to the connection pool size) to 429/503 responses.
+        progress_interval : float, optional
+            Print a progress readout (objects done, files and bytes uploaded, rate, ETA)
+            every progress_interval seconds during run (default: no readout).
+        validate : bool, optional
+            Validate every object in the inventory before any request is made; objects
+            with errors are not ingested and get their violations as error (default: False).
+        validation_report : str, optional
+            Write the per-object validation report to this CSV or Parquet file (implies validate).
+
+        Return
+        ------
+        bool
+        """
+        if ((saef_project_config == None) or
+            (saef_project_config.initd() == False)):
+            print('SAEFBatch::initialize: Error - project configuration must be initialized')
+            return False
+        options = saef_project_config.get_options()
+        installation_url = options.get('dataverse').get('dataverse_installation_url')
+        if (not api_key):
+            api_key = options.get('dataverse').get('dataverse_api_key')
+        if ((not installation_url) or (not api_key)):
+            print('SAEFBatch::initialize: Error - installation url and api key are required')
+            return False
+
+        # set the stage options
+        if (workers):
+            for stage in workers.keys():
+                if stage not in self.STAGES:
+                    print('SAEFBatch::initialize: Error - invalid stage: {}'.format(stage))
+                    return False
+                self._workers[stage] = max(1, workers.get(stage))
+        self._max_in_flight = max(1, max_in_flight)
+        self._file_workers = max(1, file_workers)
+        self._progress_interval = progress_interval
+        self._validate = (validate == True) or bool(validation_report)
+        self._validation_report = validation_report
+
+        # open the journal
+        if (journal_filename):
+            self._journal = journal.SAEFJournal()
+            if (self._journal.open(journal_filename) == False):
+                print('SAEFBatch::initialize: Error - failed to open journal: {}'.format(journal_filename))
+                self._journal = None
+                return False
+
+        # the connection pool must serve every concurrent upload
+        pool_size = self._workers.get('upload') * self._file_workers + self._workers.get('create') + self._workers.get('metadata')
+        limits = {'api':{'max_concurrency':pool_size}, 'storage':{'max_concurrency':pool_size}}
+        for endpoint in (throttles if throttles else {}).keys():
+            if endpoint not in limits:
+                print('SAEFBatch::initialize: Error - invalid endpoint class: {}'.format(endpoint))
+                return False
+            limits[endpoint].update(throttles.get(endpoint))
+        self._client = dvclient.DataverseClient(installation_url, api_key, pool_size=pool_size,
+                                                api_throttle=dvclient.Throttle(**limits.get('api')),
+                                                storage_throttle=dvclient.Throttle(**limits.get('storage')))
+        self._api = api if api else self._client
+        self._lock_watcher = dvlocks.DatasetLockWatcher(installation_url, api_key, client=self._client)
+        self._config = saef_project_config
+
+        # relationship files are written here before upload
+        directory = options.get('digital_object').get('digital_object_relationships_directory')
+        if (directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self._initd = True
+        return True
+
+    def __set_result(self, osn, stage, status, error=None, pid=None):
+        """
+        Private: Record the last stage reached by an object.
+        """
+        with self._lock:
+            result = self._results.setdefault(osn, {'stage':None, 'status':None, 'error':None, 'dataset_pid':None})
+            result['stage'] = stage
+            result['status'] = status
+            result['error'] = error
+            if (pid):
+                result['dataset_pid'] = pid
+
+    def __validate(self, inventory_filename):
+        """
+        Private: Validate every object in the inventory before any request is made.
+
+        Return
+        ------
+        dict
+            object_osn -> violations, for each object with errors.
+        """
+        # only the fields validated, not the whole inventory
+        try:
+            columns = columnar.read_columns(inventory_filename)
+            columns = [field for field in saef.SAEFInventoryValidation.FIELDS if field in columns]
+            inventory_df = columnar.read_table(inventory_filename, columns=columns)
+        except (OSError, ValueError, ImportError) as e:
+            print('SAEFBatch::run: Error - failed to read inventory for validation: {} {}'.format(inventory_filename, e))
+            return {}
+        validation = saef.SAEFInventoryValidation()
+        if (validation.from_dataframe(inventory_df) == False):
+            return {}
+        if (self._validation_report):
+            validation.write_report(self._validation_report)
+        report = validation.get_report()
+        invalid = report[report['valid'] == False]
+        print('SAEFBatch::run: {} of {} objects failed validation'.format(len(invalid), len(report)))
+        return dict(zip(invalid['object_osn'], invalid['violations']))
+
+    def __prepare(self, osn, files_df):
+        """
+        Private: Stage 1 - build the SAEFDigitalObject and SAEFDataset.
+
+        Return
+        ------
+        SAEFDataset
+            None on failure.
+        """
+        saefdo = saef.SAEFDigitalObject()
+        if (saefdo.from_dataframe(files_df) == False):
+            self.__set_result(osn, 'prepare', False, 'failed to create SAEFDigitalObject')
+            return None
+        dataset = saef.SAEFDataset()
+        try:
+            dataset.initialize(saefdo, self._config)
+        except TypeError as e:
+            self.__set_result(osn, 'prepare', False, str(e))
+            return None
+        dataset.set_journal(self._journal)
+        dataset.set_lock_watcher(self._lock_watcher)
+        self.__set_result(osn, 'prepare', True)
+        return dataset
+
+    def __create(self, osn, dataset):
+        """
+        Private: Stage 2 - create the Dataverse dataset.
+
+        Return
+        ------
+        bool
+        """
+        if (dataset.create(self._api, client=self._client) == False):
+            self.__set_result(osn, 'create', False, 'failed to create dataset')
+            return False
+        self.__set_result(osn, 'create', True, pid=dataset.get_dataset_pid())
+        return True
+
+    def __upload(self, osn, dataset):
+        """
+        Private: Stage 3 - upload the datafiles and relationship files.
+
+        Return
+        ------
+        bool
+        """
+        if (dataset.direct_upload_datafiles(self._api, max_workers=self._file_workers, client=self._client) == False):
+            self.__set_result(osn, 'upload', False, 'failed to upload datafiles')
+            return False
+        if (dataset.direct_upload_relationships(self._api, client=self._client) == False):
+            self.__set_result(osn, 'upload', False, 'failed to upload relationship files')
+            return False
+        self.__set_result(osn, 'upload', True)
+        return True
+
+    def __update_metadata(self, osn, dataset):
+        """
+        Private: Stage 4 - update the custom SAEF metadata block.
+
+        Return
+        ------
+        bool
+        """
+        custom_md = dataset.get_dataset_metadata().get('dataset').get('customSAEF')
+        if (dataset.upload_saef_metadata(self._api, custom_md, client=self._client) == False):
+            self.__set_result(osn, 'metadata', False, 'failed to update custom metadata')
+            return False
+        self.__set_result(osn, 'metadata', True)
+        return True
+
+    def run(self):
+        """
+        Ingest every digital object in the inventory.
+        Objects are read from the inventory file as a stream and handed from
+        stage to stage; a stage failure stops that object only.
+
+        Return
+        ------
+        bool
+            True if every object completed all stages.
+        """
+        if (self._initd == False):
+            return False
+        self._results = {}
+        inventory_filename = self._config.get_options().get('inventory').get('inventory_filename')
+
+        # objects with validation errors are not ingested
+        invalid = {}
+        if (self._validate == True):
+            invalid = self.__validate(inventory_filename)
+
+        # one pool per stage
+        pools = {}
+        for stage in self.STAGES:
+            pools[stage] = ThreadPoolExecutor(max_workers=self._workers.get(stage), thread_name_prefix='saef-' + stage)
+        # bounds the number of objects in the pipeline
+        slots = threading.BoundedSemaphore(self._max_in_flight)
+
+        # progress readout; the total is counted from the object_osn column only
+        progress = None
+        if (self._progress_interval):
+            total = columnar.read_table(inventory_filename, columns=['object_osn'])['object_osn'].nunique()
+            progress = metrics.Progress(total, interval=self._progress_interval)
+            progress.start()
+
+        def leave():
+            # an object leaves the pipeline
+            slots.release()
+            if (progress != None):
+                progress.advance()
+
+        def run_stage(stage, osn, dataset):
+            # run one stage and hand the object to the next one, or release its slot
+            try:
+                if (stage == 'create'):
+                    status = self.__create(osn, dataset)
+                elif (stage == 'upload'):
+                    status = self.__upload(osn, dataset)
+                else:
+                    status = self.__update_metadata(osn, dataset)
+            except Exception as e:
+                self.__set_result(osn, stage, False, str(e))
+                status = False
+            index = self.STAGES.index(stage)
+            if (status == True) and (index + 1 < len(self.STAGES)):
+                pools[self.STAGES[index + 1]].submit(run_stage, self.STAGES[index + 1], osn, dataset)
+            else:
+                leave()
+
+        def prepare(osn, files_df):
+            try:
+                dataset = self.__prepare(osn, files_df)
+            except Exception as e:
+                self.__set_result(osn, 'prepare', False, str(e))
+                dataset = None
+            if (dataset == None):
+                leave()
+            else:
+                pools['create'].submit(run_stage, 'create', osn, dataset)
+
+        # feed the pipeline; blocks while max_in_flight objects are being processed
+        fi = lcd.FileInventory()
+        for osn, files_df in fi.stream_objects(inventory_filename):
+            # completed in an earlier run
+            if (self._journal != None) and (self._journal.object_completed(osn)):
+                self.__set_result(osn, 'journal', True, pid=self._journal.get_object(osn).get('dataset_pid'))
+                if (progress != None):
+                    progress.advance()
+                continue
+            # failed validation
+            if osn in invalid:
+                self.__set_result(osn, 'validate', False, invalid.get(osn))
+                if (progress != None):
+                    progress.advance()
+                continue
+            slots.acquire()
+            pools['prepare'].submit(prepare, osn, files_df)
+
+        # wait until every object has left the pipeline
+        for i in range(self._max_in_flight):
+            slots.acquire()
+        for stage in self.STAGES:
+            pools[stage].shutdown(wait=True)
+        self._lock_watcher.stop()
+        if (progress != None):
+            progress.stop()
+
+        failed = [osn for osn in self._results.keys() if self._results[osn].get('status') == False]
+        for osn in failed:
+            print('SAEFBatch::run: Error - {} failed at stage {}: {}'.format(osn, self._results[osn].get('stage'),
+                                                                          self._results[osn].get('error')))
+        return (len(failed) == 0)
+
+    def get_results(self):
+        """
+        Get the per-object results of the last run.
+
+        Return
+        ------
+        dict
+            Keyed by object_osn: stage, status, error, dataset_pid.
+        """
+        return self._results
+
+    def initd(self):
+        """
+        Get the initialization status of the instance.
+
+        Return
+        ------
+        bool
+        """
+        return self._initd
+
+def main():
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Ingest a SAEF inventory into a Dataverse collection.')
+    parser.add_argument('config', help='SAEF project .ini file')
+    parser.add_argument('--api-key', default=None, help='Dataverse API key (default: dataverse_api_key option)')
+    parser.add_argument('--journal', default=None, help='ingest journal file; a re-run skips completed work')
+    parser.add_argument('--max-in-flight', type=int, default=16, help='maximum number of objects in the pipeline')
+    parser.add_argument('--file-workers', type=int, default=4, help='concurrent file uploads per dataset')
+    for stage in SAEFBatch.STAGES:
+        parser.add_argument('--{}-workers'.format(stage), type=int, default=None,
+                            help='worker threads for the {} stage'.format(stage))
+    for endpoint in ['api', 'storage']:
+        parser.add_argument('--{}-rate'.format(endpoint), type=float, default=None,
+                            help='maximum {} requests per second'.format(endpoint))
+        parser.add_argument('--{}-concurrency'.format(endpoint), type=int, default=None,
+                            help='maximum concurrent {} requests'.format(endpoint))
+    parser.add_argument('--progress', type=float, default=None, help='print a progress readout every N seconds')
+    parser.add_argument('--validate', action='store_true', help='validate the inventory first; objects with errors are not ingested')
+    parser.add_argument('--validation-report', default=None, help='write the per-object validation report to this file (implies --validate)')
+    parser.add_argument('--metrics-json', default=None, help='write the phase timings and counters to this JSON file')
+    parser.add_argument('--metrics-prom', default=None, help='write the phase timings and counters to this Prometheus textfile')
+    parser.add_argument('--metrics-records', default=None, help='append one JSON line per timed span to this file')
+    args = parser.parse_args()
+
+    config = saef.SAEFProjectConfig()
+    try:
+        config.read_ini(args.config)
+    except ValueError as e:
+        print(e)
+        return 1
+    config.initialize_dataverse_api_log()
+
+    workers = {}
+    for stage in SAEFBatch.STAGES:
+        value = getattr(args, '{}_workers'.format(stage))
+        if (value):
+            workers[stage] = value
+
+    throttles = {}
+    for endpoint in ['api', 'storage']:
+        throttles[endpoint] = {}
+        if (getattr(args, '{}_rate'.format(endpoint))):
+            throttles[endpoint]['rate'] = getattr(args, '{}_rate'.format(endpoint))
+        if (getattr(args, '{}_concurrency'.format(endpoint))):
+            throttles[endpoint]['max_concurrency'] = getattr(args, '{}_concurrency'.format(endpoint))
+
+    registry = metrics.default_metrics()
+    if (args.metrics_records) and (registry.open_records(args.metrics_records) == False):
+        return 1
+    batch = SAEFBatch()
+    if (batch.initialize(config, api_key=args.api_key, max_in_flight=args.max_in_flight, workers=workers,
+                         file_workers=args.file_workers, journal_filename=args.journal, throttles=throttles,
+                         progress_interval=args.progress, validate=args.validate,
+                         validation_report=args.validation_report) == False):
+        return 1
+    try:
+        status = batch.run()
+    finally:
+        registry.close_records()
+        if (args.metrics_json):
+            registry.write_json(args.metrics_json)
+        if (args.metrics_prom):
+            registry.write_prometheus(args.metrics_prom)
+        apilog.default_log().close()
+    results = batch.get_results()
+    completed = len([osn for osn in results.keys() if results[osn].get('status') == True])
+    print('SAEFBatch: {} of {} objects completed'.format(completed, len(results)))
+    return 0 if status else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
+
+# end file
@@ -0,0 +1,558 @@
+"""
+SAEF Benchmark
+
+Two benchmark suites, run without a live installation or API key:
+
+upload
+    Measure ingest performance against an in-process mock Dataverse (see mockdv.py).
+    The objects of a SAEF inventory (by default the test inventory) are replicated,
+    then each phase is timed and its requests counted: dataset creation,
+    direct_upload_datafiles, direct_upload_relationships and SAEFCollection.initialize.
+    Latency, bandwidth, errors and locks can be injected.
+    With --check, the datasets are also published and the outcome is checked against the
+    mock (see check_upload), with 5% of API requests and storage PUTs answered 503 unless
+    other error rates are given; the exit status is 1 if a check fails.
+inventory
+    Measure the inventory and object-building layer on a synthetic inventory
+    (see synthetic.py) or a given one: loading, grouping, streaming, validation,
+    relationship generation and metadata building are timed and their peak memory traced.
+
+Results can be appended to a JSON-lines history file; each run is then compared with
+the last run of the same benchmark and settings, e.g. on an earlier revision.
+
+Usage: python benchmark.py upload [--copies N] [--latency S] [--bandwidth B] [--results history.jsonl] ...
+       python benchmark.py upload --check [--error-rate R] [--storage-error-rate R] [--seed N]
+       python benchmark.py inventory [--objects N] [--pages N] [--sample N] [--results history.jsonl] ...
+"""
+
+import argparse
+import collection # local: saef collection
+import columnar # local: parquet i/o
+import contextlib
+import datetime
+import dvclient # local: pooled dataverse http client
+import dvlocks # local: dataset locks
+import itertools
+import json
+import lcd # local: library collection as data classes
+import mockdv # local: mock dataverse
+import os
+import pandas as pd
+from pyDataverse.api import NativeApi
+import saef # local: saef classes
+import subprocess
+import synthetic # local: synthetic inventories
+import tempfile
+import time
+import tracemalloc
+
+# test inventory and data, relative to this file
+TEST_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test')
+
+# phases of each benchmark, in the order they run
+PHASES = {'upload':['create', 'direct_upload_datafiles', 'direct_upload_relationships', 'collection_initialize',
+                    'publish'],
+          'inventory':['generate', 'load', 'parquet_write', 'parquet_load', 'parquet_columns', 'group', 'stream',
+                       'validate', 'digital_object', 'views', 'relationships', 'metadata']}
+
+# error rates of an upload --check run, unless others are given
+CHECK_ERROR_RATE = 0.05
+
+# compared with the previous run of the same benchmark and settings
+COMPARED = ['seconds', 'peak_mb']
+
+CONFIG_TEMPLATE = """
+[inventory]
+inventory_filename={inventory}
+inventory_data_directory={data}
+
+[digital_object]
+digital_object_relationships_directory={relationships}
+digital_object_pds_relationships=pds_relationships.csv
+digital_object_msft_relationships=msft_relationships.csv
+digital_object_ocr_relationships=ocr_relationships.csv
+
+[dataset]
+dataset_author=SAEF Benchmark
+dataset_author_affiliation=Harvard University
+dataset_contact_name=Benchmark, SAEF
+dataset_contact_affiliation=Houghton Library
+dataset_contact_email=saef_benchmark@harvard.edu
+dataset_metadata=./
+dataset_subject='Arts and Humanities'
+
+[dataverse]
+dataverse_api_logfile={logfile}
+dataverse_collection_url=saef_benchmark
+dataverse_installation_url={url}
+dataverse_api_key={api_key}
+"""
+
+def replicate_inventory(inventory_filename, data_directory, copies, filename):
+    """
+    Write an inventory with copies of every object in inventory_filename.
+    Copies get a numbered object_osn and point at the same data files (absolute paths);
+    files that do not exist are left out.
+
+    Return
+    ------
+    tuple (int, int, int)
+        Number of objects, files and bytes in the new inventory.
+    """
+    inventory_df = pd.read_csv(inventory_filename, header=0)
+    # file paths are relative to the test directory, e.g. ./data/...
+    inventory_df['file_path'] = inventory_df['file_path'].apply(
+        lambda path: os.path.normpath(os.path.join(data_directory, '..', path)))
+    # the test inventory lists some files that are not in the repository
+    exists = inventory_df['file_path'].apply(os.path.isfile)
+    if not exists.all():
+        print('benchmark::replicate_inventory: Warning - skipping {} missing files'.format((~exists).sum()))
+        inventory_df = inventory_df[exists]
+    frames = []
+    for n in range(copies):
+        frame = inventory_df.copy()
+        frame['object_osn'] = frame['object_osn'] + '_{:04d}'.format(n)
+        frames.append(frame)
+    replicated_df = pd.concat(frames, ignore_index=True)
+    replicated_df.to_csv(filename, index=False)
+    size = sum(os.stat(path).st_size for path in replicated_df['file_path'])
+    return replicated_df['object_osn'].nunique(), len(replicated_df), size
+
+def write_config(workdir, inventory_filename, data_directory, url, api_key):
+    """
+    Write a project .ini file for a benchmark run in workdir.
+
+    Return
+    ------
+    SAEFProjectConfig
+    """
+    config_filename = os.path.join(workdir, 'config.ini')
+    with open(config_filename, 'w') as f:
+        f.write(CONFIG_TEMPLATE.format(inventory=inventory_filename, data=data_directory,
+                                       relationships=os.path.join(workdir, 'relationships'),
+                                       logfile=os.path.join(workdir, 'api_log.txt'), url=url, api_key=api_key))
+    os.makedirs(os.path.join(workdir, 'relationships'), exist_ok=True)
+    config = saef.SAEFProjectConfig()
+    config.read_ini(config_filename)
+    return config
+
+def phase_result(elapsed, files, size, stats, status):
+    """
+    Summarize one phase: seconds, files/s, MB/s and request counts.
+    """
+    return {'status':status, 'seconds':round(elapsed, 3), 'files':files, 'bytes':size,
+            'files_per_second':round(files / elapsed, 2) if elapsed > 0 else None,
+            'mb_per_second':round(size / elapsed / 1e6, 2) if elapsed > 0 else None,
+            'requests':stats.get('total_requests'), 'requests_by_endpoint':stats.get('requests'),
+            'errors_injected':stats.get('errors_injected')}
+
+def run_upload(args, workdir):
+    """
+    Run the upload benchmark in workdir.
+
+    Return
+    ------
+    dict
+        Settings and per-phase results.
+    """
+    mock = mockdv.MockDataverse(latency=args.latency, storage_latency=args.storage_latency, bandwidth=args.bandwidth,
+                                error_rate=args.error_rate, storage_error_rate=args.storage_error_rate,
+                                part_size=args.part_size, ingest_lock=args.ingest_lock, seed=args.seed)
+    url = mock.start()
+
+    # replicated inventory and a config pointing at the mock
+    data_directory = os.path.join(TEST_DIRECTORY, 'data')
+    inventory_filename = os.path.join(workdir, 'inventory.csv')
+    objects, files, size = replicate_inventory(args.inventory, data_directory, args.copies, inventory_filename)
+    config = write_config(workdir, inventory_filename, data_directory, url, mock.api_token)
+
+    api = NativeApi(url, mock.api_token)
+    client = dvclient.DataverseClient(url, mock.api_token, pool_size=args.max_workers + 1,
+                                      retry_policy=dvclient.RetryPolicy(backoff=0.1))
+    lock_watcher = dvlocks.DatasetLockWatcher(url, mock.api_token, client=client, initial_interval=0.05)
+
+    # prepare every dataset before timing
+    inventory_df = pd.read_csv(inventory_filename, header=0)
+    datasets = []
+    # object_osn, dataset and number of datafiles of each object, for the checks
+    objects_checked = []
+    for osn, files_df in inventory_df.groupby('object_osn', sort=False):
+        saefdo = saef.SAEFDigitalObject()
+        dataset = saef.SAEFDataset()
+        try:
+            if (saefdo.from_dataframe(files_df.reset_index(drop=True)) == False):
+                raise TypeError('failed to create SAEFDigitalObject')
+            dataset.initialize(saefdo, config)
+        except TypeError as e:
+            print('benchmark::run: Warning - skipping {}: {}'.format(osn, e))
+            continue
+        dataset.set_lock_watcher(lock_watcher)
+        datasets.append(dataset)
+        objects_checked.append((osn, dataset, len(saefdo.get_files())))
+
+    results = {'objects':len(datasets), 'inventory':{'objects':objects, 'files':files, 'bytes':size},
+               'phases':{}}
+    phases = [('create', lambda dataset: dataset.create(api, client=client)),
+              ('direct_upload_datafiles', lambda dataset: dataset.direct_upload_datafiles(api, max_workers=args.max_workers,
+                                                                                          client=client)),
+              ('direct_upload_relationships', lambda dataset: dataset.direct_upload_relationships(api, client=client))]
+    try:
+        for phase, function in phases:
+            mock.reset_stats()
+            started = time.perf_counter()
+            status = all([function(dataset) for dataset in datasets])
+            elapsed = time.perf_counter() - started
+            stats = mock.get_stats()
+            # files and bytes as received by the mock
+            results['phases'][phase] = phase_result(elapsed, stats.get('files_added'), stats.get('bytes_received'),
+                                                    stats, status)
+
+        # crawl the collection the datasets were created in
+        mock.reset_stats()
+        started = time.perf_counter()
+        saefc = collection.SAEFCollection()
+        status = saefc.initialize(api, 'saef_benchmark', client=client, max_workers=args.max_workers)
+        elapsed = time.perf_counter() - started
+        stats = mock.get_stats()
+        crawled = sum(len(contents.get('files').get('latestVersion').get('files'))
+                      for contents in saefc.get_collection_contents().values()) if status else 0
+        results['phases']['collection_initialize'] = phase_result(elapsed, crawled, 0, stats, status)
+
+        if args.check:
+            # publish the datasets, then check what the mock holds
+            mock.reset_stats()
+            pids = [dataset.get_dataset_pid() for dataset in datasets if dataset.get_dataset_pid()]
+            started = time.perf_counter()
+            status = saefc.publish(api, pids, os.path.join(workdir, 'publish_log.csv'), max_workers=args.max_workers,
+                                   client=client)
+            elapsed = time.perf_counter() - started
+            results['phases']['publish'] = phase_result(elapsed, len(pids), 0, mock.get_stats(), status)
+            results['check'] = check_upload(mock, 'saef_benchmark', objects_checked)
+    finally:
+        lock_watcher.stop()
+        client.close()
+        mock.stop()
+    return results
+
+def check_upload(mock, collection_alias, objects):
+    """
+    Check the outcome of an upload run against the mock: each object has exactly one
+    dataset, which is published and holds each of its datafiles and relationship files
+    exactly once (no file registered twice by a retried addFiles), each with the
+    object's categories.
+
+    Parameters
+    ----------
+    mock : MockDataverse
+    collection_alias : str
+    objects : list of tuple (str, SAEFDataset, int)
+        object_osn, its dataset and its number of datafiles.
+
+    Return
+    ------
+    list
+        Failed checks (empty if every check passed).
+    """
+    failures = []
+    created = mock.get_datasets(collection_alias)
+    if (len(created) != len(objects)):
+        failures.append('{} datasets created for {} objects'.format(len(created), len(objects)))
+    for osn, dataset, datafiles in objects:
+        pid = dataset.get_dataset_pid()
+        if (not pid):
+            failures.append('{}: no dataset'.format(osn))
+            continue
+        state = mock.get_dataset(pid)
+        if (state.get('versionState') != 'RELEASED'):
+            failures.append('{}: version state {}'.format(osn, state.get('versionState')))
+        # relationship files written for the object
+        digital_object = dataset.get_dataset_metadata().get('digital_object')
+        relationships = len([key for key in ['pds_filename', 'msft_filename', 'ocr_filename']
+                             if os.path.isfile(digital_object.get(key))])
+        files = state.get('files')
+        if (len(files) != datafiles + relationships):
+            failures.append('{}: {} files, expected {} datafiles and {} relationship files'.format(osn, len(files), datafiles,
+                                                                                                  relationships))
+        identifiers = [file.get('dataFile').get('storageIdentifier') for file in files]
+        if (len(set(identifiers)) != len(identifiers)):
+            failures.append('{}: {} files registered more than once'.format(osn, len(identifiers) - len(set(identifiers))))
+        for file in files:
+            categories = file.get('categories')
+            if ((not isinstance(categories, list)) or
+                ('UID:' + osn not in categories) or
+                (len([category for category in ['Data', 'Documentation'] if category in categories]) != 1)):
+                failures.append('{}: categories of {}: {}'.format(osn, file.get('label'), categories))
+    return failures
+
+def measure(function, memory=True):
+    """
+    Time a call of function and, if memory is True, trace its peak memory in a second call
+    (tracing slows the call down, so it is not timed).
+
+    Return
+    ------
+    tuple (float, float, object)
+        Seconds, peak traced memory in MB (None if not traced) and the result of the timed call.
+    """
+    started = time.perf_counter()
+    value = function()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return elapsed, peak, value
+
+def inventory_result(elapsed, peak, rows, objects):
+    """
+    Summarize one inventory phase: seconds, rows/s, objects/s and peak memory.
+    """
+    return {'status':True, 'seconds':round(elapsed, 3), 'rows':rows, 'objects':objects,
+            'rows_per_second':round(rows / elapsed, 1) if elapsed > 0 else None,
+            'objects_per_second':round(objects / elapsed, 1) if elapsed > 0 else None,
+            'peak_mb':round(peak, 1) if peak is not None else None}
+
+def run_inventory(args, workdir):
+    """
+    Run the inventory benchmark in workdir.
+    Whole-inventory phases (load, group, stream, relationships) use every row;
+    per-object phases (validate, digital_object, metadata) use the first args.sample objects.
+
+    Return
+    ------
+    dict
+        Per-phase results.
+    """
+    results = {'phases':{}}
+    memory = not args.no_memory
+
+    # generate the inventory, unless one is given
+    inventory_filename = args.inventory
+    if (not inventory_filename):
+        inventory_filename = os.path.join(workdir, 'inventory.csv')
+        started = time.perf_counter()
+        rows = synthetic.write_inventory(inventory_filename, args.objects, pages=args.pages, msft_ratio=args.msft_ratio,
+                                         ocr_ratio=args.ocr_ratio, seed=args.seed)
+        results['phases']['generate'] = inventory_result(time.perf_counter() - started, None, rows, args.objects)
+    config = write_config(workdir, inventory_filename, os.path.join(workdir, 'data'), 'http://localhost', 'none')
+
+    # load the inventory
+    def load():
+        fi = lcd.FileInventory()
+        fi.from_file(inventory_filename, compact=args.compact)
+        return fi
+    elapsed, peak, fi = measure(load, memory)
+    rows = len(fi.get_inventory())
+    objects = fi.get_inventory()['object_osn'].nunique()
+    results['phases']['load'] = inventory_result(elapsed, peak, rows, objects)
+
+    # write and reload the inventory as parquet, in full and the object_osn column only
+    if columnar.available():
+        parquet_filename = os.path.join(workdir, 'inventory.parquet')
+        elapsed, peak, status = measure(lambda: fi.to_file(parquet_filename), memory)
+        results['phases']['parquet_write'] = inventory_result(elapsed, peak, rows, objects)
+        elapsed, peak, status = measure(lambda: lcd.FileInventory().from_file(parquet_filename, compact=args.compact), memory)
+        results['phases']['parquet_load'] = inventory_result(elapsed, peak, rows, objects)
+        elapsed, peak, osns = measure(lambda: columnar.read_parquet(parquet_filename, columns=['object_osn']), memory)
+        results['phases']['parquet_columns'] = inventory_result(elapsed, peak, rows, objects)
+
+    # group the loaded inventory, and stream the file, by object
+    elapsed, peak, count = measure(lambda: sum(1 for osn, files in fi.get_objects()), memory)
+    results['phases']['group'] = inventory_result(elapsed, peak, rows, count)
+    elapsed, peak, count = measure(lambda: sum(1 for osn, files in lcd.FileInventory().stream_objects(inventory_filename)), memory)
+    results['phases']['stream'] = inventory_result(elapsed, peak, rows, count)
+
+    # per-object phases; their warnings are not printed
+    sample = [files for osn, files in itertools.islice(fi.get_objects(), args.sample)]
+    sample_rows = sum(len(files) for files in sample)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        elapsed, peak, count = measure(lambda: sum(lcd.PDSDocument().from_dataframe(files) for files in sample), memory)
+        results['phases']['validate'] = inventory_result(elapsed, peak, sample_rows, len(sample))
+
+        def build():
+            saefdos = []
+            for files in sample:
+                saefdo = saef.SAEFDigitalObject()
+                if saefdo.from_dataframe(files):
+                    saefdos.append(saefdo)
+            return saefdos
+        elapsed, peak, saefdos = measure(build, memory)
+        results['phases']['digital_object'] = inventory_result(elapsed, peak, sample_rows, len(saefdos))
+
+        # lightweight views of every object over the shared inventory DataFrame
+        elapsed, peak, views = measure(lambda: saef.get_digital_object_views(fi), memory)
+        results['phases']['views'] = inventory_result(elapsed, peak, rows, len(views))
+
+        def relationships():
+            sir = saef.SAEFInventoryRelationships()
+            sir.from_inventory(fi)
+            return sir
+        elapsed, peak, sir = measure(relationships, memory)
+        results['phases']['relationships'] = inventory_result(elapsed, peak, rows, objects)
+
+        def metadata():
+            for saefdo in saefdos:
+                saef.SAEFDataset().initialize(saefdo, config)
+            return len(saefdos)
+        elapsed, peak, count = measure(metadata, memory)
+        results['phases']['metadata'] = inventory_result(elapsed, peak, sample_rows, count)
+    results['objects'] = objects
+    results['rows'] = rows
+    return results
+
+def get_revision():
+    """
+    Get the git revision of the source tree, e.g. 92a1aab-dirty; None outside a git checkout.
+    """
+    try:
+        output = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def read_history(filename):
+    """
+    Read the records of a results history file (JSON lines); empty if the file does not exist.
+    """
+    records = []
+    if (not filename) or (not os.path.isfile(filename)):
+        return records
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+def compare(record, history):
+    """
+    Compare a run with the last run in history of the same benchmark and settings.
+
+    Return
+    ------
+    dict
+        Keyed by phase: the previous revision and the relative change of each COMPARED value;
+        empty if there is no previous run.
+    """
+    previous = [r for r in history if (r.get('benchmark') == record.get('benchmark')) and
+                (r.get('settings') == record.get('settings'))]
+    if (len(previous) == 0):
+        return {}
+    previous = previous[-1]
+    changes = {}
+    for phase, result in record.get('phases').items():
+        before = previous.get('phases').get(phase, {})
+        changes[phase] = {'revision':previous.get('revision')}
+        for key in COMPARED:
+            if before.get(key) and (result.get(key) is not None):
+                changes[phase][key] = round((result.get(key) - before.get(key)) / before.get(key), 3)
+    return changes
+
+def print_results(record, changes):
+    """
+    Print the results of a run, and the changes from the previous run, if any.
+    """
+    if (record.get('benchmark') == 'upload'):
+        columns = [('status', '{!s}'), ('seconds', '{}'), ('files_per_second', '{!s}'), ('mb_per_second', '{!s}'),
+                   ('requests', '{}')]
+    else:
+        columns = [('seconds', '{}'), ('rows_per_second', '{!s}'), ('objects_per_second', '{!s}'), ('peak_mb', '{!s}')]
+    print('{:<30}'.format('phase') + ''.join('{:>20}'.format(name) for name, form in columns))
+    for phase in PHASES.get(record.get('benchmark')):
+        result = record.get('phases').get(phase)
+        if (result == None):
+            continue
+        print('{:<30}'.format(phase) + ''.join('{:>20}'.format(form.format(result.get(name))) for name, form in columns))
+    if changes:
+        print('change from {}:'.format(list(changes.values())[0].get('revision')))
+        for phase in PHASES.get(record.get('benchmark')):
+            change = changes.get(phase)
+            if change:
+                print('{:<30}'.format(phase) + ''.join('{:>20}'.format('{} {:+.1%}'.format(key, change.get(key)))
+                                                       for key in COMPARED if change.get(key) is not None))
+
+def main():
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark SAEF ingest and inventory processing.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    upload = subparsers.add_parser('upload', help='ingest against a mock Dataverse')
+    upload.add_argument('--inventory', default=os.path.join(TEST_DIRECTORY, 'inventory', 'test_saef_inventory.csv'),
+                        help='SAEF inventory (CSV) whose objects are replicated (default: the test inventory)')
+    upload.add_argument('--copies', type=int, default=1, help='copies of every object in the inventory')
+    upload.add_argument('--max-workers', type=int, default=4, help='files uploaded / datasets crawled at the same time')
+    upload.add_argument('--latency', type=float, default=0.0, help='seconds added to every API response')
+    upload.add_argument('--storage-latency', type=float, default=0.0, help='seconds added to every storage PUT')
+    upload.add_argument('--bandwidth', type=float, default=None, help='storage bandwidth in bytes/s (default: unlimited)')
+    upload.add_argument('--error-rate', type=float, default=None,
+                        help='fraction of API requests answered 503 (default: 0, or {} with --check)'.format(CHECK_ERROR_RATE))
+    upload.add_argument('--storage-error-rate', type=float, default=None,
+                        help='fraction of storage PUTs answered 503 (default: 0, or {} with --check)'.format(CHECK_ERROR_RATE))
+    upload.add_argument('--part-size', type=int, default=None, help='multipart upload for files larger than this (bytes)')
+    upload.add_argument('--ingest-lock', type=float, default=0.0, help='seconds of Ingest lock after a tabular upload')
+    upload.add_argument('--seed', type=int, default=None, help='seed of the error injection (default: 0 with --check)')
+    upload.add_argument('--check', action='store_true',
+                        help='also publish, then check the datasets in the mock; exit status 1 if a check fails')
+
+    inventory = subparsers.add_parser('inventory', help='inventory loading and object building')
+    inventory.add_argument('--inventory', default=None, help='inventory (CSV) to use instead of a synthetic one')
+    inventory.add_argument('--objects', type=int, default=1000, help='objects in the synthetic inventory')
+    inventory.add_argument('--pages', type=int, default=20, help='average pages per object')
+    inventory.add_argument('--msft-ratio', type=float, default=0.5, help='share of objects with MSFT transcriptions')
+    inventory.add_argument('--ocr-ratio', type=float, default=0.5, help='share of objects with OCR text')
+    inventory.add_argument('--compact', action='store_true', help='load the inventory in compact form')
+    inventory.add_argument('--sample', type=int, default=200, help='objects used by the per-object phases')
+    inventory.add_argument('--no-memory', action='store_true', help='do not trace peak memory (halves the run time)')
+    inventory.add_argument('--seed', type=int, default=0, help='seed of the synthetic inventory')
+
+    for subparser in [upload, inventory]:
+        subparser.add_argument('--results', default=None,
+                               help='results history (JSON lines); the run is appended and compared with the last matching run')
+    args = parser.parse_args()
+    if (args.benchmark == 'upload'):
+        default_rate = CHECK_ERROR_RATE if args.check else 0.0
+        args.error_rate = default_rate if (args.error_rate is None) else args.error_rate
+        args.storage_error_rate = default_rate if (args.storage_error_rate is None) else args.storage_error_rate
+        # a check is reproducible: the same requests fail on every run
+        if (args.check) and (args.seed is None):
+            args.seed = 0
+
+    with tempfile.TemporaryDirectory(prefix='saef_benchmark_') as workdir:
+        # the relationship and log files are written relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            if (args.benchmark == 'upload'):
+                results = run_upload(args, workdir)
+            else:
+                results = run_inventory(args, workdir)
+        finally:
+            os.chdir(cwd)
+
+    settings = {key:value for key, value in vars(args).items() if key not in ['benchmark', 'results']}
+    record = {'benchmark':args.benchmark, 'revision':get_revision(),
+              'timestamp':datetime.datetime.now().isoformat(timespec='seconds'), 'settings':settings}
+    record.update(results)
+    changes = compare(record, read_history(args.results))
+    print_results(record, changes)
+    if args.results:
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    failures = record.get('check', [])
+    if ('check' in record):
+        print('check: {}'.format('passed' if (len(failures) == 0) else '{} failed'.format(len(failures))))
+        for failure in failures:
+            print('  ' + failure)
+    passed = all(result.get('status') for result in record.get('phases').values()) and (len(failures) == 0)
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
+
+# end file
@@ -1,10 +1,19 @@
 """
 Manage and report on the SAEF dataverse collection.
 """
+from concurrent.futures import ThreadPoolExecutor
+import columnar # local: parquet i/o
+import csv
+import datetime
+import dvclient # local: pooled dataverse http client
+import dvlocks # local: dataset lock waits
+import json
+import os
 import pandas as pd
 import pyDataverse
 import requests
 import saef
+import threading
 
 class SAEFCollection:
     """
@@ -20,8 +29,16 @@ class SAEFCollection:
         Create an inventory of metadata about datasets in the collection.
     create_datafile_inventory : 
         Create an inventory of metadata about datafiles in the collection.
+    write_dataset_inventory : str
+        Write the dataset inventory to a CSV or Parquet file.
+    write_datafile_inventory : str
+        Write the datafile inventory to a CSV or Parquet file.
     destroy_dataset : pyDataverse api, string
         Delete a dataset from the collection.
+    publish_dataset : pyDataverse api, string, string
+        Publish a dataset and wait for its publication to finish.
+    publish : pyDataverse api, DataFrame, string
+        Publish every dataset in a dataset inventory, with resume.
     initd : 
         Inititalization status of instance.
     """
@@ -35,6 +52,18 @@ class SAEFCollection:
         self._dataverse_collection_url = None
         # contents of the dataverse collection
         self._contents = {}
+        # pooled http client (if any)
+        self._client = None
+        # snapshot file (if any) and its entries, keyed by dataset persistent id
+        self._snapshot_file = None
+        self._snapshot = {}
+        # number of newly crawled datasets between snapshot checkpoints
+        self._checkpoint_interval = 100
+        # crawler settings: worker threads, request timeout (seconds), retries and backoff (seconds)
+        self._max_workers = 8
+        self._timeout = 60
+        self._retries = 3
+        self._backoff = 1
 
     def __process_geospatial_metadata(self, geo_md):
         """
@@ -67,20 +96,45 @@ class SAEFCollection:
                     elements[element] = ';'.join(value[0])
         return elements
 
+    # columns of the publish log
+    PUBLISH_LOG_COLUMNS = ['date', 'dataset_doi', 'operation', 'status']
+
+    def __get(self, request_url, headers, client=None):
+        """
+        Private: GET a url with a per-request timeout, retrying connection errors,
+        timeouts, 429 and 5xx responses with exponential backoff (dvclient.RetryPolicy).
+        Called by: SAEFCollection::__get_contents, SAEFCollection::__get_listing,
+        SAEFCollection::__get_dataset_metadata and SAEFCollection::__get_version_state.
+
+        Return
+        ------
+        requests.Response
+            None if the request failed on every attempt.
+        """
+        # get the pooled client, if any, otherwise the shared default client
+        http = dvclient.api_http(client if client else self._client)
+        # the client's retry policy handles the retries; the crawler settings override its defaults
+        policy = dvclient.RetryPolicy(retries=self._retries, backoff=self._backoff)
+        try:
+            return http.get(request_url, headers=headers, timeout=self._timeout, retry_policy=policy)
+        except requests.exceptions.RequestException as e:
+            print('SAEFCollection: Warning - request failed: {} {}'.format(request_url, e))
+            return None
+
     def __get_dataset_metadata(self, api, dataset_id):
         """
         Private: Get the dataset metadata from the dataverse collection.
 
         Return
         ------
-        dict
+        tuple (dict, str)
+            Dataset metadata and the version stamp of its latest version
+            (version number, state and lastUpdateTime); the stamp is None on failure.
         """
         # handle input errors
         if (not api) or (not dataset_id):
-            return {}
+            return {}, None
         
-        # set up the request
-        import requests
         # get the base url
         base_url = api.base_url
         # get the api token
@@ -90,13 +144,13 @@ class SAEFCollection:
         # create the request url
         request_url = '{}/api/datasets/{}/versions'.format(base_url,dataset_id)   
         # call the requests library using the request url
-        response = requests.get(request_url, headers=headers)
+        response = self.__get(request_url, headers)
         
         # handle responses
-        status = response.status_code
-        if (not (status >= 200 and status < 300)):
+        if ((response == None) or
+            (not (response.status_code >= 200 and response.status_code < 300))):
             print('SAEFCollection: Error - failed to get dataset metadata for dataset: {}'.format(dataset_id))
-            return {}
+            return {}, None
         else:
             # get response data
             data = response.json().get('data')
@@ -108,11 +162,116 @@ class SAEFCollection:
             md['create_time'] = data[0].get('createTime')
             md['dataset_id'] = data[0].get('datasetId')
             md['dataset_pid'] = data[0].get('datasetPersistentId')
-            return md
+            
+            # version stamp used to detect changed datasets
+            stamp = '{}.{}:{}:{}'.format(data[0].get('versionNumber'), data[0].get('versionMinorNumber'),
+                                         data[0].get('versionState'), data[0].get('lastUpdateTime'))
+            return md, stamp
+
+    def __get_listing(self, api):
+        """
+        Private: Get the change stamp of every dataset in the collection from the
+        Search API, one page of at most 1000 datasets per request.
+        Called by: SAEFCollection::__get_contents.
+
+        Return
+        ------
+        dict
+            Stamp (versionState, version number and updatedAt of each version
+            listed) keyed by dataset persistent id; None if the listing failed.
+        """
+        headers = {'X-Dataverse-key': api.api_token, 'Content-Type' : 'application/json'}
+        per_page = 1000
+        start = 0
+        versions = {}
+        while True:
+            request_url = '{}/api/search?q=*&type=dataset&subtree={}&per_page={}&start={}'.format(api.base_url,
+                                                                                                self._dataverse_collection_url,
+                                                                                                per_page, start)
+            response = self.__get(request_url, headers)
+            if ((response == None) or
+                (not (response.status_code >= 200 and response.status_code < 300))):
+                print('SAEFCollection: Warning - failed to list datasets for collection: {}'.format(self._dataverse_collection_url))
+                return None
+            data = response.json().get('data')
+            items = data.get('items')
+            for item in items:
+                # a dataset with a draft over a released version is listed once per version
+                versions.setdefault(item.get('global_id'), []).append('{}.{}:{}:{}'.format(item.get('majorVersion'),
+                                                                                       item.get('minorVersion'),
+                                                                                       item.get('versionState'),
+                                                                                       item.get('updatedAt')))
+            start = start + len(items)
+            if ((len(items) == 0) or
+                (start >= data.get('total_count'))):
+                break
+        return {pid:';'.join(sorted(stamps)) for pid, stamps in versions.items()}
+
+    def __get_dataset_contents(self, api, result, listing=None):
+        """
+        Private: Get the metadata and files of one dataset listed in the collection contents.
+        Called by: SAEFCollection::__get_contents, from several worker threads.
+
+        Parameters
+        ----------
+        api : pyDataverse api
+        result : dict
+            Dataset entry from the collection contents.
+        listing : dict, optional
+            Search API stamps keyed by dataset persistent id (see __get_listing).
+
+        Return
+        ------
+        tuple (str, dict, str, str)
+            Dataset persistent id, its contents, its version stamp and its Search API
+            stamp; contents is None on failure.
+        """
+        # get the dataset's persistent id
+        pid = 'doi:{}/{}'.format(result.get('authority'),result.get('identifier'))
+        listed = listing.get(pid) if listing else None
+        
+        # reuse the snapshot entry, without any request, if the listing shows no change
+        entry = self._snapshot.get(pid)
+        if ((entry != None) and
+            (listed != None) and
+            (entry.get('listing') == listed)):
+            return pid, entry.get('contents'), entry.get('version'), listed
+        
+        # get the dataset metadata
+        did = result.get('id')
+        dmd, stamp = self.__get_dataset_metadata(api, did)
+        
+        # reuse the snapshot entry if the dataset has not changed since it was taken
+        if ((entry != None) and
+            (stamp != None) and
+            (entry.get('version') == stamp)):
+            return pid, entry.get('contents'), stamp, listed
+        
+        # create headers
+        h = {'X-Dataverse-key': api.api_token, 'Content-Type' : 'application/json'}
+        # create request url for metadata about the dataset's files
+        rurl = '{}/api/datasets/:persistentId/?persistentId={}'.format(api.base_url, pid)
+        response = self.__get(rurl, h)
+        if ((response == None) or
+            (not (response.status_code >= 200 and response.status_code < 300))):
+            print('SAEFCollection: Error - failed to get files for dataset: {}'.format(pid))
+            return pid, None, None, None
+        
+        # add the file metadata to the contents
+        contents = {}
+        contents['dataset'] = dmd
+        contents['files'] = response.json().get('data')
+        return pid, contents, stamp, listed
         
     def __get_contents(self, api):
         """
         Private: Get the contents of the SAEF dataverse collection.
+        Datasets are crawled concurrently by at most self._max_workers threads.
+        If a snapshot file is set, the Search API listing of the collection decides
+        which datasets changed: unchanged datasets are taken from the snapshot without
+        a request, and the newly crawled datasets are appended to the checkpoint file
+        every self._checkpoint_interval datasets; the snapshot is written once, at the end.
+        If the listing fails, each dataset's versions decide instead.
 
         Return
         ------
@@ -121,8 +280,6 @@ class SAEFCollection:
         # handle invalid input
         if (not api) or (not self._dataverse_collection_url):
             return {}
-        # set up the request
-        import requests
         # get the base url
         base_url = api.base_url
         # get the api token
@@ -132,10 +289,12 @@ class SAEFCollection:
         # create the request url
         request_url = '{}/api/dataverses/{}/contents'.format(base_url, self._dataverse_collection_url)
         # call the requests library using the request url
-        response = requests.get(request_url, headers=headers)
-        # handle responses
-        status = response.status_code
+        response = self.__get(request_url, headers)
         # handle errors
+        if (response == None):
+            print('SAEFCollection: Error - failed to get inventory for collection: {}'.format(self._dataverse_collection_url))
+            return {}
+        status = response.status_code
         if (not (status >= 200 and status < 300)):
             print('SAEFCollection: Error - failed to get inventory for collection: {} {}'.format(self._dataverse_collection_url,
             response.json()))
@@ -144,29 +303,143 @@ class SAEFCollection:
         # get the inventory results
         results = response.json().get('data')
         
+        # change stamps of the datasets, from one paged listing (only needed to keep a snapshot)
+        listing = self.__get_listing(api) if (self._snapshot_file) else None
+        
         # build the contents dict
         contents = {}
         
+        # datasets crawled since the last checkpoint
+        crawled = {}
+        
         # gather metadata about each dataset's files
-        for result in results:
-            # get the dataset metadata
-            did = result.get('id')
-            dmd = self.__get_dataset_metadata(api, did)
-            
-            # get the dataset's persistent id
-            pid = 'doi:{}/{}'.format(result.get('authority'),result.get('identifier'))
-            # create headers
-            h = {'X-Dataverse-key': api_token, 'Content-Type' : 'application/json'}
-            # create request url for metadata about the dataset's files
-            rurl = '{}/api/datasets/:persistentId/?persistentId={}'.format(base_url, pid)
-            response = requests.get(rurl, headers=h)
-            # add the file metadata to the contents       
-            contents[pid] = {}
-            contents[pid]['dataset'] = dmd
-            contents[pid]['files'] = response.json().get('data')
+        # note: map returns the results in collection order
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            for pid, dataset_contents, stamp, listed in executor.map(lambda result: self.__get_dataset_contents(api, result, listing), results):
+                if (dataset_contents == None):
+                    continue
+                contents[pid] = dataset_contents
+                # record the dataset in the snapshot; checkpoint so an interrupted crawl can resume
+                entry = self._snapshot.get(pid)
+                if ((entry == None) or
+                    (entry.get('version') != stamp) or
+                    (entry.get('listing') != listed) or
+                    (stamp == None)):
+                    self._snapshot[pid] = {'version':stamp, 'listing':listed, 'contents':dataset_contents}
+                    crawled[pid] = self._snapshot.get(pid)
+                    if (len(crawled) >= self._checkpoint_interval):
+                        self.__append_snapshot(crawled)
+                        crawled = {}
+        self.__append_snapshot(crawled)
+        
+        # drop datasets that are no longer in the collection; a dataset that failed
+        # this time keeps its entry, so it is not downloaded in full next time
+        listed = set('doi:{}/{}'.format(result.get('authority'), result.get('identifier')) for result in results)
+        self._snapshot = {pid:entry for pid, entry in self._snapshot.items() if pid in listed}
+        # save the snapshot once, and drop the checkpoints it now holds
+        self.__write_snapshot()
             
         return contents
 
+    def __checkpoint_file(self):
+        """
+        Private: Get the checkpoint file of the snapshot: JSON lines appended during a crawl,
+        a header line ({collection}) and then one line per crawled dataset ({pid, entry}).
+        """
+        return self._snapshot_file + '.jsonl'
+
+    def __read_snapshot(self):
+        """
+        Private: Read the snapshot file, if any, for the current collection, and then
+        the checkpoints of an interrupted crawl, if any.
+
+        Return
+        ------
+        dict
+            Snapshot entries keyed by dataset persistent id: {version, listing, contents}.
+        """
+        if (not self._snapshot_file):
+            return {}
+        datasets = {}
+        if (os.path.isfile(self._snapshot_file)):
+            try:
+                with open(self._snapshot_file, 'r') as fp:
+                    snapshot = json.load(fp)
+            except (OSError, ValueError):
+                print('SAEFCollection: Warning - could not read snapshot: {}'.format(self._snapshot_file))
+                snapshot = {}
+            # a snapshot of another collection is ignored
+            if (snapshot.get('collection') == self._dataverse_collection_url):
+                datasets = snapshot.get('datasets', {})
+            elif (snapshot):
+                print('SAEFCollection: Warning - snapshot is for another collection: {}'.format(snapshot.get('collection')))
+        checkpoint_file = self.__checkpoint_file()
+        if (os.path.isfile(checkpoint_file)):
+            with open(checkpoint_file, 'r') as fp:
+                header = None
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line of an interrupted write
+                        break
+                    if (header == None):
+                        header = record
+                        if (header.get('collection') != self._dataverse_collection_url):
+                            break
+                        continue
+                    datasets[record.get('pid')] = record.get('entry')
+        return datasets
+
+    def __append_snapshot(self, entries):
+        """
+        Private: Append snapshot entries to the checkpoint file, if any, so that an
+        interrupted crawl can resume; only the new entries are written.
+
+        Parameter
+        ---------
+        entries : dict
+            Snapshot entries keyed by dataset persistent id.
+
+        Return
+        ------
+        bool
+        """
+        if ((not self._snapshot_file) or
+            (len(entries) == 0)):
+            return False
+        checkpoint_file = self.__checkpoint_file()
+        new_file = (not os.path.isfile(checkpoint_file)) or (os.path.getsize(checkpoint_file) == 0)
+        with open(checkpoint_file, 'a') as fp:
+            if (new_file):
+                fp.write(json.dumps({'collection':self._dataverse_collection_url}) + '\n')
+            for pid, entry in entries.items():
+                fp.write(json.dumps({'pid':pid, 'entry':entry}) + '\n')
+            fp.flush()
+        return True
+
+    def __write_snapshot(self):
+        """
+        Private: Write the snapshot file, if any, and remove its checkpoint file.
+        The file is replaced atomically so an interruption never leaves a partial snapshot.
+
+        Return
+        ------
+        bool
+        """
+        if (not self._snapshot_file):
+            return False
+        snapshot = {'collection':self._dataverse_collection_url,
+                    'updated':datetime.datetime.now().isoformat(),
+                    'datasets':self._snapshot}
+        tmp_file = self._snapshot_file + '.tmp'
+        with open(tmp_file, 'w') as fp:
+            json.dump(snapshot, fp)
+        os.replace(tmp_file, self._snapshot_file)
+        if (os.path.isfile(self.__checkpoint_file())):
+            os.remove(self.__checkpoint_file())
+        return True
+
     def __get_datafiles_info(self, files):
         """
         Private: 
@@ -215,7 +488,8 @@ class SAEFCollection:
             ret[key] = ';'.join(value)
         return ret
 
-    def initialize(self, api, collection_url):
+    def initialize(self, api, collection_url, client=None, max_workers=8, timeout=60, retries=3, backoff=1,
+                   snapshot=None, checkpoint_interval=100):
         """
         Initialize the instance.
 
@@ -223,6 +497,23 @@ class SAEFCollection:
         ----------
         api : pyDataverse api
         collection_url : str
+        client : DataverseClient, optional
+            Pooled HTTP client; if None, a new connection is used for every request.
+        max_workers : int, optional
+            Number of datasets crawled at the same time (default: 8).
+        timeout : float, optional
+            Per-request timeout in seconds (default: 60).
+        retries : int, optional
+            Retries for failed, throttled or timed out requests (default: 3).
+        backoff : float, optional
+            Delay in seconds before the first retry, doubled for each later retry (default: 1).
+        snapshot : str, optional
+            Path of a JSON snapshot of the collection contents. If the file exists,
+            only the datasets that the Search API lists as new or changed are
+            downloaded; the file is then updated.
+            An interrupted crawl resumes from its last checkpoint.
+        checkpoint_interval : int, optional
+            Number of newly crawled datasets between snapshot saves (default: 100).
 
         Return
         ------
@@ -230,6 +521,21 @@ class SAEFCollection:
         """
         # set the collection url
         self._dataverse_collection_url = collection_url
+        # set the http client
+        self._client = client
+        # set the crawler options
+        self._max_workers = max(1, max_workers)
+        self._timeout = timeout
+        self._retries = max(0, retries)
+        self._backoff = backoff
+        # read the snapshot, if any
+        self._snapshot_file = snapshot
+        self._checkpoint_interval = max(1, checkpoint_interval)
+        self._snapshot = self.__read_snapshot()
+        # fold the checkpoints of an interrupted crawl into the snapshot, so new ones start a clean file
+        if ((self._snapshot_file) and
+            (os.path.isfile(self.__checkpoint_file()))):
+            self.__write_snapshot()
         # get the contents of the collection
         self._contents = self.__get_contents(api)
         if (not self._contents):
@@ -362,6 +668,34 @@ class SAEFCollection:
         
         return pd.DataFrame.from_records(records,index=None)
 
+    def write_dataset_inventory(self, filename):
+        """
+        Write the dataset inventory (see create_dataset_inventory) to a file:
+        Parquet if filename ends in .parquet or .pq, otherwise CSV.
+
+        Return
+        ------
+        bool
+        """
+        inventory = self.create_dataset_inventory()
+        if (inventory is None):
+            return False
+        return columnar.write_table(inventory, filename)
+
+    def write_datafile_inventory(self, filename):
+        """
+        Write the datafile inventory (see create_datafile_inventory) to a file:
+        Parquet if filename ends in .parquet or .pq, otherwise CSV.
+
+        Return
+        ------
+        bool
+        """
+        inventory = self.create_datafile_inventory()
+        if (inventory is None):
+            return False
+        return columnar.write_table(inventory, filename)
+
     def destroy_dataset(self, api, dataset_pid):
         """
         Delete a dataset from the collection.
@@ -391,6 +725,200 @@ class SAEFCollection:
         else:
             return True
 
+    def __get_version_state(self, api, dataset_pid, client=None):
+        """
+        Private: Get the state (DRAFT, RELEASED, ...) of a dataset's latest version.
+
+        Return
+        ------
+        str
+            None if the state could not be read.
+        """
+        headers = {'X-Dataverse-key': api.api_token, 'Content-Type' : 'application/json'}
+        request_url = '{}/api/datasets/:persistentId/versions/:latest?persistentId={}'.format(api.base_url, dataset_pid)
+        response = self.__get(request_url, headers, client=client)
+        if ((response == None) or
+            (not (response.status_code >= 200 and response.status_code < 300))):
+            return None
+        return response.json().get('data').get('versionState')
+
+    def publish_dataset(self, api, dataset_pid, version='major', lock_watcher=None, lock_timeout=3600, client=None):
+        """
+        Publish a dataset and wait for its publication to finish.
+        Publication waits for ingest and other transient locks to clear; after the
+        publish request, it waits for the finalizePublication lock (file PID
+        registration, validation) to clear and checks that the version is released.
+        A dataset that is already released counts as published, so a re-run is safe.
+
+        Parameters
+        ----------
+        api : pyDataverse api
+        dataset_pid : str
+            DOI of the dataset to publish
+        version : str (default: major)
+            Either 'major' or 'minor' version
+        lock_watcher : dvlocks.DatasetLockWatcher, optional
+            Shared lock poller; if None, locks are polled in the calling thread.
+        lock_timeout : float, optional
+            Seconds to wait for a lock to clear (default: 3600).
+        client : DataverseClient, optional
+            Pooled HTTP client; defaults to the instance's client, if any.
+
+        Return
+        ------
+        bool
+        """
+        # validate parameters
+        if ((not api) or
+            (not dataset_pid) or 
+            ((not(version == 'major')) and
+            (not(version == 'minor')))):
+            print('SAEFCollection::publish_dataset: Error - validation of parameters failed')
+            return False
+        if (client == None):
+            client = self._client
+
+        def wait(lock_types):
+            if (lock_watcher != None):
+                return lock_watcher.wait(dataset_pid, lock_types=lock_types, timeout=lock_timeout)
+            return dvlocks.wait_for_unlock(api.base_url, api.api_token, dataset_pid, lock_types=lock_types,
+                                           timeout=lock_timeout, client=client)
+
+        # the dataset must not be locked, e.g. by tabular ingest
+        if (wait(dvlocks.TRANSIENT_LOCKS) == False):
+            print('SAEFCollection::publish_dataset: Error - dataset is locked: {}'.format(dataset_pid))
+            return False
+
+        # create the headers
+        headers = {'X-Dataverse-key': api.api_token, 'Content-Type' : 'application/json'}
+        # create the request url
+        request_url = '{}/api/datasets/:persistentId/actions/:publish?persistentId={}&type={}'.format(api.base_url, dataset_pid, version) 
+        try:
+            response = dvclient.api_http(client).post(request_url, headers=headers, timeout=self._timeout)
+            status = response.status_code
+        except requests.exceptions.RequestException as e:
+            print('SAEFCollection::publish_dataset: Warning - publish request failed: {} {}'.format(dataset_pid, e))
+            status = None
+        
+        # handle responses
+        if ((status == None) or
+            (not (status >= 200 and status < 300))):
+            # e.g. published by an earlier, interrupted run
+            if (self.__get_version_state(api, dataset_pid, client=client) == 'RELEASED'):
+                print('SAEFCollection::publish_dataset: Warning - dataset already published: {}'.format(dataset_pid))
+                return True
+            print('SAEFCollection::publish_dataset: Error - failed to publish dataset: {}:{}'.format(status, dataset_pid))
+            return False
+
+        # 202: publication continues asynchronously under a finalizePublication lock
+        if (wait([dvlocks.FINALIZE_PUBLICATION]) == False):
+            print('SAEFCollection::publish_dataset: Error - publication did not finish: {}'.format(dataset_pid))
+            return False
+        if (self.__get_version_state(api, dataset_pid, client=client) != 'RELEASED'):
+            print('SAEFCollection::publish_dataset: Error - dataset not released after publication: {}'.format(dataset_pid))
+            return False
+        return True
+
+    def __read_publish_log(self, logfile):
+        """
+        Private: Read the datasets already published according to the publish log.
+
+        Return
+        ------
+        set
+            Dataset persistent ids.
+        """
+        published = set()
+        if (not os.path.isfile(logfile)):
+            return published
+        with open(logfile, 'r', newline='') as fp:
+            for row in csv.DictReader(fp):
+                if ((row.get('operation') == 'publish_dataset') and
+                    (row.get('status') == 'True')):
+                    published.add(row.get('dataset_doi'))
+        return published
+
+    def publish(self, api, dataset_inventory, logfile, version='major', max_workers=4, lock_timeout=3600, client=None):
+        """
+        Publish every dataset in a dataset inventory.
+        Datasets are published concurrently by at most max_workers threads; one
+        background poller watches their locks. Each result is appended to the
+        publish log (date, dataset_doi, operation, status) as soon as it is known,
+        and datasets the log records as published are skipped, so an interrupted
+        run resumes where it stopped.
+
+        Parameters
+        ----------
+        api : pyDataverse api
+        dataset_inventory : DataFrame or list
+            Dataset inventory with a dataset_doi column (see create_dataset_inventory), or a list of DOIs.
+        logfile : str
+            Publish log (CSV); created if missing, otherwise appended to.
+        version : str (default: major)
+            Either 'major' or 'minor' version
+        max_workers : int, optional
+            Number of datasets published at the same time (default: 4).
+        lock_timeout : float, optional
+            Seconds to wait for a dataset lock to clear (default: 3600).
+        client : DataverseClient, optional
+            Pooled HTTP client; defaults to the instance's client, if any.
+
+        Return
+        ------
+        bool
+            True if every dataset is published.
+        """
+        if ((not api) or
+            (dataset_inventory is None) or
+            (not logfile)):
+            return False
+        if isinstance(dataset_inventory, pd.DataFrame):
+            if ('dataset_doi' not in dataset_inventory.columns):
+                print('SAEFCollection::publish: Error - inventory has no dataset_doi column')
+                return False
+            dataset_pids = list(dataset_inventory['dataset_doi'].dropna())
+        else:
+            dataset_pids = list(dataset_inventory)
+        if (client == None):
+            client = self._client
+
+        # resume: skip the datasets already published
+        published = self.__read_publish_log(logfile)
+        pending = [pid for pid in dict.fromkeys(dataset_pids) if pid not in published]
+        print('SAEFCollection::publish: {} datasets, {} already published, {} to publish'.format(len(set(dataset_pids)),
+                                                                                                len(set(dataset_pids) - set(pending)),
+                                                                                                len(pending)))
+        if (len(pending) == 0):
+            return True
+
+        lock_watcher = dvlocks.DatasetLockWatcher(api.base_url, api.api_token, client=client)
+        log_lock = threading.Lock()
+        new_log = (not os.path.isfile(logfile)) or (os.path.getsize(logfile) == 0)
+        with open(logfile, 'a', newline='') as fp:
+            writer = csv.writer(fp)
+            if (new_log):
+                writer.writerow(self.PUBLISH_LOG_COLUMNS)
+                fp.flush()
+
+            def publish_one(dataset_pid):
+                status = self.publish_dataset(api, dataset_pid, version=version, lock_watcher=lock_watcher,
+                                              lock_timeout=lock_timeout, client=client)
+                # one appended line per dataset, flushed so that it survives an interruption
+                with log_lock:
+                    writer.writerow([datetime.datetime.now(), dataset_pid, 'publish_dataset', status])
+                    fp.flush()
+                return status
+
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                    results = list(executor.map(publish_one, pending))
+            finally:
+                lock_watcher.stop()
+
+        failed = len([status for status in results if status == False])
+        print('SAEFCollection::publish: {} published, {} failed'.format(len(results) - failed, failed))
+        return (failed == 0)
+
     def get_collection_contents(self):
         """
         Get metadata about the contents of the collection.
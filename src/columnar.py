@@ -0,0 +1,264 @@
+"""
+SAEF columnar I/O.
+
+Parquet (Arrow) readers and writers for file inventories, relationship tables and
+collection reports, as an alternative to CSV. A file whose name ends in .parquet or .pq,
+or a directory (a dataset partitioned by object), is read and written as Parquet.
+
+Reads offer column projection (only the columns a stage needs are decoded) and
+predicate pushdown on object_osn and file_format: row groups, or partitions, whose
+statistics exclude the requested values are skipped. DataFrames are returned in the
+form of FileInventory::from_file: every field of type object, missing values as NaN.
+read_table and write_table choose Parquet or CSV by the filename, so callers accept either.
+
+Depends upon the optional pyarrow package; available() is False without it.
+"""
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# filename suffixes of Parquet files
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+
+# field a dataset is partitioned by
+PARTITION_FIELD = 'object_osn'
+
+# rows per row group: small enough for the object_osn statistics to be selective
+ROW_GROUP_SIZE = 65536
+
+def available():
+    """
+    Get the availability of Parquet I/O (the pyarrow package).
+
+    Return
+    ------
+    bool
+    """
+    return (pa != None)
+
+def is_parquet(filename):
+    """
+    Check whether a file is read and written as Parquet: by its suffix, or because it is
+    a directory (a partitioned dataset).
+
+    Return
+    ------
+    bool
+    """
+    if (not filename):
+        return False
+    return (str(filename).lower().endswith(PARQUET_SUFFIXES) or os.path.isdir(filename))
+
+def _check():
+    """
+    Private: Raise if pyarrow is not installed.
+    """
+    if (pa == None):
+        raise ImportError('columnar: Error - Parquet I/O requires the pyarrow package')
+
+def _filters(object_osn=None, file_format=None):
+    """
+    Private: Get the pyarrow filters selecting the rows of some objects and formats.
+
+    Parameters
+    ----------
+    object_osn : str or list, optional
+    file_format : str or list, optional
+
+    Return
+    ------
+    list of tuple (None if there is no filter)
+    """
+    filters = []
+    for field, values in [('object_osn', object_osn), ('file_format', file_format)]:
+        if (values is None):
+            continue
+        if isinstance(values, str):
+            values = [values]
+        filters.append((field, 'in', list(values)))
+    return filters if filters else None
+
+def _partitioning():
+    """
+    Private: Hive partitioning by object, with object_osn always read as a string
+    (e.g. object_osn=00123 is not read as the integer 123).
+    """
+    return ds.partitioning(pa.schema([(PARTITION_FIELD, pa.string())]), flavor='hive')
+
+def _default_form(table):
+    """
+    Private: Convert an Arrow table to a DataFrame in the form of FileInventory::from_file.
+    Integers are read as python ints (not floats, which cannot hold every mms_id), and
+    every missing value as NaN.
+
+    Return
+    ------
+    DataFrame
+    """
+    df = table.to_pandas(integer_object_nulls=True).astype('object')
+    df = df.where(df.notna(), float('nan'))
+    # a partition field is read last; restore the order of the written DataFrame
+    metadata = table.schema.pandas_metadata
+    if (metadata != None):
+        order = [column.get('name') for column in metadata.get('columns') if column.get('name') in df.columns]
+        if (len(order) == len(df.columns)):
+            df = df[order]
+    return df
+
+def read_parquet(filename, columns=None, object_osn=None, file_format=None):
+    """
+    Read a Parquet file, or a dataset partitioned by object.
+
+    Parameters
+    ----------
+    filename : str
+        Parquet file or dataset directory.
+    columns : list, optional
+        Columns to read (default: all).
+    object_osn : str or list, optional
+        Read only the rows of these objects.
+    file_format : str or list, optional
+        Read only the rows of these file formats.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+
+    Return
+    ------
+    DataFrame
+    """
+    _check()
+    partitioning = _partitioning() if os.path.isdir(filename) else None
+    table = pq.read_table(filename, columns=columns, filters=_filters(object_osn, file_format),
+                          partitioning=partitioning)
+    return _default_form(table)
+
+def iter_parquet(filename, chunksize=100000, columns=None):
+    """
+    Read a Parquet file, or a dataset partitioned by object, in chunks of at most chunksize
+    rows. As with pandas.read_csv(chunksize=...), the index runs on across the chunks.
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+
+    Return
+    ------
+    iterator of DataFrame
+    """
+    _check()
+    partitioning = _partitioning() if os.path.isdir(filename) else None
+    dataset = ds.dataset(filename, format='parquet', partitioning=partitioning)
+    start = 0
+    for batch in dataset.to_batches(columns=columns, batch_size=chunksize):
+        if (batch.num_rows == 0):
+            continue
+        table = pa.Table.from_batches([batch]).replace_schema_metadata(dataset.schema.metadata)
+        chunk = _default_form(table)
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start = start + len(chunk)
+        yield chunk
+
+def read_columns(filename):
+    """
+    Get the column names of a Parquet (see is_parquet) or CSV file without reading its rows.
+    The partition field of a dataset partitioned by object is included.
+
+    Return
+    ------
+    list
+    """
+    if is_parquet(filename):
+        _check()
+        partitioning = _partitioning() if os.path.isdir(filename) else None
+        return list(ds.dataset(filename, format='parquet', partitioning=partitioning).schema.names)
+    return list(pd.read_csv(filename, sep=',', header=0, nrows=0).columns)
+
+def read_table(filename, columns=None, object_osn=None, file_format=None):
+    """
+    Read a Parquet (see is_parquet) or CSV file, depending on the filename.
+    A CSV file is parsed in full and then filtered; only Parquet skips rows unread.
+
+    Parameters
+    ----------
+    see read_parquet
+
+    Return
+    ------
+    DataFrame
+    """
+    if is_parquet(filename):
+        return read_parquet(filename, columns=columns, object_osn=object_osn, file_format=file_format)
+    # cast all fields to type object, as in FileInventory::from_file
+    df = pd.read_csv(filename, sep=',', header=0, usecols=columns).astype('object')
+    for field, operator, values in (_filters(object_osn, file_format) or []):
+        df = df[df[field].isin(values)]
+    return df
+
+def write_parquet(df, filename, partitioned=False):
+    """
+    Write a DataFrame to a Parquet file, or to a dataset directory with one
+    partition (object_osn=<value>) per object. Categorical (compact) fields are
+    written dictionary encoded. Rows keep their order, so that the row groups of an
+    inventory, which lists each object's files together, hold few objects each.
+
+    Parameters
+    ----------
+    df : DataFrame
+    filename : str
+        Parquet file or dataset directory.
+    partitioned : bool, optional
+        Partition by object_osn (default: False). An existing dataset is replaced.
+
+    Catches
+    -------
+    Arrow exceptions (e.g. a field mixing numbers and text)
+
+    Raises
+    ------
+    ImportError
+        If pyarrow is not installed.
+
+    Return
+    ------
+    bool
+    """
+    _check()
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if (partitioned == True):
+            # one partition per object: raise pyarrow's limit (1024) to the number of objects
+            partitions = max(1024, df[PARTITION_FIELD].nunique())
+            pq.write_to_dataset(table, filename, partitioning=_partitioning(),
+                                existing_data_behavior='delete_matching', row_group_size=ROW_GROUP_SIZE,
+                                max_partitions=partitions)
+        else:
+            pq.write_table(table, filename, row_group_size=ROW_GROUP_SIZE)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OSError) as e:
+        print('columnar::write_parquet: Error - {}'.format(e))
+        return False
+    return True
+
+def write_table(df, filename, partitioned=False):
+    """
+    Write a DataFrame as Parquet (see is_parquet) or CSV, depending on the filename.
+
+    Return
+    ------
+    bool
+    """
+    if is_parquet(filename) or (partitioned == True):
+        return write_parquet(df, filename, partitioned=partitioned)
+    df.to_csv(filename, sep=',', header=True, index=False)
+    return True
+
+# end file
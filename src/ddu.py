@@ -10,6 +10,9 @@ metadata that the separate finalize method will need to send to Dataverse. This
 can be uploaded and these metadata entries collected, and then finalized with the Dataverse all at once.
 This way there's only one update, one reindexing etc. 
 
+Each step (ticket, storage_put, hash, finalize) is timed, and bytes and files are counted,
+in the shared metrics registry (see metrics.py).
+
 Source: https://github.com/IQSS/dataverse.harvard.edu/blob/191-python-direct-upload/util/python/direct-upload/directupload.py
 
 """
@@ -20,90 +23,269 @@ import re
 import requests
 import json
 import hashlib
+import time
+import dvclient # local: pooled dataverse http client
+import metrics # local: saef metrics
+
+# checksum algorithms supported by Dataverse installations, keyed by their Dataverse name
+CHECKSUM_ALGORITHMS = {
+    'MD5': 'md5',
+    'SHA-1': 'sha1',
+    'SHA-256': 'sha256',
+    'SHA-512': 'sha512',
+}
+
+class HashingReader:
+    """
+    File-like wrapper used as the body of the S3 PUT request.
+    Every block read by requests while sending the file is also fed to the hash,
+    so the file is read from disk exactly once.
+    """
+    def __init__(self, fp, size, checksum_algorithm='MD5'):
+        self._fp = fp
+        self._size = size
+        self._checksum_algorithm = checksum_algorithm
+        self._start = fp.tell()
+        self._hash = hashlib.new(CHECKSUM_ALGORITHMS[checksum_algorithm])
+        # time spent hashing, including attempts that were rewound
+        self.hash_seconds = 0.0
+
+    def rewind(self):
+        # lets the http client resend the body on a retry
+        self._fp.seek(self._start)
+        self._hash = hashlib.new(CHECKSUM_ALGORITHMS[self._checksum_algorithm])
+
+    def __len__(self):
+        # lets requests set Content-Length (S3 does not accept chunked PUTs)
+        return self._size
+
+    def read(self, size=-1):
+        chunk = self._fp.read(size)
+        started = time.perf_counter()
+        self._hash.update(chunk)
+        self.hash_seconds = self.hash_seconds + time.perf_counter() - started
+        return chunk
+
+    def hexdigest(self):
+        # hash whatever the transport did not consume, if anything
+        started = time.perf_counter()
+        while chunk := self._fp.read(8192):
+            self._hash.update(chunk)
+        self.hash_seconds = self.hash_seconds + time.perf_counter() - started
+        return self._hash.hexdigest()
 
-def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, retries=10):
+class PartReader:
+    """
+    File-like view of one part (offset, size) of a file, used as the body of a multipart PUT.
+    Each part opens its own file handle so that parts can be sent in parallel.
+    """
+    def __init__(self, file_path, offset, size):
+        self._fp = open(file_path, 'rb')
+        self._fp.seek(offset)
+        self._offset = offset
+        self._remaining = size
+        self._size = size
+
+    def rewind(self):
+        # lets the http client resend the part on a retry
+        self._fp.seek(self._offset)
+        self._remaining = self._size
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        chunk = self._fp.read(size)
+        self._remaining = self._remaining - len(chunk)
+        return chunk
+
+    def close(self):
+        self._fp.close()
+
+def file_checksum(file_path, checksum_algorithm='MD5'):
+    file_hash = hashlib.new(CHECKSUM_ALGORITHMS[checksum_algorithm])
+    with metrics.span('hash', file=file_path), open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+def upload_part(url, file_path, offset, size, retries=3, client=None):
+    # PUT one part to its pre-signed url; returns the part's ETag, or None on failure.
+    # the client's retry policy resends the (rewound) part on errors, throttling and 5xx
+    body = PartReader(file_path, offset, size)
+    try:
+        with metrics.span('storage_put_part', file=file_path, bytes=size):
+            response = dvclient.storage_put(client, url, data=body, retries=retries)
+        if response.status_code == 200:
+            metrics.count('bytes_uploaded', size)
+            return response.headers.get('ETag')
+        print("Part upload returned code: " + str(response.status_code) + " (giving up)")
+    except requests.exceptions.RequestException as e:
+        print("Part upload failed: " + str(e) + " (giving up)")
+    finally:
+        body.close()
+    return None
+
+def multipart_upload(dataverse_url, key, response_data, file_path, file_size, max_workers=4, part_retries=3, client=None):
+    """
+    Upload a file to S3 as a multipart upload, using the layout returned by /uploadurls
+    (urls, partSize, complete and abort). Parts are uploaded in parallel, each with its own retries.
+    The upload is completed if every part succeeded and aborted otherwise.
+
+    Returns True on success, False on failure.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    http = dvclient.api_http(client)
+    part_size = int(response_data['partSize'])
+    urls = response_data['urls']
+    headers = {'X-Dataverse-key': key}
+
+    # part numbers are the (1-based) keys of the urls dict
+    parts = []
+    for part_number in sorted(urls.keys(), key=int):
+        offset = (int(part_number) - 1) * part_size
+        size = min(part_size, file_size - offset)
+        parts.append((part_number, urls[part_number], offset, size))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        etags = list(executor.map(lambda part: upload_part(part[1], file_path, part[2], part[3], part_retries, client), parts))
+
+    if None in etags:
+        print("Multipart upload to S3 bucket failed, aborting")
+        http.delete(dataverse_url + response_data['abort'], headers=headers)
+        return False
+
+    # tell Dataverse to assemble the parts
+    etag_data = {}
+    for part, etag in zip(parts, etags):
+        etag_data[part[0]] = etag
+    response = http.put(dataverse_url + response_data['complete'], headers=headers, data=json.dumps(etag_data))
+    if response.status_code != 200:
+        print("Multipart upload completion failed. Return code: " + str(response.status_code) + ", aborting")
+        http.delete(dataverse_url + response_data['abort'], headers=headers)
+        return False
+    return True
+
+def upload_json_data(storage_identifier, filename, path, mime_type, file_size, checksum, checksum_algorithm):
+    # metadata entry for one uploaded file, as expected by /addFiles
+    json_data = {
+        "storageIdentifier": storage_identifier,
+        "fileName": filename,
+        "mimeType": mime_type,
+        "fileSize": file_size,
+        }
+
+    if checksum_algorithm == 'MD5':
+        json_data["md5Hash"] = checksum
+    else:
+        json_data["checksum"] = {"@type": checksum_algorithm, "@value": checksum}
+
+    if path is not None:
+        json_data["directoryLabel"] = re.sub('^/', '', path)
+
+    return json_data
+
+def direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, retries=10, checksum_algorithm='MD5',
+                  max_part_workers=4, client=None):
+    if checksum_algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError("direct_upload: unsupported checksum algorithm: " + str(checksum_algorithm))
     data_id = None
+    # pooled client (dvclient.DataverseClient), if any, otherwise the shared default client
+    http = dvclient.api_http(client)
     if path is not None:
         file_path = path + "/" + filename
     else:
         file_path = filename
     
     file_size = os.stat(file_path).st_size 
-    # start with a call to Dataverse to obtain a "ticket" for the upload to S3:
-    while retries > 0:
-        url_string = dataverse_url + "/api/datasets/:persistentId/uploadurls"
-        url_string = url_string + "?persistentId=" + dataset_pid + "&key=" + key + "&size=" + str(file_size)
+    # start with a call to Dataverse to obtain a "ticket" for the upload to S3.
+    # the client's retry policy retries errors, throttling and 5xx responses with backoff
+    url_string = dataverse_url + "/api/datasets/:persistentId/uploadurls"
+    url_string = url_string + "?persistentId=" + dataset_pid + "&key=" + key + "&size=" + str(file_size)
 
-        #print("url string: "+url_string)
-        
-        response = requests.get(url_string)
+    #print("url string: "+url_string)
+    
+    with metrics.span('ticket', file=file_path):
+        response = http.get(url_string, retries=max(0, retries - 1))
 
-        if response.status_code == 200:
-            upload_url = None
-            storage_identifier = None
-            max_part_size = None
-            if 'data' in response.json().keys():
-                response_data = response.json()['data']
-                if 'url' in response_data.keys():
-                    upload_url = response_data['url']
-                if 'storageIdentifier' in response_data.keys():
-                    storage_identifier = response_data['storageIdentifier']
-                if 'partSize' in response_data.keys():
-                    max_part_size = response_data['partSize']
-                    
-
-                if upload_url is not None and storage_identifier is not None:
-                    # will attempt to make a Put request to upload the file to the bucket:
-                    print("upload url: "+upload_url)
-                    #print("storage identifier: "+storage_identifier)
-                    #files = {'upload_file': open(file_path,'rb')}
-                    upload_response = requests.put(upload_url, data=open(file_path, 'rb'), headers={'x-amz-tagging': 'dv-state=temp'},)
-
-                    if upload_response.status_code == 200:
-                        # Calculate MD5:
-                        # (this is inefficient - we are going to read the file the second time
-                        # but it should work for reasonable-sized files)
-                        with open(file_path, "rb") as f:
-                            file_hash = hashlib.md5()
-                            while chunk := f.read(8192):
-                                file_hash.update(chunk)
-
-                        md5_hash = file_hash.hexdigest()
-                        
-                        json_data = {
-                            "storageIdentifier": storage_identifier,
-                            "fileName": filename,
-                            "mimeType": mime_type,
-                            "md5Hash": md5_hash,
-                            "fileSize": file_size,
-                            }
-
-                        if path is not None:
-                            json_data["directoryLabel"] = re.sub('^/', '', path)
-
-                        #json_string = json.dumps(json_data)
-                        return json_data
-                    else:
-                        print("Direct upload to S3 bucket failed. (giving up)")
-                        retries = 0
-
-                else:
-                    # uploads larger than _partSize_ not supported yet;
-                    # but that's 1GB with AWS, so we should be ok
-                    retries = 0
-            
-            else:
-                print("Invalid response from Dataverse (no data), retrying")
-                retries = retries - 1
-            
-        else:
-            print("Received return code: " + str(response.status_code) + ", retrying")
-            retries = retries - 1
+    if response.status_code != 200:
+        print("Received return code: " + str(response.status_code) + " (giving up)")
+        return None
+
+    if 'data' not in response.json().keys():
+        print("Invalid response from Dataverse (no data). (giving up)")
+        return None
+
+    upload_url = None
+    storage_identifier = None
+    max_part_size = None
+    response_data = response.json()['data']
+    if 'url' in response_data.keys():
+        upload_url = response_data['url']
+    if 'storageIdentifier' in response_data.keys():
+        storage_identifier = response_data['storageIdentifier']
+    if 'partSize' in response_data.keys():
+        max_part_size = response_data['partSize']
+
+    if upload_url is not None and storage_identifier is not None:
+        # will attempt to make a Put request to upload the file to the bucket:
+        print("upload url: "+upload_url)
+        #print("storage identifier: "+storage_identifier)
+        #files = {'upload_file': open(file_path,'rb')}
+        # the checksum is computed from the same bytes that are sent to the bucket;
+        # on a retry the body is rewound and the hash restarted
+        with open(file_path, 'rb') as f:
+            body = HashingReader(f, file_size, checksum_algorithm)
+            with metrics.span('storage_put', file=file_path, bytes=file_size):
+                upload_response = dvclient.storage_put(client, upload_url, data=body, headers={'x-amz-tagging': 'dv-state=temp'},)
+            checksum = body.hexdigest()
+            # hashing overlaps the storage_put span
+            metrics.observe('hash', body.hash_seconds, file=file_path)
+
+        if upload_response.status_code == 200:
+            metrics.count('bytes_uploaded', file_size)
+            metrics.count('files_uploaded')
+            return upload_json_data(storage_identifier, filename, path, mime_type, file_size,
+                                    checksum, checksum_algorithm)
+        print("Direct upload to S3 bucket failed. (giving up)")
+        return None
+
+    if 'urls' in response_data.keys() and storage_identifier is not None and max_part_size is not None:
+        # the file is larger than _partSize_: upload it in parts.
+        # parts are sent in parallel, so the checksum is computed by a
+        # sequential read that runs alongside the part uploads
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            checksum_future = executor.submit(file_checksum, file_path, checksum_algorithm)
+            with metrics.span('storage_put', file=file_path, bytes=file_size, parts=len(response_data['urls'])):
+                uploaded = multipart_upload(dataverse_url, key, response_data, file_path, file_size,
+                                            max_workers=max_part_workers, client=client)
+            checksum = checksum_future.result()
+
+        if uploaded:
+            metrics.count('files_uploaded')
+            return upload_json_data(storage_identifier, filename, path, mime_type, file_size,
+                                    checksum, checksum_algorithm)
+        print("Multipart upload to S3 bucket failed. (giving up)")
+        return None
 
     # If we have reached here, that means we have failed.
+    print("Invalid upload layout from Dataverse. (giving up)")
     return None
 
-def finalize_direct_upload(dataverse_url, dataset_pid, json_data, key):
+def finalize_direct_upload(dataverse_url, dataset_pid, json_data, key, client=None):
+    """
+    Register the uploaded files (json_data, one entry per file) with the dataset in a single addFiles call.
+    Nothing is printed; the caller logs the outcome (e.g. to the API log).
+
+    Returns a tuple (status, status_code, message):
+        status : bool (True if the files were registered)
+        status_code : int (HTTP status code of the addFiles call)
+        message : str (the server's message if the call failed, otherwise None)
+    """
     url_string = dataverse_url + "/api/datasets/:persistentId/addFiles"
     url_string = url_string + "?persistentId=" + dataset_pid + "&key=" + key
 
@@ -125,12 +307,74 @@ def finalize_direct_upload(dataverse_url, dataset_pid, json_data, key):
     multipart_form_data = {
         'jsonData': (None, json_string)
     }
-    response = requests.post(url_string, files=multipart_form_data)
+    # addFiles is not idempotent: the retry policy resends it only after a 429 or 503 response or a failed connect;
+    # registering many files can take a while, hence the long read timeout
+    with metrics.span('finalize', dataset=dataset_pid, files=len(json_data)):
+        response = dvclient.api_http(client).post(url_string, files=multipart_form_data, timeout=(10, 600))
 
     # neat (and weird), huh? 
 
     if response.status_code == 200:
-        return True
-    else:
-        print("/addFiles call failed. Return code: "+str(response.status_code))
-        return False
+        metrics.count('files_finalized', len(json_data))
+        return True, response.status_code, None
+    try:
+        message = response.json().get('message')
+    except ValueError:
+        message = response.text[:200]
+    return False, response.status_code, "/addFiles call failed: {}".format(message)
+
+def direct_upload_files(dataverse_url, dataset_pid, key, files, max_workers=4, retries=10, checksum_algorithm='MD5',
+                        client=None, on_result=None):
+    """
+    Upload several files to the S3 bucket concurrently using a bounded pool of worker threads.
+    Each entry in files is a dict with the keys: filename, path, and mime_type.
+    client is an optional dvclient.DataverseClient shared by the worker threads.
+    on_result, if given, is called with each result as soon as its upload ends (from a worker thread).
+    checksum_algorithm is one of CHECKSUM_ALGORITHMS and should match the installation's fixity setting.
+    Nothing is finalized; the caller collects the json_data of the successful uploads
+    and passes them to finalize_direct_upload in a single call.
+
+    Returns a list of per-file results, in the same order as files. Each result is a dict:
+        file_path : str
+        status : bool (True if the file was uploaded)
+        json_data : dict (None if the upload failed)
+        error : str (None if the upload succeeded)
+        seconds : float (time taken by the upload)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # at least one worker is needed
+    if (not max_workers) or (max_workers < 1):
+        max_workers = 1
+
+    def upload(file):
+        path = file.get('path')
+        filename = file.get('filename')
+        if path:
+            file_path = path + "/" + filename
+        else:
+            file_path = filename
+        result = {'file_path': file_path, 'status': False, 'json_data': None, 'error': None, 'seconds': None}
+        started = time.perf_counter()
+        try:
+            json_data = direct_upload(dataverse_url, dataset_pid, key, filename, path,
+                                      file.get('mime_type'), retries=retries,
+                                      checksum_algorithm=checksum_algorithm, client=client)
+            if json_data is None:
+                result['error'] = 'direct_upload failed'
+            else:
+                result['status'] = True
+                result['json_data'] = json_data
+        except Exception as e:
+            # e.g. missing file or connection error; report it and let the other uploads continue
+            result['error'] = str(e)
+        result['seconds'] = time.perf_counter() - started
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    # the pool bounds the number of uploads in flight; map preserves the input order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(upload, files))
+
+    return results
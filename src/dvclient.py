@@ -0,0 +1,656 @@
+"""
+Dataverse HTTP client.
+
+Shared, connection-pooled HTTP sessions for calls to a Dataverse installation's
+native API and to its S3 direct upload endpoint. Each endpoint class can be
+throttled: a token bucket caps the request rate and an AIMD limit adapts the
+number of concurrent requests to 429/503 responses, Retry-After and latency.
+Every request has connect/read timeouts and follows a RetryPolicy (exponential
+backoff with jitter, idempotency-aware), and each endpoint class has a
+CircuitBreaker that pauses new requests while the server is down.
+Every attempt is timed and counted in the shared metrics registry (see metrics.py).
+"""
+import datetime
+import email.utils
+import metrics # local: saef metrics
+import random
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
+import urllib3
+
+# responses that mean "slow down"
+THROTTLE_STATUS = [429, 503]
+
+# responses to a request that the server did not act on (safe to resend even if not idempotent)
+NOT_ACTED_STATUS = [429, 503]
+
+def _not_sent(error):
+    """
+    Private: True if a connection error happened before the request was sent: the
+    connection could not be established (refused, unresolved host) or timed out.
+    requests wraps the urllib3 error, e.g. NewConnectionError in a MaxRetryError.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    causes = list(error.args) + [error.__cause__, error.__context__]
+    causes = causes + [getattr(cause, 'reason', None) for cause in causes]
+    return any(isinstance(cause, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+               for cause in causes)
+
+def retry_after(response):
+    """
+    Get the Retry-After delay of a response, in seconds (delta-seconds or HTTP-date), or None.
+    """
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised when a circuit breaker stays open longer than its max_wait.
+    """
+    pass
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a request.
+    Connection errors, timeouts and retry_status responses are retried with
+    exponential backoff and jitter, or after the response's Retry-After delay.
+    Requests that are not idempotent (POST, unless the caller says otherwise)
+    are only retried when the server did not act on them: a connection that
+    could not be established or timed out, or a 429 or 503 response.
+
+    Methods
+    -------
+    should_retry : str, Response, Exception, bool
+        True if a failed request may be sent again.
+    delay : int, Response
+        Seconds to wait before a retry.
+    """
+    # methods that can be repeated without changing the result
+    IDEMPOTENT_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']
+
+    def __init__(self, retries=3, backoff=1, max_backoff=60, jitter=0.5, retry_status=(429, 500, 502, 503, 504)):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        retries : int, optional
+            Retries after the first attempt (default: 3).
+        backoff : float, optional
+            Delay before the first retry, in seconds; doubled for each later retry (default: 1).
+        max_backoff : float, optional
+            Longest delay between two attempts, in seconds (default: 60).
+        jitter : float, optional
+            Fraction of each delay that is randomized (default: 0.5).
+        retry_status : tuple, optional
+            Response status codes that are retried (default: 429 and 5xx gateway errors).
+        """
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_status = retry_status
+
+    def should_retry(self, method, response=None, error=None, idempotent=None):
+        """
+        True if a failed request may be sent again.
+
+        Parameters
+        ----------
+        method : str
+        response : requests.Response, optional
+        error : requests.exceptions.RequestException, optional
+        idempotent : bool, optional
+            Overrides the method's default (see IDEMPOTENT_METHODS).
+
+        Return
+        ------
+        bool
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.IDEMPOTENT_METHODS
+        if error is not None:
+            if isinstance(error, CircuitOpenError):
+                return False
+            if idempotent:
+                return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+            # the request never reached the server
+            return isinstance(error, requests.exceptions.ConnectionError) and _not_sent(error)
+        if (response is None) or (response.status_code not in self.retry_status):
+            return False
+        return idempotent or (response.status_code in NOT_ACTED_STATUS)
+
+    def delay(self, attempt, response=None):
+        """
+        Seconds to wait before retry number attempt (1, 2, ...):
+        the response's Retry-After, if any, otherwise backoff * 2 ** (attempt - 1), with jitter.
+
+        Return
+        ------
+        float
+        """
+        delay = retry_after(response)
+        if delay is not None:
+            return delay
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter * random.random())
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a server that is down.
+    After failure_threshold consecutive failures (connection errors, timeouts,
+    5xx responses) the circuit opens: new requests wait instead of failing.
+    After reset_timeout one probe request is let through; if it succeeds the
+    circuit closes and the waiting requests proceed, otherwise it opens again.
+    A request that waits longer than max_wait raises CircuitOpenError.
+
+    Methods
+    -------
+    before_request : void
+        Wait until a request may be sent.
+    record : Response, Exception
+        Record the outcome of a request.
+    get_state : void
+        Get the state of the circuit: closed, open or half-open.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, max_wait=3600, name=None):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        failure_threshold : int, optional
+            Consecutive failures that open the circuit (default: 5).
+        reset_timeout : float, optional
+            Seconds before a probe is sent to an open circuit (default: 30).
+        max_wait : float, optional
+            Longest wait for the circuit to close, in seconds (default: 3600).
+        name : str, optional
+            Name used in messages.
+        """
+        self._failure_threshold = max(1, failure_threshold)
+        self._reset_timeout = reset_timeout
+        self._max_wait = max_wait
+        self._name = name
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened = 0.0
+        self._condition = threading.Condition()
+
+    def before_request(self):
+        """
+        Wait until a request may be sent: the circuit is closed, or this
+        request is the probe of an open circuit whose reset_timeout has passed.
+
+        Raises
+        ------
+        CircuitOpenError
+            The circuit did not close within max_wait.
+        """
+        deadline = time.monotonic() + self._max_wait
+        with self._condition:
+            while True:
+                if self._state == self.CLOSED:
+                    return
+                now = time.monotonic()
+                if (self._state == self.OPEN) and (now >= self._opened + self._reset_timeout):
+                    self._state = self.HALF_OPEN
+                    return
+                if now >= deadline:
+                    raise CircuitOpenError('circuit {} open for more than {} seconds'.format(self._name, self._max_wait))
+                if self._state == self.OPEN:
+                    self._condition.wait(min(self._opened + self._reset_timeout, deadline) - now)
+                else:
+                    # a probe is in flight
+                    self._condition.wait(deadline - now)
+
+    def record(self, response=None, error=None):
+        """
+        Record the outcome of a request.
+
+        Parameters
+        ----------
+        response : requests.Response, optional
+        error : Exception, optional
+        """
+        failure = isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) or \
+            ((response is not None) and (response.status_code >= 500))
+        with self._condition:
+            if failure:
+                self._failures = self._failures + 1
+                if (self._state == self.HALF_OPEN) or (self._failures >= self._failure_threshold):
+                    if self._state != self.OPEN:
+                        print('CircuitBreaker: Warning - {} unavailable, pausing requests for {} seconds'.format(self._name,
+                                                                                                                   self._reset_timeout))
+                    self._state = self.OPEN
+                    self._opened = time.monotonic()
+            else:
+                if self._state != self.CLOSED:
+                    print('CircuitBreaker: {} available again, resuming requests'.format(self._name))
+                self._failures = 0
+                self._state = self.CLOSED
+            self._condition.notify_all()
+
+    def get_state(self):
+        """
+        Get the state of the circuit: closed, open or half-open.
+
+        Return
+        ------
+        str
+        """
+        with self._condition:
+            return self._state
+
+class Throttle:
+    """
+    Client-side rate limit and adaptive concurrency limit for one endpoint class.
+    A token bucket caps the request rate (rate per second, up to burst at once).
+    The concurrency limit follows AIMD: it grows by about one request per round
+    trip while responses are fast and successful, and is multiplied by decrease
+    on 429/503, connection errors or latency above latency_target (at most once
+    per round trip). A Retry-After header pauses every new request until it expires.
+
+    Methods
+    -------
+    acquire : void
+        Wait for a request slot; returns the start time to pass to release.
+    release : float, int, float
+        Give the slot back and adapt the limits to the response.
+    get_stats : void
+        Get the current limit, requests in flight and throttling counters.
+    """
+    def __init__(self, rate=None, burst=None, max_concurrency=None, min_concurrency=1, initial_concurrency=None,
+                 latency_target=None, decrease=0.5):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        rate : float, optional
+            Maximum requests per second; None for no rate limit.
+        burst : int, optional
+            Requests that may be sent at once after an idle period (default: max(1, rate)).
+        max_concurrency : int, optional
+            Upper bound of the concurrency limit; None for no concurrency limit.
+        min_concurrency : int, optional
+            Lower bound of the concurrency limit (default: 1).
+        initial_concurrency : int, optional
+            Starting concurrency limit (default: max_concurrency).
+        latency_target : float, optional
+            Latency, in seconds, above which the concurrency limit is decreased; None to ignore latency.
+        decrease : float, optional
+            Multiplicative decrease factor (default: 0.5).
+        """
+        self._rate = rate
+        self._burst = burst if burst else max(1, rate if rate else 1)
+        self._tokens = float(self._burst)
+        self._refilled = time.monotonic()
+        self._max_concurrency = max_concurrency
+        self._min_concurrency = max(1, min_concurrency)
+        self._limit = float(initial_concurrency if initial_concurrency else (max_concurrency if max_concurrency else 0))
+        self._latency_target = latency_target
+        self._decrease = decrease
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._throttled = 0
+        self._requests = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait for a request slot: no Retry-After pause, a free concurrency slot and a rate token.
+
+        Return
+        ------
+        float
+            Start time (time.monotonic) to pass to release.
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self._condition.wait(self._paused_until - now)
+                    continue
+                if self._max_concurrency and (self._in_flight >= int(self._limit)):
+                    self._condition.wait()
+                    continue
+                if self._rate:
+                    self._tokens = min(self._burst, self._tokens + (now - self._refilled) * self._rate)
+                    self._refilled = now
+                    if self._tokens < 1:
+                        self._condition.wait((1 - self._tokens) / self._rate)
+                        continue
+                    self._tokens = self._tokens - 1
+                self._in_flight = self._in_flight + 1
+                self._requests = self._requests + 1
+                return now
+
+    def release(self, started, status=None, retry_after=None):
+        """
+        Give a request slot back and adapt the concurrency limit.
+
+        Parameters
+        ----------
+        started : float
+            Value returned by acquire.
+        status : int, optional
+            HTTP status code; None if the request failed without a response.
+        retry_after : float, optional
+            Retry-After delay of the response, in seconds.
+        """
+        with self._condition:
+            now = time.monotonic()
+            latency = now - started
+            self._in_flight = self._in_flight - 1
+            congested = ((status is None) or (status in THROTTLE_STATUS) or
+                         ((self._latency_target is not None) and (latency > self._latency_target)))
+            if (status is None) or (status in THROTTLE_STATUS):
+                self._throttled = self._throttled + 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if self._max_concurrency:
+                if congested:
+                    # multiplicative decrease, at most once per round trip
+                    if (now - self._last_decrease) >= latency:
+                        self._limit = max(self._min_concurrency, self._limit * self._decrease)
+                        self._last_decrease = now
+                elif status < 500:
+                    # additive increase: about one more request per round trip
+                    self._limit = min(self._max_concurrency, self._limit + 1.0 / max(1.0, self._limit))
+            self._condition.notify_all()
+
+    def get_stats(self):
+        """
+        Get the current limit, requests in flight and throttling counters.
+
+        Return
+        ------
+        dict
+            limit, in_flight, requests, throttled, paused (seconds left)
+        """
+        with self._condition:
+            return {'limit':int(self._limit) if self._max_concurrency else None,
+                    'in_flight':self._in_flight,
+                    'requests':self._requests,
+                    'throttled':self._throttled,
+                    'paused':max(0.0, self._paused_until - time.monotonic())}
+
+class DataverseClient:
+    """
+    Pooled HTTP client for a Dataverse installation.
+    A single instance can be shared by SAEFDataset, SAEFCollection and the ddu
+    functions, including from several threads, so that TCP/TLS connections are
+    kept alive and reused instead of being opened for every call.
+
+    Two sessions are kept: one for the native API, which carries the
+    X-Dataverse-key header, and one for the pre-signed S3 upload urls,
+    which must not receive the API key. Each session may have its own Throttle,
+    and has its own CircuitBreaker and default timeouts; both follow the retry policy.
+    Per call, retries=N, retry_policy=RetryPolicy and idempotent=bool override the
+    defaults; a file-like body is only resent if it has a rewind method.
+
+    Methods
+    -------
+    get : str, **kwargs
+        Send a GET request to the native API.
+    post : str, **kwargs
+        Send a POST request to the native API.
+    put : str, **kwargs
+        Send a PUT request to the native API.
+    delete : str, **kwargs
+        Send a DELETE request to the native API.
+    storage_put : str, **kwargs
+        Send a PUT request to a pre-signed storage (S3) url.
+    get_stats : void
+        Get the throttling statistics of each endpoint class.
+    close : void
+        Close the sessions and their pooled connections.
+    """
+    def __init__(self, base_url, api_token, pool_size=10, api_throttle=None, storage_throttle=None,
+                 retry_policy=None, timeout=(10, 60), storage_timeout=(10, 300), api_breaker=None, storage_breaker=None):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        base_url : str
+            Dataverse installation url, e.g. https://demo.dataverse.org
+        api_token : str
+            Dataverse API key
+        pool_size : int, optional
+            Maximum number of pooled connections per host (default: 10).
+            Should be at least the number of threads sharing the client.
+        api_throttle : Throttle, optional
+            Rate and concurrency limits for native API calls (default: none).
+        storage_throttle : Throttle, optional
+            Rate and concurrency limits for storage (S3) PUTs (default: none).
+        retry_policy : RetryPolicy, optional
+            Default retry policy (default: RetryPolicy()).
+        timeout : float or tuple, optional
+            Default (connect, read) timeout of native API calls, in seconds (default: (10, 60)).
+        storage_timeout : float or tuple, optional
+            Default (connect, read) timeout of storage PUTs, in seconds (default: (10, 300)).
+        api_breaker : CircuitBreaker, optional
+            Circuit breaker of the native API (default: CircuitBreaker()).
+        storage_breaker : CircuitBreaker, optional
+            Circuit breaker of the storage endpoint (default: CircuitBreaker()).
+        """
+        # installation url and api token (same names as the pyDataverse api)
+        self.base_url = base_url
+        self.api_token = api_token
+        # native api session; every request carries the api key
+        self.session = self.__create_session(pool_size)
+        if api_token:
+            self.session.headers.update({'X-Dataverse-key': api_token})
+        # storage session for pre-signed urls; no api key
+        self.storage_session = self.__create_session(pool_size)
+        # per endpoint class throttles (None: unthrottled)
+        self.api_throttle = api_throttle
+        self.storage_throttle = storage_throttle
+        # retry policy, timeouts and circuit breakers
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        self.timeout = timeout
+        self.storage_timeout = storage_timeout
+        self.api_breaker = api_breaker if api_breaker else CircuitBreaker(name='native API')
+        self.storage_breaker = storage_breaker if storage_breaker else CircuitBreaker(name='storage')
+
+    def __create_session(self, pool_size):
+        """
+        Private: Create a keep-alive session with a connection pool of pool_size.
+
+        Return
+        ------
+        requests.Session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def __send(self, endpoint, method, url, **kwargs):
+        """
+        Private: Send a request to an endpoint class (api or storage) through its
+        circuit breaker and throttle, retrying it as the retry policy allows.
+
+        Return
+        ------
+        requests.Response
+            The last response, if every attempt failed with a response.
+
+        Raises
+        ------
+        requests.exceptions.RequestException
+            The last error, if every attempt failed without a response.
+        """
+        if endpoint == 'api':
+            session, throttle, breaker = self.session, self.api_throttle, self.api_breaker
+            kwargs.setdefault('timeout', self.timeout)
+        else:
+            session, throttle, breaker = self.storage_session, self.storage_throttle, self.storage_breaker
+            kwargs.setdefault('timeout', self.storage_timeout)
+        policy = kwargs.pop('retry_policy', None)
+        if policy is None:
+            policy = self.retry_policy
+        retries = kwargs.pop('retries', None)
+        if retries is None:
+            retries = policy.retries
+        idempotent = kwargs.pop('idempotent', None)
+        # a consumed file-like body can only be resent if it can be rewound
+        body = kwargs.get('data')
+        rewind = getattr(body, 'rewind', None)
+        if hasattr(body, 'read') and (rewind is None):
+            retries = 0
+
+        attempt = 0
+        while True:
+            if (attempt > 0) and (rewind is not None):
+                rewind()
+            breaker.before_request()
+            started = throttle.acquire() if throttle else None
+            response = None
+            error = None
+            sent = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                error = e
+            finally:
+                if throttle:
+                    throttle.release(started, response.status_code if response is not None else None, retry_after(response))
+                breaker.record(response, error)
+            # one request per attempt; the status is the error type if there was no response
+            status = response.status_code if response is not None else type(error).__name__
+            metrics.observe('http_' + endpoint, time.perf_counter() - sent, method=method, status=status)
+            metrics.count('http_requests', endpoint=endpoint, method=method, status=status)
+            if (attempt >= retries) or (not policy.should_retry(method, response, error, idempotent)):
+                if error is not None:
+                    raise error
+                return response
+            attempt = attempt + 1
+            metrics.count('http_retries', endpoint=endpoint)
+            time.sleep(policy.delay(attempt, response))
+
+    def get(self, url, **kwargs):
+        """
+        Send a GET request to the native API.
+
+        Return
+        ------
+        requests.Response
+        """
+        return self.__send('api', 'GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """
+        Send a POST request to the native API.
+
+        Return
+        ------
+        requests.Response
+        """
+        return self.__send('api', 'POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        """
+        Send a PUT request to the native API.
+
+        Return
+        ------
+        requests.Response
+        """
+        return self.__send('api', 'PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """
+        Send a DELETE request to the native API.
+
+        Return
+        ------
+        requests.Response
+        """
+        return self.__send('api', 'DELETE', url, **kwargs)
+
+    def storage_put(self, url, **kwargs):
+        """
+        Send a PUT request to a pre-signed storage (S3) url.
+
+        Return
+        ------
+        requests.Response
+        """
+        return self.__send('storage', 'PUT', url, **kwargs)
+
+    def get_stats(self):
+        """
+        Get the throttling statistics of each endpoint class.
+
+        Return
+        ------
+        dict
+            api and storage: Throttle.get_stats, or None if unthrottled.
+        """
+        return {'api':self.api_throttle.get_stats() if self.api_throttle else None,
+                'storage':self.storage_throttle.get_stats() if self.storage_throttle else None}
+
+    def close(self):
+        """
+        Close the sessions and their pooled connections.
+        """
+        self.session.close()
+        self.storage_session.close()
+
+# shared client used when a caller does not pass one
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def default_client():
+    """
+    Get the shared client used for calls made without a client: no API key in
+    its session headers (callers send their own), default timeouts, retry policy
+    and circuit breakers.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = DataverseClient(None, None)
+        return _default_client
+
+def api_http(client):
+    """
+    Get the object used for native API calls: the client, if any, otherwise the shared default client.
+    """
+    if client is None:
+        return default_client()
+    return client
+
+def storage_put(client, url, **kwargs):
+    """
+    PUT to a pre-signed storage url with the client's storage session, if any, otherwise with the default client.
+    """
+    return api_http(client).storage_put(url, **kwargs)
+
+# end file
@@ -0,0 +1,259 @@
+"""
+Dataverse dataset locks.
+
+Wait for dataset locks (e.g. Ingest after a tabular file upload, finalizePublication
+after a publish request) to clear before the next call on the dataset. Waits poll the
+locks API with exponential backoff and jitter until a deadline. A DatasetLockWatcher
+runs a single background poller for many datasets at once, and wakes each waiter as
+soon as the locks it cares about have cleared.
+"""
+import dvclient # local: pooled dataverse http client
+import random
+import requests
+import threading
+import time
+
+# lock types
+INGEST = 'Ingest'
+WORKFLOW = 'Workflow'
+IN_REVIEW = 'InReview'
+DCM_UPLOAD = 'DcmUpload'
+FINALIZE_PUBLICATION = 'finalizePublication'
+EDIT_IN_PROGRESS = 'EditInProgress'
+FILE_VALIDATION_FAILED = 'FileValidationFailed'
+
+# locks that clear on their own; InReview, DcmUpload and FileValidationFailed need someone to act
+TRANSIENT_LOCKS = [INGEST, WORKFLOW, FINALIZE_PUBLICATION, EDIT_IN_PROGRESS]
+
+def locks_url(base_url, dataset_id):
+    """
+    Get the locks API url of a dataset, given its database id or persistent id.
+    """
+    if isinstance(dataset_id, str) and (not dataset_id.isdigit()):
+        return '{}/api/datasets/:persistentId/locks?persistentId={}'.format(base_url, dataset_id)
+    return '{}/api/datasets/{}/locks'.format(base_url, dataset_id)
+
+def get_locks(base_url, api_token, dataset_id, client=None, timeout=30):
+    """
+    Get the lock types currently set on a dataset.
+    Returns a list of lock types (empty if the dataset is not locked),
+    or None if the lock status could not be read.
+    """
+    headers = {'X-Dataverse-key': api_token}
+    try:
+        response = dvclient.api_http(client).get(locks_url(base_url, dataset_id), headers=headers, timeout=timeout)
+        if not ((response.status_code >= 200) and (response.status_code < 300)):
+            return None
+        return [lock.get('lockType') for lock in response.json().get('data', [])]
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+def is_locked(locks, lock_types=None):
+    """
+    True if any of lock_types (default: any lock) is set in locks.
+    An unknown lock status (None) counts as locked.
+    """
+    if locks is None:
+        return True
+    if lock_types is None:
+        return len(locks) > 0
+    return any(lock in lock_types for lock in locks)
+
+def backoff(interval, max_interval, jitter):
+    """
+    Get the delay before the next poll and the next interval: the delay is the
+    interval less up to jitter of it (at random), and the interval doubles up to max_interval.
+    """
+    delay = interval * (1 - jitter * random.random())
+    return delay, min(interval * 2, max_interval)
+
+def wait_for_unlock(base_url, api_token, dataset_id, lock_types=TRANSIENT_LOCKS, timeout=3600, client=None,
+                    initial_interval=0.5, max_interval=30, jitter=0.5):
+    """
+    Wait, in the calling thread, until none of lock_types (None: any lock) is set on the dataset.
+    The first check is immediate; later checks back off exponentially, with jitter.
+    Returns True once the dataset is unlocked, False if timeout (seconds) passes first.
+    """
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    while True:
+        locks = get_locks(base_url, api_token, dataset_id, client=client)
+        if not is_locked(locks, lock_types):
+            return True
+        delay, interval = backoff(interval, max_interval, jitter)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print('dvlocks::wait_for_unlock: Error - dataset {} still locked after {} seconds: {}'.format(dataset_id, timeout, locks))
+            return False
+        time.sleep(min(delay, remaining))
+
+class DatasetLockWatcher:
+    """
+    Single background poller for the locks of many datasets.
+    Threads call wait for a dataset; the poller checks each watched dataset's
+    locks with its own exponential backoff and wakes the waiters of a dataset
+    as soon as the lock types they wait for have cleared.
+
+    Methods
+    -------
+    start : void
+        Start the poller thread.
+    stop : void
+        Stop the poller thread; pending waits return False.
+    wait : int or str, list, float
+        Wait until a dataset is not locked.
+    get_watched : void
+        Get the ids of the datasets being watched.
+    """
+    def __init__(self, base_url, api_token, client=None, initial_interval=0.5, max_interval=30, jitter=0.5,
+                 request_timeout=30):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        base_url : str
+            Dataverse installation url
+        api_token : str
+            Dataverse API key
+        client : DataverseClient, optional
+            Pooled HTTP client used to poll the locks.
+        initial_interval : float, optional
+            First delay between two polls of a dataset, in seconds (default: 0.5).
+        max_interval : float, optional
+            Longest delay between two polls of a dataset, in seconds (default: 30).
+        jitter : float, optional
+            Fraction of each delay that is randomized (default: 0.5).
+        request_timeout : float, optional
+            Timeout of one locks request, in seconds (default: 30).
+        """
+        self.base_url = base_url
+        self.api_token = api_token
+        self._client = client
+        self._initial_interval = initial_interval
+        self._max_interval = max_interval
+        self._jitter = jitter
+        self._request_timeout = request_timeout
+        # watched datasets keyed by id: due (next poll), interval, waiters
+        self._datasets = {}
+        # guards self._datasets and wakes the poller
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """
+        Start the poller thread, if it is not running.
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self.__poll, name='dvlocks-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the poller thread; pending waits return False.
+        """
+        with self._condition:
+            self._running = False
+            for entry in self._datasets.values():
+                for waiter in entry.get('waiters'):
+                    waiter['event'].set()
+            self._datasets = {}
+            self._condition.notify_all()
+            thread = self._thread
+            self._thread = None
+        if (thread is not None) and (thread is not threading.current_thread()):
+            thread.join()
+
+    def wait(self, dataset_id, lock_types=TRANSIENT_LOCKS, timeout=3600):
+        """
+        Wait until none of lock_types is set on a dataset.
+        The poller is started if needed and checks the dataset immediately.
+
+        Parameters
+        ----------
+        dataset_id : int or str
+            Dataset database id or persistent id.
+        lock_types : list, optional
+            Lock types to wait for; None waits for every lock (default: TRANSIENT_LOCKS).
+        timeout : float, optional
+            Deadline, in seconds (default: 3600).
+
+        Return
+        ------
+        bool
+            True once the dataset is unlocked, False on timeout or stop.
+        """
+        self.start()
+        waiter = {'lock_types':lock_types, 'event':threading.Event(), 'unlocked':False, 'locks':None}
+        with self._condition:
+            entry = self._datasets.setdefault(dataset_id, {'waiters':[]})
+            entry['waiters'].append(waiter)
+            # a new waiter is checked now, then backs off from the start
+            entry['due'] = time.monotonic()
+            entry['interval'] = self._initial_interval
+            self._condition.notify_all()
+        waiter['event'].wait(timeout)
+        with self._condition:
+            entry = self._datasets.get(dataset_id)
+            if (entry is not None) and (waiter in entry.get('waiters')):
+                entry['waiters'].remove(waiter)
+                if len(entry.get('waiters')) == 0:
+                    del self._datasets[dataset_id]
+        if (waiter['unlocked'] == False) and self._running:
+            print('DatasetLockWatcher::wait: Error - dataset {} still locked after {} seconds: {}'.format(dataset_id, timeout,
+                                                                                                           waiter['locks']))
+        return waiter['unlocked']
+
+    def get_watched(self):
+        """
+        Get the ids of the datasets being watched.
+
+        Return
+        ------
+        list
+        """
+        with self._condition:
+            return list(self._datasets.keys())
+
+    def __poll(self):
+        """
+        Private: Poller thread; checks each dataset when it is due.
+        """
+        while True:
+            with self._condition:
+                while self._running:
+                    now = time.monotonic()
+                    due = [entry.get('due') for entry in self._datasets.values()]
+                    if due and (min(due) <= now):
+                        break
+                    self._condition.wait(min(due) - now if due else None)
+                if not self._running:
+                    return
+                now = time.monotonic()
+                ready = [dataset_id for dataset_id, entry in self._datasets.items() if entry.get('due') <= now]
+
+            # one locks request per dataset, shared by all of its waiters
+            for dataset_id in ready:
+                locks = get_locks(self.base_url, self.api_token, dataset_id, client=self._client,
+                                  timeout=self._request_timeout)
+                with self._condition:
+                    entry = self._datasets.get(dataset_id)
+                    if entry is None:
+                        continue
+                    for waiter in list(entry.get('waiters')):
+                        waiter['locks'] = locks
+                        if not is_locked(locks, waiter.get('lock_types')):
+                            waiter['unlocked'] = True
+                            waiter['event'].set()
+                            entry['waiters'].remove(waiter)
+                    if len(entry.get('waiters')) == 0:
+                        del self._datasets[dataset_id]
+                    else:
+                        delay, entry['interval'] = backoff(entry.get('interval'), self._max_interval, self._jitter)
+                        entry['due'] = time.monotonic() + delay
+
+# end file
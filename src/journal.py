@@ -0,0 +1,295 @@
+"""
+SAEF Ingest Journal
+
+Persistent (SQLite) record of ingest progress, so that an interrupted batch can be
+re-run without creating duplicate datasets or uploading files a second time.
+The journal records, for each digital object, its dataset persistent id and which
+steps have completed, and, for each file, the storageIdentifier and checksum
+returned by its direct upload and whether it has been finalized.
+"""
+
+import datetime
+import json
+import sqlite3
+import threading
+
+class SAEFJournal:
+    """
+    Crash-safe ingest journal backed by an SQLite database.
+    A single instance may be shared by several threads.
+
+    Methods
+    -------
+    open : str
+        Open (or create) the journal database.
+    close : void
+        Close the journal database.
+    get_object : str
+        Get the journal entry for a digital object.
+    object_completed : str
+        True if every ingest step has completed for the digital object.
+    record_dataset : str, str, int
+        Record the dataset created for a digital object.
+    record_upload : str, str, str, dict
+        Record a file uploaded to storage but not yet finalized.
+    get_uploads : str, str
+        Get the uploaded, not yet finalized, files of a digital object.
+    get_finalized : str, str
+        Get the finalized files of a digital object.
+    record_finalized : str, str, bool
+        Record that a digital object's uploaded files have been finalized.
+    record_metadata : str
+        Record that a digital object's custom metadata has been applied.
+    initd : void
+        Get the initialization status of the instance.
+    """
+
+    # file kinds
+    DATAFILE = 'datafile'
+    RELATIONSHIP = 'relationship'
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        # journal database filename
+        self._filename = None
+        # database connection
+        self._connection = None
+        # serializes access to the connection
+        self._lock = threading.Lock()
+        # is instance initialized?
+        self._initd = False
+
+    def open(self, filename):
+        """
+        Open (or create) the journal database.
+
+        Parameter
+        ---------
+        filename : str
+
+        Return
+        ------
+        bool
+        """
+        if (not filename):
+            return False
+        try:
+            self._connection = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+            # write-ahead log: every committed record survives a crash
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS objects (
+                                        object_osn TEXT PRIMARY KEY,
+                                        dataset_pid TEXT,
+                                        dataset_dbid INTEGER,
+                                        datafiles_finalized INTEGER DEFAULT 0,
+                                        relationships_finalized INTEGER DEFAULT 0,
+                                        metadata_applied INTEGER DEFAULT 0,
+                                        updated TEXT)''')
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS files (
+                                        object_osn TEXT,
+                                        file_path TEXT,
+                                        kind TEXT,
+                                        storage_identifier TEXT,
+                                        checksum TEXT,
+                                        json_data TEXT,
+                                        finalized INTEGER DEFAULT 0,
+                                        updated TEXT,
+                                        PRIMARY KEY (object_osn, file_path))''')
+        except sqlite3.Error as e:
+            print('SAEFJournal::open: Error - {}: {}'.format(filename, e))
+            return False
+        self._filename = filename
+        self._initd = True
+        return True
+
+    def close(self):
+        """
+        Close the journal database.
+        """
+        with self._lock:
+            if (self._connection != None):
+                self._connection.close()
+                self._connection = None
+        self._initd = False
+
+    def __now(self):
+        """
+        Private: Current time as an ISO 8601 string.
+        """
+        return datetime.datetime.now().isoformat()
+
+    def __execute(self, sql, parameters=()):
+        """
+        Private: Execute one statement (autocommit) and return its rows.
+
+        Return
+        ------
+        list
+        """
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def __ensure_object(self, object_osn):
+        """
+        Private: Create the journal entry for a digital object, if missing.
+        """
+        self.__execute('INSERT OR IGNORE INTO objects (object_osn, updated) VALUES (?, ?)', (object_osn, self.__now()))
+
+    def get_object(self, object_osn):
+        """
+        Get the journal entry for a digital object.
+
+        Parameter
+        ---------
+        object_osn : str
+
+        Return
+        ------
+        dict
+            dataset_pid, dataset_dbid, datafiles_finalized, relationships_finalized,
+            metadata_applied; empty dict if the object is not in the journal.
+        """
+        rows = self.__execute('''SELECT dataset_pid, dataset_dbid, datafiles_finalized, relationships_finalized,
+                                 metadata_applied FROM objects WHERE object_osn = ?''', (object_osn,))
+        if (not rows):
+            return {}
+        row = rows[0]
+        return {'dataset_pid':row[0],
+                'dataset_dbid':row[1],
+                'datafiles_finalized':bool(row[2]),
+                'relationships_finalized':bool(row[3]),
+                'metadata_applied':bool(row[4])}
+
+    def object_completed(self, object_osn):
+        """
+        True if every ingest step has completed for the digital object.
+
+        Parameter
+        ---------
+        object_osn : str
+
+        Return
+        ------
+        bool
+        """
+        entry = self.get_object(object_osn)
+        return (bool(entry) and
+                (entry.get('dataset_pid') != None) and
+                entry.get('datafiles_finalized') and
+                entry.get('metadata_applied'))
+
+    def record_dataset(self, object_osn, dataset_pid, dataset_dbid):
+        """
+        Record the dataset created for a digital object.
+
+        Parameters
+        ----------
+        object_osn : str
+        dataset_pid : str
+        dataset_dbid : int
+        """
+        self.__ensure_object(object_osn)
+        self.__execute('UPDATE objects SET dataset_pid = ?, dataset_dbid = ?, updated = ? WHERE object_osn = ?',
+                       (dataset_pid, dataset_dbid, self.__now(), object_osn))
+
+    def record_upload(self, object_osn, file_path, kind, json_data):
+        """
+        Record a file uploaded to storage but not yet finalized.
+
+        Parameters
+        ----------
+        object_osn : str
+        file_path : str
+        kind : str (datafile | relationship)
+        json_data : dict
+            Metadata entry returned by ddu.direct_upload.
+        """
+        checksum = json_data.get('md5Hash')
+        if (checksum == None) and (json_data.get('checksum')):
+            checksum = json_data.get('checksum').get('@value')
+        self.__ensure_object(object_osn)
+        self.__execute('''INSERT OR REPLACE INTO files (object_osn, file_path, kind, storage_identifier, checksum,
+                          json_data, finalized, updated) VALUES (?, ?, ?, ?, ?, ?, 0, ?)''',
+                       (object_osn, file_path, kind, json_data.get('storageIdentifier'), checksum,
+                        json.dumps(json_data), self.__now()))
+
+    def get_uploads(self, object_osn, kind):
+        """
+        Get the uploaded, not yet finalized, files of a digital object.
+
+        Parameters
+        ----------
+        object_osn : str
+        kind : str (datafile | relationship)
+
+        Return
+        ------
+        dict
+            json_data keyed by file_path.
+        """
+        rows = self.__execute('SELECT file_path, json_data FROM files WHERE object_osn = ? AND kind = ? AND finalized = 0',
+                              (object_osn, kind))
+        return {row[0]:json.loads(row[1]) for row in rows}
+
+    def get_finalized(self, object_osn, kind):
+        """
+        Get the finalized files of a digital object.
+
+        Parameters
+        ----------
+        object_osn : str
+        kind : str (datafile | relationship)
+
+        Return
+        ------
+        set
+            file paths
+        """
+        rows = self.__execute('SELECT file_path FROM files WHERE object_osn = ? AND kind = ? AND finalized = 1',
+                              (object_osn, kind))
+        return set([row[0] for row in rows])
+
+    def record_finalized(self, object_osn, kind, complete=True):
+        """
+        Record that a digital object's uploaded files of one kind have been finalized.
+
+        Parameters
+        ----------
+        object_osn : str
+        kind : str (datafile | relationship)
+        complete : bool, optional
+            False if some files failed to upload; the object's step is then not
+            marked as completed, and a re-run uploads the missing files only.
+        """
+        column = 'datafiles_finalized' if (kind == self.DATAFILE) else 'relationships_finalized'
+        self.__ensure_object(object_osn)
+        now = self.__now()
+        self.__execute('UPDATE files SET finalized = 1, updated = ? WHERE object_osn = ? AND kind = ?', (now, object_osn, kind))
+        if (complete):
+            self.__execute('UPDATE objects SET {} = 1, updated = ? WHERE object_osn = ?'.format(column), (now, object_osn))
+
+    def record_metadata(self, object_osn):
+        """
+        Record that a digital object's custom metadata has been applied.
+
+        Parameter
+        ---------
+        object_osn : str
+        """
+        self.__ensure_object(object_osn)
+        self.__execute('UPDATE objects SET metadata_applied = 1, updated = ? WHERE object_osn = ?', (self.__now(), object_osn))
+
+    def initd(self):
+        """
+        Get the initialization status of the instance.
+
+        Return
+        ------
+        bool
+        """
+        return self._initd
+
+# end file
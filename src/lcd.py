@@ -7,13 +7,290 @@ Library's digital collections content.
 
 from abc import ABC
 from abc import ABC, abstractmethod
+import columnar # local: parquet i/o
+import numpy as np
 import os
 import pandas as pd
 
+# required fields of a file inventory (see FileInventory)
+INVENTORY_FIELDS = [
+    # urn for the digital object
+    'object_delivery_urn',
+    # owner-supplied name for the digital object
+    'object_osn',
+    # urn for the oasis finding aid associated with the digital object
+    'object_oasis_urn',
+    # urn for the file
+    'file_urn',
+    # format of the file, e.g., JSON, JP2
+    'file_format',
+    # owner-supplied name for the file
+    'file_osn',
+    # title assigned to the digital object (and propagated to its associated files)
+    'object_title',
+    # file access, either P (public) or R (restricted)
+    'object_access',
+    # name of the file, including its extension
+    'filename',
+    # full path to the file
+'file_path']
+
+# fields repeated on every file row of an object (and file_format, which has few values);
+# stored as categoricals in a compact inventory (see compact_inventory)
+COMPACT_FIELDS = ['object_osn', 'object_title', 'object_delivery_urn', 'object_oasis_urn', 'object_access',
+                  'object_tags', 'mms_id', 'file_format']
+
+def missing_fields(dataframe):
+    """
+    Get the required inventory fields (see INVENTORY_FIELDS) that a DataFrame lacks.
+
+    Parameter
+    ---------
+    dataframe : DataFrame
+
+    Return
+    ------
+    list
+    """
+    return [field for field in INVENTORY_FIELDS if field not in dataframe.columns]
+
+def _warn_missing_osn(caller, rows):
+    """
+    Private: Print a warning about inventory rows without an object_osn, which belong to no
+    digital object and are skipped: their number and the first few row labels.
+
+    Parameters
+    ----------
+    caller : str
+        e.g. FileInventory::get_objects
+    rows : Index
+        Labels of the rows without an object_osn.
+    """
+    if (len(rows) == 0):
+        return
+    print('{}: Warning - {} rows without an object_osn are skipped, at rows: {}{}'.format(caller, len(rows),
+                                                                                        list(rows[:10]),
+                                                                                        ' ...' if len(rows) > 10 else ''))
+
+def compact_inventory(inventory_df):
+    """
+    Convert an inventory DataFrame to its compact form. The COMPACT_FIELDS are stored as
+    categoricals, so that each distinct value (e.g. an object title) is stored once and
+    comparisons are made on integer codes. The other fields are stored as Arrow strings
+    if pyarrow is available (see columnar.available) and they hold only text, otherwise
+    as type object, as in FileInventory::from_file. Values are unchanged: a missing value
+    is NaN in both forms (code -1 in a categorical) and is never replaced by an empty string.
+
+    Parameter
+    ---------
+    inventory_df : DataFrame
+
+    Return
+    ------
+    DataFrame
+    """
+    dtypes = {}
+    for column in inventory_df.columns:
+        if column not in COMPACT_FIELDS:
+            dtypes[column] = _text_dtype(inventory_df[column])
+        elif not isinstance(inventory_df[column].dtype, pd.CategoricalDtype):
+            # object categories, so that values read back as in the default form
+            # (e.g. a python int rather than numpy.int64 for mms_id)
+            values = inventory_df[column].astype('object')
+            dtypes[column] = pd.CategoricalDtype(pd.Index(values.dropna().drop_duplicates(), dtype='object'))
+    return inventory_df.astype(dtypes)
+
+def _text_dtype(series):
+    """
+    Private: Get the compact type of a field that is not categorical: Arrow strings (with NaN
+    for a missing value) if pyarrow is available and the field holds only text, else object.
+
+    Return
+    ------
+    dtype
+    """
+    if columnar.available() and (pd.api.types.infer_dtype(series, skipna=True) == 'string'):
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    return 'object'
+
+def _compact_objects(inventory_df):
+    """
+    Private: Iterate over the objects of a compact inventory. Each object's DataFrame is
+    built in the default form (every field of type object) from the category codes: the
+    values of a categorical field are taken from its categories by code, so no
+    categorical DataFrame is grouped or converted per object.
+
+    Return
+    ------
+    iterator of tuple (str, DataFrame)
+        object_osn and the files of that object, in inventory order.
+    """
+    # per field: object array of values, and the codes into it (None: indexed by row)
+    sources = []
+    for column in inventory_df.columns:
+        series = inventory_df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # the categories, then NaN for code -1 (a missing value)
+            values = np.append(series.cat.categories.to_numpy(dtype='object'), np.nan)
+            sources.append((values, series.cat.codes.to_numpy()))
+        else:
+            sources.append((series.to_numpy(dtype='object'), None))
+    # one pass over object_osn: the row positions of each object from a stable sort of the codes
+    objects, osns = pd.factorize(inventory_df['object_osn'])
+    order = np.argsort(objects, kind='stable')
+    bounds = np.searchsorted(objects[order], np.arange(len(osns) + 1))
+    for i in range(len(osns)):
+        positions = order[bounds[i]:bounds[i + 1]]
+        block = np.empty((len(positions), len(sources)), dtype='object')
+        for j, (values, codes) in enumerate(sources):
+            block[:, j] = values[positions] if (codes is None) else values[codes[positions]]
+        # note: dtype object, so that pandas does not infer a string dtype for each field of each object
+        yield osns[i], pd.DataFrame(block, index=inventory_df.index[positions], columns=inventory_df.columns,
+                                    dtype='object')
+
+# file format -> role of the file in a digital object (see FileClassification);
+# the files of a role are ordered by format, in registration order
+FILE_FORMAT_ROLES = {'Extensible Markup Language':'mets',
+                     'JPEG 2000 JP2':'image',
+                     'JPEG':'image'}
+
+def register_file_format(file_format, role):
+    """
+    Register the role of a file format, e.g. register_file_format('MSFT-PNG', 'msft_img').
+
+    Parameters
+    ----------
+    file_format : str
+    role : str
+    """
+    FILE_FORMAT_ROLES[file_format] = role
+
+def get_role_formats(roles):
+    """
+    Get the file formats registered for a role, or for a list of roles (in that order),
+    e.g. get_role_formats('image') -> ['JPEG 2000 JP2', 'JPEG'].
+
+    Parameter
+    ---------
+    roles : str or list
+
+    Return
+    ------
+    list
+        File formats, in registration order within each role.
+    """
+    if isinstance(roles, str):
+        roles = [roles]
+    return [file_format for role in roles for file_format, format_role in FILE_FORMAT_ROLES.items() if format_role == role]
+
+# ocr file formats, by role
+OCR_FORMATS = {'ocr_txt':'Plain text'}
+for role, file_format in OCR_FORMATS.items():
+    register_file_format(file_format, role)
+
+class FileClassification():
+    """
+    The files of a DataFrame partitioned by role (see FILE_FORMAT_ROLES). The file_format
+    field is read once, when the instance is created; the files of a role are then taken
+    by position. One classification of a digital object's files is shared by PDSDocument,
+    MSFTInventory and OCRInventory.
+
+    Methods
+    -------
+    get_files : str or list
+        Get a DataFrame of the files of a role, or of a list of roles.
+    get_count : str or list
+        Get the number of files of a role, or of a list of roles.
+    get_dataframe : void
+        Get the classified DataFrame.
+    """
+    def __init__(self, dataframe):
+        """
+        Class constructor.
+
+        Parameter
+        ---------
+        dataframe : DataFrame
+            Must contain the file_format field.
+        """
+        self._dataframe = dataframe
+        # one pass: a code per row, then the row positions of each format from a stable sort of the codes
+        codes, formats = pd.factorize(dataframe['file_format'])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(formats) + 1))
+        # file format -> row positions, in DataFrame order
+        self._positions = {formats[i]:order[bounds[i]:bounds[i + 1]] for i in range(len(formats))}
+        # DataFrames already taken, keyed by tuple of roles
+        self._files = {}
+
+    def __get_positions(self, roles):
+        """
+        Private: Get the row positions of the files of some roles.
+
+        Return
+        ------
+        list of array
+        """
+        if isinstance(roles, str):
+            roles = [roles]
+        positions = []
+        for role in roles:
+            for file_format, format_role in FILE_FORMAT_ROLES.items():
+                if (format_role == role) and (file_format in self._positions):
+                    positions.append(self._positions.get(file_format))
+        return positions
+
+    def get_files(self, roles):
+        """
+        Get a DataFrame of the files of a role, or of a list of roles (in that order).
+        The DataFrame is taken once and then shared by all callers.
+
+        Parameter
+        ---------
+        roles : str or list
+
+        Return
+        ------
+        DataFrame
+        """
+        key = (roles,) if isinstance(roles, str) else tuple(roles)
+        files = self._files.get(key)
+        if (files is None):
+            positions = self.__get_positions(roles)
+            if (len(positions) == 0):
+                files = self._dataframe.iloc[0:0]
+            elif (len(positions) == 1):
+                files = self._dataframe.iloc[positions[0]]
+            else:
+                files = self._dataframe.iloc[np.concatenate(positions)]
+            self._files[key] = files
+        return files
+
+    def get_count(self, roles):
+        """
+        Get the number of files of a role, or of a list of roles.
+
+        Return
+        ------
+        int
+        """
+        return sum(len(positions) for positions in self.__get_positions(roles))
+
+    def get_dataframe(self):
+        """
+        Get the classified DataFrame.
+
+        Return
+        ------
+        DataFrame
+        """
+        return self._dataframe
+
 class FileInventory():
     """
     Class that manages metadata about digital objects' files.
-    File metadata is expected to be in comma-delimited format. 
+    File metadata is expected to be in comma-delimited format, or in Parquet format
+    (a .parquet file, or a directory partitioned by object; see columnar).
     Metadata must include the fields below.
 
     Required File Inventory Fields
@@ -41,12 +318,24 @@ class FileInventory():
     file_format : str
         Format for the file,for instance JP2 or JSON
 
+    Compact Inventories
+    -------------------
+    from_file takes compact=True to store the repeated per-object fields as categoricals
+    (see compact_inventory). A compact inventory has the same values and is used in the
+    same way as the default one, with a fraction of the memory; whole-inventory filters
+    compare integer codes. The DataFrames of single objects yielded by get_objects have
+    type object fields in both forms.
+
     Methods
     -------
     from_dataframe : DataFrame
         Set a inventory from a DataFrame.
-    from_file : str
+    from_file : str, bool
         Set an inventory from a named file.
+    to_file : str, bool
+        Write the inventory to a CSV or Parquet file.
+    stream_objects : str, int
+        Read an inventory file in chunks, yielding one DataFrame per digital object.
     get_inventory : 
         Get the current file inventory DataFrame.
     get_inventory_metadata : 
@@ -57,6 +346,10 @@ class FileInventory():
     get_files (field, value) : str, str
         Get a DataFrame, if any, containing the list of files that 
         match field=value.
+    get_objects :
+        Iterate over (object_osn, DataFrame) pairs, one per digital object.
+    invalidate_index :
+        Discard the cached lookup index after changing the inventory in place.
     get_metadata : DataFrame
         Returns list of dict of inventory contents, if any.
     initd :
@@ -66,31 +359,18 @@ class FileInventory():
         """Class constructor. Returns unitialized class instance."""
 
         # valid inventory fields
-        self._constants = [
-            # urn for the digital object
-            'object_delivery_urn', 
-            # owner-supplied name for the digital object 
-            'object_osn', 
-            # urn for the oasis finding aid associated with the digital object
-            'object_oasis_urn', 
-            # urn for the file
-            'file_urn', 
-            # format of the file, e.g., JSON, JP2
-            'file_format', 
-            # owner-supplied name for the file
-            'file_osn', 
-            # title assigned to the digital object (and propagated to its associated files)
-            'object_title', 
-            # file access, either P (public) or R (restricted)
-            'object_access', 
-            # name of the file, including its extension
-            'filename', 
-            # full path to the file
-            'file_path'] 
+        self._constants = list(INVENTORY_FIELDS)
         
         # the file inventory dataframe
         self._inventory_df = pd.DataFrame()
         
+        # fields with a cached lookup index
+        self._indexed_fields = ['object_osn', 'filename', 'file_format', 'file_urn']
+        # cached lookup index: field -> {value: row positions}, built lazily
+        self._index = {}
+        # dataframe the cached index was built from
+        self._index_df = None
+        
         # instance initialized?
         self._initd = False
     
@@ -120,7 +400,7 @@ class FileInventory():
         
         # get the field names
         for field in self._constants:
-            if field not in self._inventory_df.columns:
+            if field not in inventory_df.columns:
                 raise ValueError('FileInventory::__validate: Error - missing field: {}'.format(field))
         
         return True
@@ -163,14 +443,16 @@ class FileInventory():
             self._initd = True
             return True
     
-    def from_file(self, filename):
+    def from_file(self, filename, compact=False):
         """
         Initialize an inventory from a file
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         filename : str
             Path of file to read
+        compact : bool, optional
+            Store the repeated per-object fields as categoricals (default: False).
         
         Returns
         -------
@@ -180,12 +462,25 @@ class FileInventory():
         if (not filename):
             return False
         
-        # read the inventory file
-        inventory_df = pd.read_csv(filename, sep=',',header=0)
+        if columnar.is_parquet(filename):
+            # read the parquet file, already typed
+            inventory_df = columnar.read_parquet(filename)
+            self._inventory_df = compact_inventory(inventory_df) if (compact == True) else inventory_df
+        elif (compact == True):
+            # read the inventory file; text fields are parsed directly into categoricals,
+            # so the repeated values are never all held as separate strings
+            # note: mms_id is parsed as in the default form, then converted; the other
+            # compact fields are read as text, even if a field only holds numbers
+            dtype = {field:'category' for field in COMPACT_FIELDS if field != 'mms_id'}
+            inventory_df = pd.read_csv(filename, sep=',', header=0, dtype=dtype)
+            self._inventory_df = compact_inventory(inventory_df)
+        else:
+            # read the inventory file
+            inventory_df = pd.read_csv(filename, sep=',',header=0)
 
-        # cast all fields to type object
-        # note: this avoids having blank fields default to NaN/float64
-        self._inventory_df = inventory_df.astype('object')
+            # cast all fields to type object
+            # note: this avoids having blank fields default to NaN/float64
+            self._inventory_df = inventory_df.astype('object')
         
         try:
             # validate the inventory_df
@@ -201,6 +496,101 @@ class FileInventory():
             self._initd = True
             return True
 
+    def to_file(self, filename, partitioned=False):
+        """
+        Write the inventory to a file: Parquet if filename ends in .parquet or .pq,
+        otherwise CSV (see columnar.write_table).
+
+        Parameters
+        ----------
+        filename : str
+            Path of file (or, if partitioned, of directory) to write
+        partitioned : bool, optional
+            Write a Parquet dataset with one partition per object (default: False).
+
+        Return
+        ------
+        bool
+        """
+        # instance must be initialized
+        if ((self._initd == False) or (not filename)):
+            return False
+        return columnar.write_table(self._inventory_df, filename, partitioned=partitioned)
+
+    def stream_objects(self, filename, chunksize=100000):
+        """
+        Read an inventory file in chunks and yield the files of one digital object at a time,
+        so that very large inventories are processed with bounded memory.
+        A first pass reads only the object_osn column to find the last row of each object;
+        the second pass buffers an object's rows until its last row has been read.
+        Memory therefore depends on how many objects are interleaved in the file, 
+        not on its size. The instance's own inventory is not changed.
+        Rows without an object_osn belong to no object; they are reported and skipped.
+
+        Parameters
+        ----------
+        filename : str
+            Path of file to read
+        chunksize : int, optional
+            Number of rows read at a time (default: 100000)
+
+        Return
+        ------
+        iterator of tuple (str, DataFrame)
+            object_osn and the files of that object, in order of completion.
+        """
+        # filename must not be empty string
+        if (not filename):
+            return
+        
+        # read parquet files in record batches, and csv files in chunks
+        def read_chunks(columns=None):
+            if columnar.is_parquet(filename):
+                return columnar.iter_parquet(filename, chunksize=chunksize, columns=columns)
+            return pd.read_csv(filename, sep=',', header=0, usecols=columns, chunksize=chunksize)
+
+        # first pass: the last row of each object, and the rows of no object
+        last_row = {}
+        missing = []
+        try:
+            for chunk in read_chunks(['object_osn']):
+                osns = chunk['object_osn']
+                last_row.update(osns.index.to_series().groupby(osns.to_numpy()).max().to_dict())
+                missing.extend(osns.index[osns.isna()])
+        except ValueError as e:
+            # object_osn column is missing
+            print('FileInventory::stream_objects: Error - {}'.format(e))
+            return
+        _warn_missing_osn('FileInventory::stream_objects', pd.Index(missing))
+        
+        # second pass: buffer rows until each object is complete
+        buffers = {}
+        validated = False
+        for chunk in read_chunks():
+            # cast all fields to type object, as in from_file
+            chunk = chunk.astype('object')
+            # validate the fields once, on the first chunk
+            if (validated == False):
+                try:
+                    self.__validate(chunk)
+                except (TypeError, ValueError) as e:
+                    print('FileInventory::stream_objects: Error - {}'.format(e))
+                    return
+                validated = True
+            for osn, files in chunk.groupby('object_osn', sort=False):
+                if osn not in buffers:
+                    buffers[osn] = []
+                buffers[osn].append(files)
+            # yield the objects whose last row has been read, in order of first appearance
+            end = chunk.index[-1]
+            complete = [osn for osn in buffers.keys() if last_row.get(osn) <= end]
+            for osn in complete:
+                files = buffers.pop(osn)
+                if (len(files) == 1):
+                    yield osn, files[0]
+                else:
+                    yield osn, pd.concat(files)
+
     def get_inventory(self):
         """
         Return the instance's inventory DataFrame.
@@ -230,7 +620,7 @@ class FileInventory():
             return False, None
         
         # look for the filename in the full inventory
-        file = self._inventory_df.loc[self._inventory_df['filename']== filename]
+        file = self.__lookup('filename', filename)
         if (file.empty == False):
             # if the return dataframe contains files
             # return True and the dataframe
@@ -263,9 +653,65 @@ class FileInventory():
             raise NameError('FileInventory::get_files - invalid field name')
             
         # query the inventory for matching files
+        if field in self._indexed_fields:
+            return self.__lookup(field, value)
         files = self._inventory_df[self._inventory_df[field] == value]
         return files
 
+    def get_objects(self):
+        """
+        Iterate over the digital objects in the inventory in a single pass.
+
+        Rows without an object_osn belong to no object; they are reported and skipped.
+
+        Return
+        ------
+        iterator of tuple (str, DataFrame)
+            object_osn and the files of that object, in inventory order.
+        """
+        # is the inventory empty?
+        if (self._inventory_df.empty == True):
+            return
+        osns = self._inventory_df['object_osn']
+        _warn_missing_osn('FileInventory::get_objects', osns.index[osns.isna()])
+        # a compact inventory: each object's DataFrame is built from the category codes
+        if any(isinstance(dtype, pd.CategoricalDtype) for dtype in self._inventory_df.dtypes):
+            yield from _compact_objects(self._inventory_df)
+            return
+        for osn, files in self._inventory_df.groupby('object_osn', sort=False):
+            yield osn, files
+
+    def invalidate_index(self):
+        """
+        Discard the cached lookup index. 
+        Call after changing the inventory DataFrame in place; 
+        replacing the inventory invalidates the index automatically.
+        """
+        self._index = {}
+        self._index_df = None
+
+    def __lookup(self, field, value):
+        """
+        Private: Get the rows with field == value using the cached index.
+        The index for a field is built on first use (one groupby pass) and
+        rebuilt if the inventory DataFrame has been replaced.
+
+        Return
+        ------
+        DataFrame
+        """
+        # rebuild the index if the inventory has been replaced
+        if (self._index_df is not self._inventory_df):
+            self._index = {}
+            self._index_df = self._inventory_df
+        # build the index for this field
+        if field not in self._index:
+            self._index[field] = self._inventory_df.groupby(field, sort=False, observed=True).indices
+        positions = self._index[field].get(value)
+        if positions is None:
+            return self._inventory_df.iloc[0:0]
+        return self._inventory_df.iloc[positions]
+
     def get_owner_supplied_names (self):
         """
         Get the unique owner-supplied names in the inventory.
@@ -283,7 +729,8 @@ class FileInventory():
             return []
     
         # get the unique ids
-        return self._inventory_df['object_osn'].unique()
+        # note: an array for a compact inventory too, where unique() returns a Categorical
+        return self._inventory_df['object_osn'].drop_duplicates().to_numpy()
 
     def initd(self):
         """
@@ -318,19 +765,21 @@ class OCRInventory (FileInventory):
 
         FileInventory.__init__(self)
 
-        # valid ocr formats
-        self._ocr_format = {'ocr_txt':'Plain text'}
+        # roles of the ocr files; their formats are registered in FILE_FORMAT_ROLES (see OCR_FORMATS)
+        self._ocr_roles = list(OCR_FORMATS.keys())
         
         # init status
         self._initd = False
         
-    def __validate(self, dataframe):
+    def __validate(self, dataframe, classification=None):
         """
         Private: Validate OCR inventory
         
-        Parameter
-        ---------
+        Parameters
+        ----------
         dataframe : DataFrame
+        classification : FileClassification, optional
+            Classification of the DataFrame's files (default: classified here).
 
         Raises
         ------
@@ -358,31 +807,32 @@ class OCRInventory (FileInventory):
         if (len(unique_osn) > 1):
             raise ValueError('OCRInventory::__validate: DataFrame must contain no more than one owner-supplied name')  
             
-        # inspect the contents of the dataframe
-        fi = FileInventory()
-        status = fi.from_dataframe(dataframe)
-        if (status == False):
+        # the dataframe must have the inventory fields
+        if (len(missing_fields(dataframe)) > 0):
             # return an empty dataframe
             return pd.DataFrame()
         
         # get the OCR files from the inventory
-        ocr_txt = fi.get_files('file_format', self._ocr_format.get('ocr_txt'))
-        ocr_txt_count = len(ocr_txt)
+        if (classification == None):
+            classification = FileClassification(dataframe)
+        ocr_txt_count = classification.get_count(self._ocr_roles)
         # if there are no ocr files 
         if (ocr_txt_count == 0):
             # return an empty dataframe
             return pd.DataFrame()
         
         # all error conditions have been passed, return the inventory
-        return ocr_txt
+        return classification.get_files(self._ocr_roles)
         
-    def from_dataframe(self, inventory_df):
+    def from_dataframe(self, inventory_df, classification=None):
         """
         Initialize an OCR inventory from a DataFrame.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         inventory_df : DataFrame
+        classification : FileClassification, optional
+            Classification of the DataFrame's files, e.g. shared by a digital object (default: classified here).
 
         Raises
         ------
@@ -398,7 +848,7 @@ class OCRInventory (FileInventory):
         # try to validate the inventory dataframe
         try:
             # validate the inventory_df
-            self._inventory_df = self.__validate(inventory_df)
+            self._inventory_df = self.__validate(inventory_df, classification)
         # catch exceptions
         except TypeError:
             # input must be a dataframe
@@ -432,12 +882,16 @@ class OCRInventory (FileInventory):
             return False
                 # read the inventory file
 
-        # read the file
-        inventory_df = pd.read_csv(filename, sep=',',header=0)
+        if columnar.is_parquet(filename):
+            # read only the ocr files
+            self._inventory_df = columnar.read_parquet(filename, file_format=get_role_formats(self._ocr_roles))
+        else:
+            # read the file
+            inventory_df = pd.read_csv(filename, sep=',',header=0)
 
-        # cast all fields to type object
-        # note: this avoids having blank fields default to NaN/float64
-        self._inventory_df = inventory_df.astype('object')
+            # cast all fields to type object
+            # note: this avoids having blank fields default to NaN/float64
+            self._inventory_df = inventory_df.astype('object')
         
         try:
             # validate the inventory_df
@@ -576,6 +1030,8 @@ class PDSDocument (DigitalObject):
         Get a DataFrame of image files.
     get_file_formats : void
         Get the list of valid file formats.
+    get_classification : void
+        Get the classification of the files by role.
     initd : void
         Get instance initialization status.
     """
@@ -587,19 +1043,23 @@ class PDSDocument (DigitalObject):
         self._metadata = {}
         # DataFrame containing metadata for each file in the digital object
         self._files_df = None
+        # files of the digital object by role (mets, image, ...)
+        self._classification = None
         # default file formats for PDSDocument objects
         # note: for future projects, this list may need to be updated to reflect additional image file formats
         self._file_formats = ['Extensible Markup Language','JPEG 2000 JP2','JPEG']
         # initialized?
         self._initd = False
 
-    def __validate(self, dataframe):
+    def __validate(self, dataframe, classification=None):
         """
         Private: Validate that files in DataFrame match PDS Document expectations.
         
-        Parameter
-        ---------
+        Parameters
+        ----------
         dataframe : DataFrame
+        classification : FileClassification, optional
+            Classification of the DataFrame's files (default: classified here).
 
         Raises
         ------
@@ -613,7 +1073,7 @@ class PDSDocument (DigitalObject):
 
         Return
         ------
-        bool
+        FileClassification
         """
 
         # input must be DataFrame
@@ -628,44 +1088,39 @@ class PDSDocument (DigitalObject):
             print('PDSDocument::__validate - empty DataFrame')
             raise ValueError('PDSDocument::__validate - DataFrame cannot be empty')       
         
-        # inspect the contents of the dataframe
-        fi = FileInventory()
-        status = fi.from_dataframe(dataframe)
-        
         # there can only be one owner-supplied name in the DataFrame
         unique_osn = dataframe['object_osn'].unique()
         if (len(unique_osn) > 1):
             raise ValueError('PDSDocument::__validate: DataFrame must contain no more than one owner-supplied name')  
         
-        # get the mets file
-        mets = fi.get_files('file_format', 'Extensible Markup Language')
+        # classify the files by role, in a single pass
+        if (classification == None):
+            classification = FileClassification(dataframe)
         
         # if there is more than one mets file in the dataframe, error
-        if (len(mets) > 1): 
+        if (classification.get_count('mets') > 1): 
             raise ValueError('PDSDocument::__validate: Error - too many METS files in DataFrame') 
             
-        # get the image files
-        jp2 = fi.get_files('file_format', 'JPEG 2000 JP2')
-        jpeg = fi.get_files('file_format', 'JPEG')
-        images = pd.concat([jp2, jpeg])
         # if there are no image files of either format
-        if (images.empty == True):
+        if (classification.get_count('image') == 0):
             print('no images')
             raise ValueError('PDSDocument::__validate: Error - DataFrame must contain at least one image file');
         
         # all error conditions have been passed
-        return True
+        return classification
     
     # method: from_dataframe
     # initialize the PDS Document using a dataframe
     # return: True or False
-    def from_dataframe(self, dataframe):
+    def from_dataframe(self, dataframe, classification=None):
         """
         Initialize the PDS object with information stored in a DataFrame.
         
-        Parameter
-        ---------
+        Parameters
+        ----------
         dataframe : DataFrame
+        classification : FileClassification, optional
+            Classification of the DataFrame's files (default: classified here).
 
         Return
         ------
@@ -674,20 +1129,15 @@ class PDSDocument (DigitalObject):
         """
         # try to validate the dataframe
         try:
-            self.__validate(dataframe)
+            classification = self.__validate(dataframe, classification)
         except:
             return False
         else:
             # otherwise, extract metadata from the dataframe
-            fi = FileInventory()
-            # initialize the FileInventory
-            fi.from_dataframe(dataframe)
-            mets = fi.get_files('file_format', 'Extensible Markup Language')
-            jp2 = fi.get_files('file_format', 'JPEG 2000 JP2')
-            jpeg = fi.get_files('file_format', 'JPEG')
-            images = pd.concat([jp2,jpeg])
-            # set the internal inventory
-            self._files_df = pd.concat([mets, images])
+            self._classification = classification
+            mets = classification.get_files('mets')
+            # set the internal inventory: the mets file, then the images
+            self._files_df = classification.get_files(['mets', 'image'])
             
             # get the (integer) index of the mets file in the dataframe
             # for details, see: https://pandas.pydata.org/docs/reference/api/pandas.Index.html
@@ -747,8 +1197,7 @@ class PDSDocument (DigitalObject):
         ------
         DataFrame
         """
-        # note: no need to handle exception, 'file_format' is valid field
-        return self._files_df[self._files_df['file_format'] == 'Extensible Markup Language']      
+        return self._classification.get_files('mets')
     
     def get_image_files(self):
         """
@@ -758,12 +1207,8 @@ class PDSDocument (DigitalObject):
         ------
         DataFrame
         """
-        # note: no need to handle exception, 'file_format' is valid field
-        jp2 = self._files_df[self._files_df['file_format'] == 'JPEG 2000 JP2']
-        jpeg = self._files_df[self._files_df['file_format'] == 'JPEG']
-        # concatenate the dataframes
-        images = pd.concat([jp2, jpeg])
-        return images
+        # jp2 files, then jpeg files
+        return self._classification.get_files('image')
 
     def get_files(self):
         """
@@ -785,6 +1230,17 @@ class PDSDocument (DigitalObject):
         List
         """
         return self._file_formats
+
+    def get_classification(self):
+        """
+        Get the classification of the PDSDocument's files by role, to share
+        with the inventories of the same digital object.
+
+        Return
+        ------
+        FileClassification
+        """
+        return self._classification
     
     def initd(self):
         """
@@ -0,0 +1,403 @@
+"""
+SAEF metrics.
+
+Timing and throughput instrumentation for SAEFDataset operations, the ddu functions
+and the Dataverse HTTP client. Code is wrapped in timed spans (e.g. ticket, storage_put,
+hash, finalize, lock_wait) and counts bytes, files and requests in counters. Spans are
+aggregated per name (count, total, min and max seconds) and, if a records file is open,
+queued for a writer thread that appends them to it as JSON lines together with their
+fields (e.g. object, file), so instrumented code never waits for the disk. Aggregates
+are exported as a JSON summary or a Prometheus textfile (node_exporter textfile collector).
+A Progress reporter prints the objects done, rate and ETA of a batch run.
+
+All instrumented code reports to a shared registry (see default_metrics), in the same
+way as HTTP calls share dvclient.default_client.
+"""
+import contextlib
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+class Metrics:
+    """
+    Thread-safe registry of timed spans and counters.
+
+    Methods
+    -------
+    span : str, **fields
+        Context manager that times a block of code.
+    observe : str, float, **fields
+        Record a span measured by the caller.
+    count : str, float, **labels
+        Add a value to a counter.
+    get_counter : str, **labels
+        Get the value of a counter, summed over any labels not given.
+    open_records : str
+        Write every span, as a JSON line, to a file (from a writer thread).
+    close_records : void
+        Write the queued spans and close the records file.
+    get_summary : void
+        Get the span aggregates and counters.
+    write_json : str
+        Write the summary to a JSON file.
+    write_prometheus : str
+        Write the summary to a Prometheus textfile.
+    reset : void
+        Discard the spans and counters.
+    """
+    def __init__(self, prefix='saef'):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        prefix : str, optional
+            Prefix of the Prometheus metric names (default: saef).
+        """
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        # queue of span records and the thread writing them to the records file, if open
+        self._records = None
+        self._writer = None
+        self.reset()
+
+    def reset(self):
+        """
+        Discard the spans and counters.
+        """
+        with self._lock:
+            # span aggregates keyed by name: count, sum, min, max
+            self._spans = {}
+            # counters keyed by (name, sorted label items)
+            self._counters = {}
+            self._started = time.time()
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """
+        Time the enclosed block of code as a span.
+        A block that raises is recorded with error=<exception type>.
+
+        Parameters
+        ----------
+        name : str
+            Span name, e.g. storage_put.
+        fields : optional
+            Written to the records file only (e.g. object, file, bytes).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            fields['error'] = type(e).__name__
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **fields)
+
+    def observe(self, name, seconds, **fields):
+        """
+        Record a span measured by the caller.
+
+        Parameters
+        ----------
+        name : str
+        seconds : float
+        fields : optional
+            Written to the records file only.
+        """
+        with self._lock:
+            entry = self._spans.get(name)
+            if (entry == None):
+                self._spans[name] = {'count':1, 'sum':seconds, 'min':seconds, 'max':seconds}
+            else:
+                entry['count'] = entry.get('count') + 1
+                entry['sum'] = entry.get('sum') + seconds
+                entry['min'] = min(entry.get('min'), seconds)
+                entry['max'] = max(entry.get('max'), seconds)
+            records = self._records
+        # the record is written by the writer thread, outside the lock
+        if (records != None):
+            record = {'time':datetime.datetime.now().isoformat(timespec='milliseconds'), 'span':name,
+                      'seconds':round(seconds, 6)}
+            record.update(fields)
+            records.put(record)
+
+    def count(self, name, value=1, **labels):
+        """
+        Add a value to a counter.
+
+        Parameters
+        ----------
+        name : str
+            Counter name, e.g. bytes_uploaded.
+        value : float, optional
+            Default: 1.
+        labels : optional
+            Low-cardinality labels, e.g. endpoint='api'; each combination is a separate counter.
+        """
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def get_counter(self, name, **labels):
+        """
+        Get the value of a counter, summed over any labels not given.
+
+        Return
+        ------
+        float
+        """
+        wanted = set((k, str(v)) for k, v in labels.items())
+        with self._lock:
+            return sum(value for (counter, items), value in self._counters.items()
+                       if (counter == name) and wanted.issubset(items))
+
+    def open_records(self, filename):
+        """
+        Write every span, as a JSON line, to a file (appended to). Spans are queued
+        and written by a writer thread.
+
+        Return
+        ------
+        bool
+        """
+        try:
+            stream = open(filename, 'a')
+        except OSError as e:
+            print('Metrics::open_records: Error - {}'.format(e))
+            return False
+        self.close_records()
+        records = queue.SimpleQueue()
+        writer = threading.Thread(target=self.__write_records, args=(records, stream), name='saef-metrics', daemon=True)
+        writer.start()
+        with self._lock:
+            self._records = records
+            self._writer = writer
+        return True
+
+    def close_records(self):
+        """
+        Write the queued spans and close the records file.
+        """
+        with self._lock:
+            records, writer = self._records, self._writer
+            self._records = None
+            self._writer = None
+        if (records != None):
+            records.put(None)
+            writer.join()
+
+    def __write_records(self, records, stream):
+        """
+        Private: Writer thread: append the queued records to the stream until None is queued.
+        Records queued together are written, and flushed, together.
+        """
+        with stream:
+            while True:
+                batch = [records.get()]
+                while (batch[-1] != None) and (not records.empty()):
+                    batch.append(records.get())
+                stream.write(''.join(json.dumps(record, default=str) + '\n' for record in batch if record != None))
+                stream.flush()
+                if (batch[-1] == None):
+                    return
+
+    def get_summary(self):
+        """
+        Get the span aggregates and counters.
+
+        Return
+        ------
+        dict
+            elapsed (seconds since reset), spans (keyed by name: count, sum, min, max, mean)
+            and counters (list of name, labels, value).
+        """
+        with self._lock:
+            spans = {}
+            for name, entry in self._spans.items():
+                spans[name] = dict(entry)
+                spans[name]['mean'] = entry.get('sum') / entry.get('count')
+            counters = [{'name':name, 'labels':dict(items), 'value':value}
+                        for (name, items), value in sorted(self._counters.items())]
+            return {'elapsed':time.time() - self._started, 'spans':spans, 'counters':counters}
+
+    def write_json(self, filename):
+        """
+        Write the summary to a JSON file.
+
+        Return
+        ------
+        bool
+        """
+        return self.__write(filename, json.dumps(self.get_summary(), indent=2))
+
+    def write_prometheus(self, filename):
+        """
+        Write the summary to a Prometheus textfile: spans as <prefix>_span_seconds
+        summaries (sum and count per span) and counters as <prefix>_<name>_total.
+
+        Return
+        ------
+        bool
+        """
+        summary = self.get_summary()
+        lines = ['# HELP {}_span_seconds Time spent in each instrumented phase.'.format(self._prefix),
+                 '# TYPE {}_span_seconds summary'.format(self._prefix)]
+        for name, entry in sorted(summary.get('spans').items()):
+            lines.append('{}_span_seconds_sum{{span="{}"}} {}'.format(self._prefix, name, entry.get('sum')))
+            lines.append('{}_span_seconds_count{{span="{}"}} {}'.format(self._prefix, name, entry.get('count')))
+        typed = set()
+        for counter in summary.get('counters'):
+            metric = '{}_{}_total'.format(self._prefix, counter.get('name'))
+            if metric not in typed:
+                lines.append('# TYPE {} counter'.format(metric))
+                typed.add(metric)
+            labels = ','.join('{}="{}"'.format(k, v) for k, v in counter.get('labels').items())
+            lines.append('{}{} {}'.format(metric, '{' + labels + '}' if labels else '', counter.get('value')))
+        return self.__write(filename, '\n'.join(lines) + '\n')
+
+    def __write(self, filename, text):
+        """
+        Private: Write a file atomically, so that a collector never reads it half written.
+        """
+        temporary = '{}.{}.tmp'.format(filename, os.getpid())
+        try:
+            with open(temporary, 'w') as f:
+                f.write(text)
+            os.replace(temporary, filename)
+        except OSError as e:
+            print('Metrics::write: Error - {}'.format(e))
+            return False
+        return True
+
+class Progress:
+    """
+    Periodic progress readout for a batch run: objects done, files and bytes
+    uploaded (from the metrics counters), rate and estimated time remaining.
+
+    Methods
+    -------
+    start : void
+        Start printing the readout every interval seconds.
+    advance : int
+        Count objects as done.
+    stop : void
+        Stop, and print a final readout.
+    get_readout : void
+        Get the current readout line.
+    """
+    def __init__(self, total, interval=10, metrics=None, stream=None):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        total : int
+            Number of objects in the run (None if unknown: no ETA).
+        interval : float, optional
+            Seconds between two readouts (default: 10).
+        metrics : Metrics, optional
+            Source of the files_uploaded and bytes_uploaded counters (default: default_metrics()).
+        stream : file, optional
+            Default: sys.stderr.
+        """
+        self._total = total
+        self._interval = interval
+        self._metrics = metrics if metrics else default_metrics()
+        self._stream = stream if stream else sys.stderr
+        self._done = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._started = time.monotonic()
+
+    def start(self):
+        """
+        Start printing the readout every interval seconds.
+        """
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self.__run, name='saef-progress', daemon=True)
+        self._thread.start()
+
+    def advance(self, n=1):
+        """
+        Count objects as done.
+        """
+        with self._lock:
+            self._done = self._done + n
+
+    def stop(self):
+        """
+        Stop, and print a final readout.
+        """
+        self._stopped.set()
+        if (self._thread != None):
+            self._thread.join()
+            self._thread = None
+        print(self.get_readout(), file=self._stream, flush=True)
+
+    def get_readout(self):
+        """
+        Get the current readout line, e.g.
+        120/1000 objects (12.0%) | 2400 files, 1.2 GB | 0.50 objects/s | elapsed 0:04:00 | ETA 0:29:20
+
+        Return
+        ------
+        str
+        """
+        with self._lock:
+            done = self._done
+        elapsed = time.monotonic() - self._started
+        rate = done / elapsed if elapsed > 0 else 0
+        files = int(self._metrics.get_counter('files_uploaded'))
+        size = self._metrics.get_counter('bytes_uploaded')
+        if self._total:
+            position = '{}/{} objects ({:.1%})'.format(done, self._total, done / self._total)
+        else:
+            position = '{} objects'.format(done)
+        if self._total and (rate > 0):
+            eta = str(datetime.timedelta(seconds=int((self._total - done) / rate)))
+        else:
+            eta = 'unknown'
+        return '{} | {} files, {:.1f} GB | {:.2f} objects/s | elapsed {} | ETA {}'.format(
+            position, files, size / 1e9, rate, datetime.timedelta(seconds=int(elapsed)), eta)
+
+    def __run(self):
+        """
+        Private: Readout thread.
+        """
+        while not self._stopped.wait(self._interval):
+            print(self.get_readout(), file=self._stream, flush=True)
+
+# shared registry used by the instrumented code
+_default_metrics = Metrics()
+
+def default_metrics():
+    """
+    Get the shared registry that SAEFDataset, the ddu functions and DataverseClient report to.
+    """
+    return _default_metrics
+
+def span(name, **fields):
+    """
+    Time a block of code in the shared registry (see Metrics.span).
+    """
+    return _default_metrics.span(name, **fields)
+
+def observe(name, seconds, **fields):
+    """
+    Record a span measured by the caller in the shared registry (see Metrics.observe).
+    """
+    _default_metrics.observe(name, seconds, **fields)
+
+def count(name, value=1, **labels):
+    """
+    Add a value to a counter of the shared registry (see Metrics.count).
+    """
+    _default_metrics.count(name, value, **labels)
+
+# end file
@@ -0,0 +1,571 @@
+"""
+Mock Dataverse
+
+In-process stand-in for a Dataverse installation and its S3 direct upload store,
+implementing the native API endpoints used by this project: dataset creation,
+collection contents, dataset search, upload urls (single and multipart), S3-style PUT,
+addFiles, editMetadata, locks, versions, dataset metadata and publish.
+Latency, bandwidth, error rates and dataset locks can be injected, and every
+request is counted, so that ingest performance can be measured without a live
+installation (see benchmark.py).
+
+Usage:
+    mock = MockDataverse(latency=0.02, bandwidth=50e6)
+    mock.start()
+    client = dvclient.DataverseClient(mock.base_url, mock.api_token)
+    ...
+    mock.stop()
+"""
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class MockDataverse:
+    """
+    In-process mock of a Dataverse installation and its S3 upload store.
+
+    Methods
+    -------
+    start : void
+        Start the server in a background thread.
+    stop : void
+        Stop the server.
+    add_dataset : str, dict
+        Create a dataset directly, e.g. to populate a collection.
+    lock_dataset : str, str, float
+        Set a lock on a dataset for a number of seconds.
+    get_dataset : str
+        Get the state of a dataset.
+    get_stats : void
+        Get the request counters, bytes received and injected errors.
+    reset_stats : void
+        Reset the counters.
+    """
+    def __init__(self, api_token='mock-api-token', host='127.0.0.1', port=0, latency=0.0, storage_latency=0.0,
+                 bandwidth=None, error_rate=0.0, storage_error_rate=0.0, part_size=None, ingest_lock=0.0,
+                 publish_lock=0.0, authority='10.5072', seed=None):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        api_token : str, optional
+            API key the native API accepts (default: mock-api-token).
+        host : str, optional
+        port : int, optional
+            0 picks a free port (default).
+        latency : float, optional
+            Seconds added to every native API response (default: 0).
+        storage_latency : float, optional
+            Seconds added to every storage PUT response (default: 0).
+        bandwidth : float, optional
+            Storage PUT bandwidth, in bytes per second; None for unlimited.
+        error_rate : float, optional
+            Fraction of native API requests answered 503 (default: 0).
+        storage_error_rate : float, optional
+            Fraction of storage PUTs answered 503 (default: 0).
+        part_size : int, optional
+            Files larger than part_size bytes get a multipart upload layout; None for single PUTs only.
+        ingest_lock : float, optional
+            Seconds an Ingest lock is held after addFiles adds a tabular file (default: 0).
+        publish_lock : float, optional
+            Seconds a finalizePublication lock is held after a publish request (default: 0).
+        authority : str, optional
+            DOI authority of the created datasets (default: 10.5072).
+        seed : int, optional
+            Seed of the error injection.
+        """
+        self.api_token = api_token
+        self.latency = latency
+        self.storage_latency = storage_latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.storage_error_rate = storage_error_rate
+        self.part_size = part_size
+        self.ingest_lock = ingest_lock
+        self.publish_lock = publish_lock
+        self._authority = authority
+        self._random = random.Random(seed)
+        self._host = host
+        self._port = port
+        self._server = None
+        self._thread = None
+        # datasets keyed by persistent id; database ids map to persistent ids
+        self._datasets = {}
+        self._dbids = {}
+        self._next_dbid = 1
+        self._next_file_id = 1
+        # storage objects keyed by storage identifier: size, and the parts of multipart uploads
+        self._storage = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        """
+        Installation url of the running mock, e.g. http://127.0.0.1:50123
+        """
+        return 'http://{}:{}'.format(self._host, self._server.server_address[1])
+
+    def start(self):
+        """
+        Start the server in a background thread.
+
+        Return
+        ------
+        str
+            Installation url.
+        """
+        mock = self
+
+        class Handler(_MockHandler):
+            pass
+        Handler.mock = mock
+        self._server = ThreadingHTTPServer((self._host, self._port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mockdv', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_stats(self):
+        """
+        Reset the request counters.
+        """
+        with getattr(self, '_lock', threading.Lock()):
+            self._stats = {'requests':{}, 'bytes_received':0, 'errors_injected':0, 'files_added':0}
+
+    def get_stats(self):
+        """
+        Get the request counters, bytes received and injected errors.
+
+        Return
+        ------
+        dict
+            requests (count per endpoint), total_requests, bytes_received, errors_injected, files_added
+        """
+        with self._lock:
+            stats = json.loads(json.dumps(self._stats))
+        stats['total_requests'] = sum(stats.get('requests').values())
+        return stats
+
+    def add_dataset(self, collection, metadata_blocks=None):
+        """
+        Create a dataset directly, e.g. to populate a collection for a crawl.
+
+        Parameters
+        ----------
+        collection : str
+            Collection alias.
+        metadata_blocks : dict, optional
+            Metadata blocks of the dataset version.
+
+        Return
+        ------
+        str
+            Persistent id.
+        """
+        with self._lock:
+            return self.__create_dataset(collection, metadata_blocks)
+
+    def get_datasets(self, collection=None):
+        """
+        Get the persistent ids of the datasets, in creation order.
+
+        Parameters
+        ----------
+        collection : str, optional
+            Collection alias (default: every collection).
+
+        Return
+        ------
+        list
+        """
+        with self._lock:
+            return [pid for pid, dataset in self._datasets.items()
+                    if (collection is None) or (dataset.get('collection') == collection)]
+
+    def lock_dataset(self, dataset_pid, lock_type, seconds):
+        """
+        Set a lock on a dataset for a number of seconds.
+
+        Parameters
+        ----------
+        dataset_pid : str
+        lock_type : str (e.g. Ingest, finalizePublication, InReview)
+        seconds : float
+        """
+        with self._lock:
+            self._datasets[dataset_pid]['locks'][lock_type] = time.monotonic() + seconds
+
+    def get_dataset(self, dataset_pid):
+        """
+        Get the state of a dataset: id, collection, versionState, files, metadataBlocks.
+
+        Return
+        ------
+        dict
+        """
+        with self._lock:
+            return json.loads(json.dumps(self._datasets.get(dataset_pid), default=str))
+
+    def __create_dataset(self, collection, metadata_blocks):
+        """
+        Private: Create a dataset (caller holds the lock).
+        """
+        dbid = self._next_dbid
+        self._next_dbid = self._next_dbid + 1
+        identifier = 'FK2/MOCK{:06d}'.format(dbid)
+        pid = 'doi:{}/{}'.format(self._authority, identifier)
+        now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self._datasets[pid] = {'id':dbid, 'pid':pid, 'identifier':identifier, 'collection':collection,
+                               'versionState':'DRAFT', 'versionNumber':None, 'versionMinorNumber':None,
+                               'createTime':now, 'lastUpdateTime':now, 'files':[],
+                               'metadataBlocks':metadata_blocks if metadata_blocks else {}, 'locks':{}}
+        self._dbids[str(dbid)] = pid
+        return pid
+
+    # --- request handling (called from the server threads) ---
+
+    def _count(self, endpoint, received=0):
+        with self._lock:
+            requests = self._stats.get('requests')
+            requests[endpoint] = requests.get(endpoint, 0) + 1
+            self._stats['bytes_received'] = self._stats.get('bytes_received') + received
+
+    def _inject_error(self, rate):
+        if rate and (self._random.random() < rate):
+            with self._lock:
+                self._stats['errors_injected'] = self._stats.get('errors_injected') + 1
+            return True
+        return False
+
+    def _dataset(self, dataset_id):
+        """
+        Get a dataset by persistent id or database id (caller holds the lock).
+        """
+        pid = self._dbids.get(str(dataset_id), dataset_id)
+        return self._datasets.get(pid)
+
+    def _active_locks(self, dataset):
+        now = time.monotonic()
+        return [lock_type for lock_type, until in dataset.get('locks').items() if until > now]
+
+    def _touch(self, dataset):
+        dataset['lastUpdateTime'] = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of MockDataverse; one instance per request.
+    """
+    protocol_version = 'HTTP/1.1'
+    mock = None
+
+    # (method, regular expression, handler name, endpoint name)
+    ROUTES = [
+        ('POST', r'^/api/dataverses/(?P<alias>[^/]+)/datasets$', 'create_dataset', 'create'),
+        ('GET', r'^/api/dataverses/(?P<alias>[^/]+)/contents$', 'get_contents', 'contents'),
+        ('GET', r'^/api/search$', 'search', 'search'),
+        ('GET', r'^/api/datasets/:persistentId/uploadurls$', 'get_upload_urls', 'uploadurls'),
+        ('PUT', r'^/s3/(?P<key>[^/]+)$', 'storage_put', 's3_put'),
+        ('PUT', r'^/s3/(?P<key>[^/]+)/(?P<part>\d+)$', 'storage_put', 's3_put_part'),
+        ('PUT', r'^/api/datasets/mpload$', 'complete_multipart', 'mpload_complete'),
+        ('DELETE', r'^/api/datasets/mpload$', 'abort_multipart', 'mpload_abort'),
+        ('POST', r'^/api/datasets/:persistentId/addFiles$', 'add_files', 'addFiles'),
+        ('PUT', r'^/api/datasets/:persistentId/editMetadata/?$', 'edit_metadata', 'editMetadata'),
+        ('GET', r'^/api/datasets/(?P<id>[^/]+)/locks/?$', 'get_locks', 'locks'),
+        ('GET', r'^/api/datasets/(?P<id>[^/]+)/versions$', 'get_versions', 'versions'),
+        ('GET', r'^/api/datasets/(?P<id>[^/]+)/versions/:latest$', 'get_latest_version', 'versions'),
+        ('GET', r'^/api/datasets/(?P<id>[^/]+)/?$', 'get_dataset', 'dataset'),
+        ('POST', r'^/api/datasets/:persistentId/actions/:publish$', 'publish', 'publish'),
+    ]
+
+    def log_message(self, format, *args):
+        # keep benchmark output clean
+        pass
+
+    def do_GET(self):
+        self.__route('GET')
+
+    def do_POST(self):
+        self.__route('POST')
+
+    def do_PUT(self):
+        self.__route('PUT')
+
+    def do_DELETE(self):
+        self.__route('DELETE')
+
+    def __route(self, method):
+        url = urlparse(self.path)
+        self.query = {key:values[0] for key, values in parse_qs(url.query).items()}
+        for route_method, pattern, handler, endpoint in self.ROUTES:
+            match = re.match(pattern, url.path)
+            if (route_method == method) and match:
+                storage = endpoint.startswith('s3')
+                body = self.__read_body(storage)
+                self.mock._count(endpoint, len(body) if storage else 0)
+                time.sleep(self.mock.storage_latency if storage else self.mock.latency)
+                if self.mock._inject_error(self.mock.storage_error_rate if storage else self.mock.error_rate):
+                    return self.__reply(503, {'status':'ERROR', 'message':'injected error'})
+                if (not storage) and (not self.__authorized()):
+                    return self.__reply(401, {'status':'ERROR', 'message':'Bad api key'})
+                return getattr(self, handler)(body, **match.groupdict())
+        self.__read_body(False)
+        self.mock._count('unknown')
+        return self.__reply(404, {'status':'ERROR', 'message':'not found: {} {}'.format(method, url.path)})
+
+    def __read_body(self, throttled):
+        # read the request body, at the configured bandwidth for storage PUTs
+        length = int(self.headers.get('Content-Length') or 0)
+        chunks = []
+        remaining = length
+        started = time.monotonic()
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining = remaining - len(chunk)
+            if throttled and self.mock.bandwidth:
+                ahead = (length - remaining) / self.mock.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        return b''.join(chunks)
+
+    def __authorized(self):
+        key = self.headers.get('X-Dataverse-key') or self.query.get('key')
+        return key == self.mock.api_token
+
+    def __reply(self, status, data=None, headers=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers if headers else {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __ok(self, data, status=200):
+        return self.__reply(status, {'status':'OK', 'data':data})
+
+    def __not_found(self, what):
+        return self.__reply(404, {'status':'ERROR', 'message':'not found: {}'.format(what)})
+
+    # --- endpoints ---
+
+    def create_dataset(self, body, alias):
+        try:
+            blocks = json.loads(body).get('datasetVersion').get('metadataBlocks')
+        except (ValueError, AttributeError):
+            return self.__reply(400, {'status':'ERROR', 'message':'invalid dataset json'})
+        pid = self.mock.add_dataset(alias, blocks)
+        dataset = self.mock.get_dataset(pid)
+        return self.__ok({'id':dataset.get('id'), 'persistentId':pid}, status=201)
+
+    def get_contents(self, body, alias):
+        with self.mock._lock:
+            datasets = [dataset for dataset in self.mock._datasets.values() if dataset.get('collection') == alias]
+            data = [{'type':'dataset', 'id':dataset.get('id'), 'protocol':'doi',
+                     'authority':self.mock._authority, 'identifier':dataset.get('identifier'),
+                     'persistentUrl':'https://doi.org/{}/{}'.format(self.mock._authority, dataset.get('identifier'))}
+                    for dataset in datasets]
+        return self.__ok(data)
+
+    def search(self, body):
+        # datasets only, in creation order; paged by start and per_page (at most 1000)
+        alias = self.query.get('subtree')
+        start = int(self.query.get('start', 0))
+        per_page = min(int(self.query.get('per_page', 10)), 1000)
+        with self.mock._lock:
+            datasets = [dataset for dataset in self.mock._datasets.values()
+                        if (self.query.get('type', 'dataset') == 'dataset') and ((alias is None) or (dataset.get('collection') == alias))]
+            items = [{'type':'dataset', 'global_id':dataset.get('pid'), 'identifier_of_dataverse':dataset.get('collection'),
+                      'versionState':dataset.get('versionState'), 'majorVersion':dataset.get('versionNumber'),
+                      'minorVersion':dataset.get('versionMinorNumber'), 'createdAt':dataset.get('createTime'),
+                      'updatedAt':dataset.get('lastUpdateTime')}
+                     for dataset in datasets[start:start + per_page]]
+        return self.__ok({'q':self.query.get('q'), 'total_count':len(datasets), 'start':start,
+                          'count_in_response':len(items), 'items':items})
+
+    def get_upload_urls(self, body):
+        pid = self.query.get('persistentId')
+        size = int(self.query.get('size', 0))
+        with self.mock._lock:
+            if self.mock._dataset(pid) is None:
+                return self.__not_found(pid)
+            key = 'mock{:08d}'.format(len(self.mock._storage) + 1)
+            self.mock._storage[key] = {'size':None, 'parts':{}}
+        storage_identifier = 's3://mock-bucket:{}'.format(key)
+        base_url = self.mock.base_url
+        part_size = self.mock.part_size
+        if part_size and (size > part_size):
+            count = (size + part_size - 1) // part_size
+            urls = {str(n):'{}/s3/{}/{}'.format(base_url, key, n) for n in range(1, count + 1)}
+            query = 'storageidentifier={}&uploadid={}'.format(storage_identifier, key)
+            return self.__ok({'urls':urls, 'partSize':part_size, 'storageIdentifier':storage_identifier,
+                              'complete':'/api/datasets/mpload?' + query, 'abort':'/api/datasets/mpload?' + query})
+        return self.__ok({'url':'{}/s3/{}'.format(base_url, key), 'partSize':part_size,
+                          'storageIdentifier':storage_identifier})
+
+    def storage_put(self, body, key, part=None):
+        with self.mock._lock:
+            entry = self.mock._storage.get(key)
+            if entry is None:
+                return self.__reply(403, {'message':'invalid signature'})
+            if part is None:
+                entry['size'] = len(body)
+            else:
+                entry['parts'][part] = len(body)
+        return self.__reply(200, headers={'ETag':'"{}-{}"'.format(key, part if part else 0)})
+
+    def complete_multipart(self, body):
+        key = self.query.get('uploadid')
+        with self.mock._lock:
+            entry = self.mock._storage.get(key)
+            if entry is None:
+                return self.__not_found(key)
+            etags = json.loads(body) if body else {}
+            if sorted(etags.keys(), key=int) != sorted(entry.get('parts').keys(), key=int):
+                return self.__reply(400, {'status':'ERROR', 'message':'missing parts'})
+            entry['size'] = sum(entry.get('parts').values())
+        return self.__ok({})
+
+    def abort_multipart(self, body):
+        with self.mock._lock:
+            self.mock._storage.pop(self.query.get('uploadid'), None)
+        return self.__ok({})
+
+    def add_files(self, body):
+        pid = self.query.get('persistentId')
+        # the multipart form holds a single jsonData field
+        match = re.search(rb'name="jsonData"\r\n\r\n(.*)\r\n--', body, re.S)
+        try:
+            entries = json.loads(match.group(1)) if match else []
+        except ValueError:
+            return self.__reply(400, {'status':'ERROR', 'message':'invalid jsonData'})
+        with self.mock._lock:
+            dataset = self.mock._dataset(pid)
+            if dataset is None:
+                return self.__not_found(pid)
+            if self.mock._active_locks(dataset):
+                return self.__reply(409, {'status':'ERROR', 'message':'dataset is locked'})
+            files = []
+            tabular = False
+            for entry in entries:
+                key = entry.get('storageIdentifier', '').split(':')[-1]
+                if self.mock._storage.get(key, {}).get('size') is None:
+                    return self.__reply(400, {'status':'ERROR', 'message':'not uploaded: {}'.format(entry.get('fileName'))})
+                file_id = self.mock._next_file_id
+                self.mock._next_file_id = self.mock._next_file_id + 1
+                mime_type = entry.get('mimeType')
+                tabular = tabular or (mime_type in ['text/csv', 'text/tab-separated-values'])
+                files.append({'label':entry.get('fileName'), 'directoryLabel':entry.get('directoryLabel'),
+                              'categories':entry.get('categories'),
+                              'dataFile':{'id':file_id, 'filename':entry.get('fileName'),
+                                          'description':entry.get('description'), 'contentType':mime_type,
+                                          'filesize':entry.get('fileSize'), 'md5':entry.get('md5Hash'),
+                                          'checksum':entry.get('checksum'), 'storageIdentifier':entry.get('storageIdentifier'),
+                                          'creationDate':datetime.date.today().isoformat()}})
+            dataset['files'].extend(files)
+            self.mock._touch(dataset)
+            self.mock._stats['files_added'] = self.mock._stats.get('files_added') + len(files)
+            if tabular and self.mock.ingest_lock:
+                dataset['locks']['Ingest'] = time.monotonic() + self.mock.ingest_lock
+        return self.__ok({'Files':files, 'Result':{'Total number of files':len(files), 'Number of files successfully added':len(files)}})
+
+    def edit_metadata(self, body):
+        pid = self.query.get('persistentId')
+        with self.mock._lock:
+            dataset = self.mock._dataset(pid)
+            if dataset is None:
+                return self.__not_found(pid)
+            if self.mock._active_locks(dataset):
+                return self.__reply(409, {'status':'ERROR', 'message':'dataset is locked'})
+            try:
+                block = json.loads(body)
+                if isinstance(block, dict) and block.get('name'):
+                    dataset['metadataBlocks'][block.get('name')] = block
+            except ValueError:
+                # e.g. a form-encoded body; accepted without change
+                pass
+            self.mock._touch(dataset)
+        return self.__ok({'id':dataset.get('id'), 'persistentId':pid})
+
+    def get_locks(self, body, id):
+        with self.mock._lock:
+            dataset = self.mock._dataset(self.query.get('persistentId') if id == ':persistentId' else id)
+            if dataset is None:
+                return self.__not_found(id)
+            locks = [{'lockType':lock_type, 'dataset':dataset.get('pid'), 'user':'mock'} for lock_type in self.mock._active_locks(dataset)]
+        return self.__ok(locks)
+
+    def __version(self, dataset):
+        return {'id':dataset.get('id'), 'datasetId':dataset.get('id'), 'datasetPersistentId':dataset.get('pid'),
+                'versionNumber':dataset.get('versionNumber'), 'versionMinorNumber':dataset.get('versionMinorNumber'),
+                'versionState':dataset.get('versionState'), 'createTime':dataset.get('createTime'),
+                'lastUpdateTime':dataset.get('lastUpdateTime'), 'metadataBlocks':dataset.get('metadataBlocks'),
+                'files':dataset.get('files')}
+
+    def get_versions(self, body, id):
+        with self.mock._lock:
+            dataset = self.mock._dataset(self.query.get('persistentId') if id == ':persistentId' else id)
+            if dataset is None:
+                return self.__not_found(id)
+            data = [self.__version(dataset)]
+        return self.__ok(data)
+
+    def get_latest_version(self, body, id):
+        with self.mock._lock:
+            dataset = self.mock._dataset(self.query.get('persistentId') if id == ':persistentId' else id)
+            if dataset is None:
+                return self.__not_found(id)
+            data = self.__version(dataset)
+        return self.__ok(data)
+
+    def get_dataset(self, body, id):
+        with self.mock._lock:
+            dataset = self.mock._dataset(self.query.get('persistentId') if id == ':persistentId' else id)
+            if dataset is None:
+                return self.__not_found(id)
+            data = {'id':dataset.get('id'), 'identifier':dataset.get('identifier'), 'persistentUrl':dataset.get('pid'),
+                    'protocol':'doi', 'authority':self.mock._authority, 'latestVersion':self.__version(dataset)}
+        return self.__ok(data)
+
+    def publish(self, body):
+        pid = self.query.get('persistentId')
+        with self.mock._lock:
+            dataset = self.mock._dataset(pid)
+            if dataset is None:
+                return self.__not_found(pid)
+            if self.mock._active_locks(dataset):
+                return self.__reply(409, {'status':'ERROR', 'message':'dataset is locked'})
+            if dataset.get('versionState') != 'DRAFT':
+                return self.__reply(400, {'status':'ERROR', 'message':'no draft version to publish'})
+            if self.query.get('type') == 'minor' and dataset.get('versionNumber'):
+                dataset['versionMinorNumber'] = dataset.get('versionMinorNumber') + 1
+            else:
+                dataset['versionNumber'] = (dataset.get('versionNumber') or 0) + 1
+                dataset['versionMinorNumber'] = 0
+            dataset['versionState'] = 'RELEASED'
+            self.mock._touch(dataset)
+            if self.mock.publish_lock:
+                dataset['locks']['finalizePublication'] = time.monotonic() + self.mock.publish_lock
+                return self.__ok({'status':'WORKFLOW_IN_PROGRESS'}, status=202)
+        return self.__ok(self.__version(dataset))
+
+# end file
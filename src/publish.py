@@ -0,0 +1,60 @@
+"""
+SAEF Publish
+
+Publish every dataset in a SAEF dataset inventory (see SAEFCollection.create_dataset_inventory)
+in one unattended run. Results are appended to a publish log; re-running the command with
+the same log skips the datasets already published.
+
+Usage: python publish.py <config.ini> <dataset_inventory.csv> <publish_log.csv> [--max-workers N] ...
+"""
+
+import argparse
+import collection # local: saef collection
+import columnar # local: parquet i/o
+import dvclient # local: pooled dataverse http client
+from pyDataverse.api import NativeApi
+import saef # local: saef classes
+
+def main():
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Publish the datasets of a SAEF dataset inventory.')
+    parser.add_argument('config', help='SAEF project .ini file')
+    parser.add_argument('inventory', help='dataset inventory (CSV or Parquet) with a dataset_doi column')
+    parser.add_argument('log', help='publish log (CSV); appended to, and used to resume')
+    parser.add_argument('--api-key', default=None, help='Dataverse API key (default: dataverse_api_key option)')
+    parser.add_argument('--version', default='major', choices=['major', 'minor'], help='version to publish')
+    parser.add_argument('--max-workers', type=int, default=4, help='datasets published at the same time')
+    parser.add_argument('--lock-timeout', type=float, default=3600, help='seconds to wait for a dataset lock to clear')
+    args = parser.parse_args()
+
+    config = saef.SAEFProjectConfig()
+    try:
+        config.read_ini(args.config)
+    except ValueError as e:
+        print(e)
+        return 1
+    options = config.get_options()
+    installation_url = options.get('dataverse').get('dataverse_installation_url')
+    api_key = args.api_key if args.api_key else options.get('dataverse').get('dataverse_api_key')
+
+    # only the dataset_doi column is needed
+    inventory_df = columnar.read_table(args.inventory, columns=['dataset_doi'])
+    api = NativeApi(installation_url, api_key)
+    # backs off on 429/503 and Retry-After
+    pool_size = 2 * args.max_workers + 1
+    client = dvclient.DataverseClient(installation_url, api_key, pool_size=pool_size,
+                                      api_throttle=dvclient.Throttle(max_concurrency=pool_size))
+    saefc = collection.SAEFCollection()
+    try:
+        status = saefc.publish(api, inventory_df, args.log, version=args.version, max_workers=args.max_workers,
+                               lock_timeout=args.lock_timeout, client=client)
+    finally:
+        client.close()
+    return 0 if status else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
+
+# end file
@@ -7,13 +7,18 @@ and Freedom (SAEF) digital project content.
 https://curiosity.lib.harvard.edu/slavery-abolition-emancipation-and-freedom
 """
 
+import columnar # local: parquet i/o
 import configparser
-import copy
 import datetime
+import apilog # local: api audit log
 import ddu # local: dataverse direct upload module
+import dvclient # local: pooled dataverse http client
+import dvlocks # local: dataset lock waits
+import journal # local: ingest journal
 import lcd # local: library collections as data module
-import logging
+import metrics # local: saef metrics
 import mimetypes
+import numpy as np
 import os
 import pandas as pd
 from pyDataverse.models import Dataset
@@ -35,8 +40,8 @@ class SAEFProjectConfig:
         Get the sections from the .ini file.
     initd : void
         Get the initialization status of the instance.
-    initialize_dataverse_api_log : void
-        Initialize the Dataverse API log for later use.
+    initialize_dataverse_api_log : int, int
+        Initialize the Dataverse API audit log for later use.
     """
     
     def __init__(self):
@@ -166,9 +171,17 @@ class SAEFProjectConfig:
         """
         return self._initd
     
-    def initialize_dataverse_api_log(self):
+    def initialize_dataverse_api_log(self, max_bytes=100 * 1024 * 1024, backup_count=10):
         """
-        Initialize the Dataverse API log for later use.
+        Initialize the Dataverse API audit log for later use.
+        Events are written as JSON lines by a background thread (see apilog).
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Size at which the logfile is rotated, 0 to never rotate (default: 100 MB).
+        backup_count : int, optional
+            Number of rotated logfiles kept (default: 10).
 
         Catches
         -------
@@ -184,17 +197,20 @@ class SAEFProjectConfig:
             (self.api_logfile == None)):
             print('SAEFConfig::initialize_dataverse_api_log - Error: logfile not specified')
             return False
+        # start the shared audit log
+        if (apilog.default_log().open(self.api_logfile, max_bytes=max_bytes, backup_count=backup_count) == False):
+            return False
         # set logging status = True
         self.api_logging = True
-        # configure logger
-        # time, function, api_operation, status, message
-        logging.basicConfig(filename=self.api_logfile,
-                    filemode='a',
-                    format='%(asctime)s\t%(message)s',
-                    datefmt='%d-%b-%y %H:%M:%S',
-                    level=logging.INFO)
         return True
 
+# microsoft transcription file formats, by role
+MSFT_FORMATS = {'msft_img':'MSFT-PNG',
+                'msft_json':'MSFT-JSON',
+                'msft_txt':'MSFT-TXT'}
+for role, file_format in MSFT_FORMATS.items():
+    lcd.register_file_format(file_format, role)
+
 class MSFTInventory (lcd.FileInventory):
     """
     Subclass of FileInventory to manage metadata about inventories of Microsoft Transcription files.
@@ -227,9 +243,9 @@ class MSFTInventory (lcd.FileInventory):
         lcd.FileInventory.__init__(self)
 
         # valid msft formats
-        self._msft_formats = {'msft_img':'MSFT-PNG',
-                              'msft_json':'MSFT-JSON',
-                              'msft_txt':'MSFT-TXT'}
+        self._msft_formats = MSFT_FORMATS
+        # msft files by role
+        self._classification = None
         
         # init status
         self._initd = False
@@ -237,13 +253,15 @@ class MSFTInventory (lcd.FileInventory):
     # method: __validate_msft
     # description: validate the microsoft automatic transcription dataframe
     # return: MSFT dataframe on success or raises ValueError or TypeError on failure
-    def __validate(self, dataframe):
+    def __validate(self, dataframe, classification=None):
         """
         Private: Validate the microsoft automatic transcription dataframe.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         dataframe : DataFrame
+        classification : FileClassification, optional
+            Classification of the DataFrame's files (default: classified here).
 
         Raises
         ------
@@ -255,7 +273,8 @@ class MSFTInventory (lcd.FileInventory):
 
         Return
         ------
-        bool
+        tuple (DataFrame, FileClassification)
+            The MSFT files and the classification (empty DataFrame and None on failure).
         """
         # input must be DataFrame
         if not isinstance(dataframe, pd.DataFrame):
@@ -270,29 +289,26 @@ class MSFTInventory (lcd.FileInventory):
         if (len(unique_osn) > 1):
             raise ValueError('MSFTInventory::__validate: DataFrame must contain no more than one owner-supplied name')  
             
-        # inspect the contents of the dataframe
-        fi = lcd.FileInventory()
-        status = fi.from_dataframe(dataframe)
-        if (status == False):
+        # the dataframe must have the inventory fields
+        if (len(lcd.missing_fields(dataframe)) > 0):
             # return an empty dataframe
-            return pd.DataFrame()
+            return pd.DataFrame(), None
         
-        # get the MST-related files from the inventory
-        msft_img = fi.get_files('file_format', self._msft_formats.get('msft_img'))
-        msft_json = fi.get_files('file_format', self._msft_formats.get('msft_json'))
-        msft_txt = fi.get_files('file_format', self._msft_formats.get('msft_txt'))
+        # count the MST-related files in the inventory
+        if (classification == None):
+            classification = lcd.FileClassification(dataframe)
+        msft_img_count = classification.get_count('msft_img')
+        msft_json_count = classification.get_count('msft_json')
+        msft_txt_count = classification.get_count('msft_txt')
         
         # if there is a count mismatch for mst files
         # note: this may be okay, depending upon the situation, the function caller should decide
-        msft_img_count = len(msft_img)
-        msft_json_count = len(msft_json)
-        msft_txt_count = len(msft_txt)
         if ((msft_img_count != msft_json_count) or
             (msft_img_count != msft_txt_count) or
             (msft_txt_count != msft_json_count)):
             print('MSFTInventory::__validate: Warning, mismatch in count of Microsoft transcription files in this inventory')    
             # return an empty dataframe
-            return pd.DataFrame()
+            return pd.DataFrame(), None
         
         # if there are no mst files 
         # note: this may be okay, depending upon the situation, the function caller should decide
@@ -301,19 +317,21 @@ class MSFTInventory (lcd.FileInventory):
             (msft_txt_count == 0)):
             print('MSFTInventory::__validate: Warning, no Microsoft transcription files in this inventory')
             # return an empty dataframe
-            return pd.DataFrame()
+            return pd.DataFrame(), None
         
         # all error conditions have been passed
-        # concatenate the three msft dataframes and return
-        return pd.concat([msft_img,msft_json,msft_txt])
+        # return the msft files: images, then json, then txt
+        return classification.get_files(list(self._msft_formats.keys())), classification
         
-    def from_dataframe(self, inventory_df):
+    def from_dataframe(self, inventory_df, classification=None):
         """
         Initialize an MSFT inventory from a DataFrame.
 
-        Parameter
-        ---------
-        dataframe : DataFrame
+        Parameters
+        ----------
+        inventory_df : DataFrame
+        classification : FileClassification, optional
+            Classification of the DataFrame's files, e.g. shared by a digital object (default: classified here).
 
         Catches
         -------
@@ -327,7 +345,7 @@ class MSFTInventory (lcd.FileInventory):
         # try to validate the inventory dataframe
         try:
             # validate the inventory_df
-            self._inventory_df = self.__validate(inventory_df)
+            self._inventory_df, self._classification = self.__validate(inventory_df, classification)
         # catch exceptions
         except TypeError:
             # inventory is not a dataframe
@@ -362,8 +380,11 @@ class MSFTInventory (lcd.FileInventory):
         if (not filename):      
             return False
         
-        # read the inventory file
-        inventory_df = pd.read_csv(filename, sep=',',header=0)
+        # read the inventory file; only the msft files of a parquet file
+        if columnar.is_parquet(filename):
+            inventory_df = columnar.read_parquet(filename, file_format=lcd.get_role_formats(list(self._msft_formats.keys())))
+        else:
+            inventory_df = pd.read_csv(filename, sep=',',header=0)
         return self.from_dataframe(inventory_df)
     
     def get_msft_img_files(self):
@@ -374,9 +395,7 @@ class MSFTInventory (lcd.FileInventory):
         ------
         DataFrame
         """
-        format = self._msft_formats.get('msft_img')
-        files = self._inventory_df[self._inventory_df['file_format'] == format]
-        return files
+        return self.__get_files('msft_img')
     
     def get_msft_json_files(self):
         """
@@ -386,8 +405,7 @@ class MSFTInventory (lcd.FileInventory):
         ------
         DataFrame
         """
-        files = self._inventory_df[self._inventory_df['file_format'] == self._msft_formats.get('msft_json')]
-        return files
+        return self.__get_files('msft_json')
     
     def get_msft_txt_files(self):
         """
@@ -397,8 +415,19 @@ class MSFTInventory (lcd.FileInventory):
         ------
         DataFrame
         """
-        files = self._inventory_df[self._inventory_df['file_format'] == self._msft_formats.get('msft_txt')]
-        return files        
+        return self.__get_files('msft_txt')
+
+    def __get_files(self, role):
+        """
+        Private: Get the MSFT files of a role from the classification (no files if not valid).
+
+        Return
+        ------
+        DataFrame
+        """
+        if (self._classification == None):
+            return self._inventory_df.iloc[0:0]
+        return self._classification.get_files(role)
 
     def get_files(self):
         """
@@ -420,6 +449,109 @@ class MSFTInventory (lcd.FileInventory):
         """
         return self._initd
 
+# columns of a relationships DataFrame, in output order
+RELATIONSHIP_COLUMNS = ['filename_source', 'source_file_format', 'relationship', 'filename_target', 'target_file_format']
+
+def _pair_relationships(sources, targets, relationship, reciprocal):
+    """
+    Private: Build a relationships DataFrame from row-aligned source and target file DataFrames.
+    Each source->target row is followed by its reciprocal target->source row.
+
+    Parameters
+    ----------
+    sources : DataFrame
+        filename and file_format of the source files
+    targets : DataFrame
+        filename and file_format of the target files, aligned with sources
+    relationship : str
+        Relationship of each source to its target, e.g. belongs_to
+    reciprocal : str
+        Relationship of each target to its source, e.g. contains
+
+    Return
+    ------
+    DataFrame
+    """
+    count = len(sources)
+    forward = pd.DataFrame({'filename_source':sources['filename'].to_numpy(),
+                            'source_file_format':sources['file_format'].to_numpy(),
+                            'relationship':relationship,
+                            'filename_target':targets['filename'].to_numpy(),
+                            'target_file_format':targets['file_format'].to_numpy(),
+                            '_order':range(0, 2 * count, 2)})
+    backward = pd.DataFrame({'filename_source':targets['filename'].to_numpy(),
+                             'source_file_format':targets['file_format'].to_numpy(),
+                             'relationship':reciprocal,
+                             'filename_target':sources['filename'].to_numpy(),
+                             'target_file_format':sources['file_format'].to_numpy(),
+                             '_order':range(1, 2 * count, 2)})
+    # interleave the two tables: entry, reciprocal entry, entry, ...
+    relationships = pd.concat([forward, backward], ignore_index=True)
+    relationships = relationships.sort_values('_order', kind='stable')
+    return relationships[RELATIONSHIP_COLUMNS].reset_index(drop=True)
+
+def define_pds_relationships(mets_df, images_df):
+    """
+    Define belongs_to/contains relationships between image files and their METS file.
+    Images are joined to the METS file of the same object_osn, so the input may
+    hold one digital object or a whole inventory.
+
+    Parameters
+    ----------
+    mets_df : DataFrame
+        METS files (at most one per object_osn)
+    images_df : DataFrame
+        Image files
+
+    Return
+    ------
+    DataFrame
+        Columns: see RELATIONSHIP_COLUMNS. Empty DataFrame if there is nothing to relate.
+    """
+    if (mets_df.empty or images_df.empty):
+        return pd.DataFrame()
+    # join each image to its object's mets file
+    mets = mets_df[['object_osn', 'filename', 'file_format']]
+    images = images_df[['object_osn', 'filename', 'file_format']]
+    joined = images.merge(mets, on='object_osn', how='inner', suffixes=('', '_mets'))
+    if (joined.empty):
+        return pd.DataFrame()
+    targets = joined[['filename_mets', 'file_format_mets']].rename(columns={'filename_mets':'filename',
+                                                                            'file_format_mets':'file_format'})
+    return _pair_relationships(joined, targets, 'belongs_to', 'contains')
+
+def define_derivative_relationships(images_df, derivatives_df):
+    """
+    Define is_derived_from/is_source_for relationships between derivative files
+    (e.g., MSFT transcriptions or OCR text) and the image files they were made from.
+    Derivatives are joined to images on object_osn and file_osn, so the input may
+    hold one digital object or a whole inventory.
+
+    Parameters
+    ----------
+    images_df : DataFrame
+        Image files
+    derivatives_df : DataFrame
+        Derivative files
+
+    Return
+    ------
+    DataFrame
+        Columns: see RELATIONSHIP_COLUMNS. Empty DataFrame if there is nothing to relate.
+    """
+    if (images_df.empty or derivatives_df.empty):
+        return pd.DataFrame()
+    keys = ['object_osn', 'file_osn']
+    # one image per page; as before, the last listed image wins
+    images = images_df[keys + ['filename', 'file_format']].drop_duplicates(subset=keys, keep='last')
+    derivatives = derivatives_df[keys + ['filename', 'file_format']]
+    joined = derivatives.merge(images, on=keys, how='inner', suffixes=('', '_image'))
+    if (joined.empty):
+        return pd.DataFrame()
+    targets = joined[['filename_image', 'file_format_image']].rename(columns={'filename_image':'filename',
+                                                                              'file_format_image':'file_format'})
+    return _pair_relationships(joined, targets, 'is_derived_from', 'is_source_for')
+
 class SAEFDigitalObject(lcd.PDSDocument):
     """
     Subclass of PDSDocument supporting information about SAEFDigitalObjects.
@@ -533,33 +665,8 @@ class SAEFDigitalObject(lcd.PDSDocument):
         target_file_format : str
             The format of the target file.
         """
-        # create the relationships dataframe
-        relationships = pd.DataFrame()
-        # get the mets file
-        mets = pdsdocument.get_mets_file()
-        index = list(mets.index)[0]
-        mets_filename = mets.at[index,'filename']
-        mets_file_format = mets.at[index,'file_format']
-        # get the image files
-        images = pdsdocument.get_image_files()
-        # populate the relationships dataframe
-        for image in images.iterrows():
-            image_filename = image[1].get('filename')
-            image_file_format = image[1].get('file_format')
-            # create an entry for the image file
-            relationships = relationships.append({'filename_source':image_filename,
-                                                  'source_file_format':image_file_format,
-                                                  'relationship':'belongs_to',
-                                                  'filename_target':mets_filename,
-                                                  'target_file_format':mets_file_format},ignore_index=True)
-                
-            # create a reciprocal entry for the mets file
-            relationships = relationships.append({'filename_source':mets_filename,
-                                                  'source_file_format':mets_file_format,
-                                                  'relationship':'contains',
-                                                  'filename_target':image_filename,
-                                                  'target_file_format':image_file_format},ignore_index=True)
-        return relationships
+        # join the image files to the mets file
+        return define_pds_relationships(pdsdocument.get_mets_file(), pdsdocument.get_image_files())
 
     def __define_msft_relationships(self, pdsdocument, dataframe):
         """
@@ -587,50 +694,9 @@ class SAEFDigitalObject(lcd.PDSDocument):
         target_file_format : str
             The format of the target file.
         """
-        # create the relationships dataframe
-        relationships = pd.DataFrame() 
-        # if the dataframe is empty, return empty relationships table
-        if (dataframe.empty):
-            return relationships
-        
-        # get the image files
-        images = pdsdocument.get_image_files()
-        # create a dictionary keyed file osn
-        md = {}
-        for image in images.iterrows():
-            osn = image[1].get('file_osn')
-            filename = image[1].get('filename')
-            file_format = image[1].get('file_format')
-            md[osn] = {'filename':filename, 'file_format':file_format}
-            
-        # for each row in the msft dataframe
-        for row in dataframe.iterrows():
-            # get the file_osn
-            file_osn = row[1].get('file_osn')
-            # get the matching image file
-            image_file = md.get(file_osn)
-            # set variables
-            source_filename = image_file.get('filename')
-            source_file_format = image_file.get('file_format')
-            target_filename = row[1].get('filename')
-            target_file_format = row[1].get('file_format')
-            
-            # create an entry for the is-derived-from relationship between the transcript and its source jpg
-            relationships = relationships.append({'filename_source':target_filename,
-                                                  'source_file_format':target_file_format,
-                                                  'relationship':'is_derived_from',
-                                                  'filename_target':source_filename,
-                                                  'target_file_format':source_file_format},ignore_index=True)
-            
-            # create an entry for the is-source-for relationship between the transcript and its source jpg
-            relationships = relationships.append({'filename_source':source_filename,
-                                                  'source_file_format':source_file_format,
-                                                  'relationship':'is_source_for',
-                                                  'filename_target':target_filename,
-                                                  'target_file_format':target_file_format},ignore_index=True)
-        # return the relationships dataframe
-        return relationships
-    
+        # join the msft files to their source image files
+        return define_derivative_relationships(pdsdocument.get_image_files(), dataframe)
+
     def __define_ocr_relationships(self, pdsdocument, dataframe):
         """
         Private: Assign relationships between components
@@ -657,50 +723,8 @@ class SAEFDigitalObject(lcd.PDSDocument):
         target_file_format : str
             The format of the target file.
         """
-        # create the relationships dataframe
-        relationships = pd.DataFrame() 
-        # if the dataframe is empty, return empty relationships table
-        if (dataframe.empty):
-            return relationships
-        
-        # get the image files
-        images = pdsdocument.get_image_files()
-        fi = lcd.FileInventory()
-        fi.from_dataframe(images)
-        images_md = fi.get_metadata(images)
-        # create a dictionary keyed file osn
-        md = {}
-        for image in images_md:
-            osn = image.get('file_osn')
-            md[osn] = image
-        
-        # for each row in the msft dataframe
-        for row in dataframe.iterrows():
-            # get the file_osn
-            file_osn = row[1].get('file_osn')
-            # get the matching image file
-            image_file = md.get(file_osn)
-            # set variables
-            source_filename = image_file.get('filename')
-            source_file_format = image_file.get('file_format')
-            target_filename = row[1].get('filename')
-            target_file_format = row[1].get('file_format')
-            
-            # create an entry for the is-derived-from relationship between the ocr text and its source jpg
-            relationships = relationships.append({'filename_source':target_filename,
-                                                  'source_file_format':target_file_format,
-                                                  'relationship':'is_derived_from',
-                                                  'filename_target':source_filename,
-                                                  'target_file_format':source_file_format},ignore_index=True)
-            
-            # create an entry for the is-source-for relationship between the ocr text and its source jpg
-            relationships = relationships.append({'filename_source':source_filename,
-                                                  'source_file_format':source_file_format,
-                                                  'relationship':'is_source_for',
-                                                  'filename_target':target_filename,
-                                                  'target_file_format':target_file_format},ignore_index=True)
-        # return the relationships dataframe
-        return relationships
+        # join the ocr files to their source image files
+        return define_derivative_relationships(pdsdocument.get_image_files(), dataframe)
 
     def __check_metadata(self, metadata):
         """
@@ -774,9 +798,8 @@ class SAEFDigitalObject(lcd.PDSDocument):
             if (self.__check_metadata(metadata) == True):
                 mms_id = metadata.get('mms_id')
                 object_tags = metadata.get('object_tags')
-                # apply keys to the dataframe
-                dataframe['mms_id'] = mms_id
-                dataframe['object_tags'] = object_tags
+                # apply keys to a new dataframe; the caller's dataframe (often a slice of an inventory) is not changed
+                dataframe = dataframe.assign(mms_id=mms_id, object_tags=object_tags)
 
         # try to create a pdsdocument instance using the dataframe
         self._pdsdocument = lcd.PDSDocument()
@@ -789,9 +812,12 @@ class SAEFDigitalObject(lcd.PDSDocument):
         if (status == False):
             return False
 
+        # the files classified by role once, shared by the msft and ocr inventories
+        classification = self._pdsdocument.get_classification()
+
         # check for related msft content
         self._msft_fi = MSFTInventory()
-        status = self._msft_fi.from_dataframe(dataframe)
+        status = self._msft_fi.from_dataframe(dataframe, classification)
         msft_df = self._msft_fi.get_inventory()
         # if the operation failed, check for None vs. empty dataframe
         # None -> MSFT files present but not processed
@@ -805,7 +831,7 @@ class SAEFDigitalObject(lcd.PDSDocument):
 
         # check for related ocr content
         self._ocr_fi = lcd.OCRInventory()
-        status = self._ocr_fi.from_dataframe(dataframe)
+        status = self._ocr_fi.from_dataframe(dataframe, classification)
         ocr_df = self._ocr_fi.get_inventory()
         # if the operation failed, check for None vs. empty dataframe
         # None -> OCR files present but not processed
@@ -830,8 +856,7 @@ class SAEFDigitalObject(lcd.PDSDocument):
             self._msft_relationships = self.__define_msft_relationships(self._pdsdocument,msft_df)
         # if there is a ocr dataframe, define relationshps
         if (ocr_df.empty == False):
-            # note: uses the same method for msft relationships with a different argument
-            self._ocr_relationships = self.__define_msft_relationships(self._pdsdocument,ocr_df)
+            self._ocr_relationships = self.__define_ocr_relationships(self._pdsdocument,ocr_df)
 
         #
         # set saef-specific metadata
@@ -844,7 +869,8 @@ class SAEFDigitalObject(lcd.PDSDocument):
         # for details, see: https://pandas.pydata.org/docs/reference/api/pandas.Index.html
         index = list(mets.index)[0]
         # set the saef metadata
-        self._saef_metadata = copy.deepcopy(pdsmd)
+        # note: the values are scalars, a shallow copy is enough
+        self._saef_metadata = dict(pdsmd)
         # populate the saef digital object-specific metadata
         self._saef_metadata['mms_id']= mets.at[index,'mms_id']
         self._saef_metadata['object_tags'] = mets.at[index,'object_tags']
@@ -1011,7 +1037,7 @@ class SAEFDigitalObject(lcd.PDSDocument):
         Parameters
         ----------
         filename : str
-            Path of the file to write
+            Path of the file to write; Parquet if it ends in .parquet or .pq, otherwise CSV
         relationship : str (msft | ocr | pds)
 
         Return
@@ -1041,9 +1067,7 @@ class SAEFDigitalObject(lcd.PDSDocument):
              return False
         
         # write to the relationships file
-        df.to_csv(filename, sep=',', header=True,index=False)
-        
-        return True
+        return columnar.write_table(df, filename)
     
     def initd(self):
         """
@@ -1055,6 +1079,639 @@ class SAEFDigitalObject(lcd.PDSDocument):
         """
         return self._initd
 
+# object-level fields of a digital object's metadata (see SAEFDigitalObject::get_metadata)
+OBJECT_METADATA_FIELDS = ['object_osn', 'object_title', 'object_delivery_urn', 'object_oasis_urn', 'object_access',
+                          'mms_id', 'object_tags']
+
+class SAEFDigitalObjectView():
+    """
+    Lightweight view of one digital object in an inventory DataFrame shared by all the
+    views of that inventory (see get_digital_object_views). A view holds only the shared
+    DataFrame, the object_osn and the object's rows (a range, or row positions if the
+    object's rows are not contiguous): no files, relationships or metadata are copied.
+    These are derived when asked for, and a full SAEFDigitalObject is built with materialize,
+    e.g. just before the object is ingested.
+
+    Methods
+    -------
+    get_object_osn : void
+        Get the owner-supplied name of the digital object.
+    get_inventory : void
+        Get the inventory rows of the digital object.
+    get_file_count : void
+        Get the number of inventory rows of the digital object.
+    get_metadata : void
+        Get the object-level metadata of the digital object.
+    materialize : dict
+        Build a SAEFDigitalObject from the view.
+    """
+    __slots__ = ('_inventory_df', '_object_osn', '_rows')
+
+    def __init__(self, inventory_df, object_osn, rows):
+        """
+        Class constructor.
+
+        Parameters
+        ----------
+        inventory_df : DataFrame
+            Shared inventory DataFrame.
+        object_osn : str
+        rows : slice or array
+            Row positions of the object's files in inventory_df.
+        """
+        self._inventory_df = inventory_df
+        self._object_osn = object_osn
+        self._rows = rows
+
+    def get_object_osn(self):
+        """
+        Get the owner-supplied name of the digital object.
+
+        Return
+        ------
+        str
+        """
+        return self._object_osn
+
+    def get_inventory(self):
+        """
+        Get the inventory rows of the digital object, in inventory order. For contiguous
+        rows this is a view of the shared DataFrame, not a copy.
+
+        Return
+        ------
+        DataFrame
+        """
+        return self._inventory_df.iloc[self._rows]
+
+    def get_file_count(self):
+        """
+        Get the number of inventory rows of the digital object.
+
+        Return
+        ------
+        int
+        """
+        if isinstance(self._rows, slice):
+            return self._rows.stop - self._rows.start
+        return len(self._rows)
+
+    def get_metadata(self):
+        """
+        Get the object-level metadata of the digital object, from its METS file row,
+        as in SAEFDigitalObject::get_metadata.
+
+        Return
+        ------
+        dict
+            None if the object has no METS file.
+        """
+        mets = lcd.FileClassification(self.get_inventory()).get_files('mets')
+        if (mets.empty == True):
+            return None
+        row = mets.iloc[0]
+        return {field:row.get(field) for field in OBJECT_METADATA_FIELDS}
+
+    def materialize(self, metadata={}):
+        """
+        Build a SAEFDigitalObject from the view. The view keeps no reference to it,
+        so its DataFrames are freed once the caller is done with it.
+
+        Parameter
+        ---------
+        metadata : dict, optional
+            See SAEFDigitalObject::from_dataframe.
+
+        Return
+        ------
+        SAEFDigitalObject
+            None on failure.
+        """
+        files_df = self.get_inventory()
+        # a compact inventory: the object's fields as type object, as from FileInventory::get_objects
+        if any(isinstance(dtype, pd.CategoricalDtype) for dtype in files_df.dtypes):
+            files_df = files_df.astype('object')
+        saefdo = SAEFDigitalObject()
+        if (saefdo.from_dataframe(files_df, metadata) == False):
+            return None
+        return saefdo
+
+def get_digital_object_views(file_inventory):
+    """
+    Get a SAEFDigitalObjectView of each digital object in an inventory, all sharing the
+    inventory's DataFrame. The object_osn field is read once. When each object's files are
+    listed together, as in an inventory file, a view stores a range of rows; otherwise
+    it stores the positions of its rows.
+
+    Parameter
+    ---------
+    file_inventory : FileInventory
+
+    Return
+    ------
+    dict
+        object_osn -> SAEFDigitalObjectView, in inventory order. Empty on failure.
+    """
+    if (not isinstance(file_inventory, lcd.FileInventory)) or (file_inventory.initd() == False):
+        return {}
+    inventory_df = file_inventory.get_inventory()
+    if (inventory_df.empty == True):
+        return {}
+    # one code per row (-1 for a missing object_osn), then the runs of equal codes
+    codes, osns = pd.factorize(inventory_df['object_osn'])
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    stops = np.r_[starts[1:], len(codes)]
+    run_codes = codes[starts]
+    starts = starts[run_codes >= 0]
+    stops = stops[run_codes >= 0]
+    run_codes = run_codes[run_codes >= 0]
+    views = {}
+    if (len(run_codes) == len(osns)):
+        # every object in a single run of rows
+        for code, start, stop in zip(run_codes, starts, stops):
+            osn = osns[code]
+            views[osn] = SAEFDigitalObjectView(inventory_df, osn, slice(int(start), int(stop)))
+        return views
+    # objects interleaved in the inventory
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(osns) + 1))
+    for code in pd.unique(run_codes):
+        osn = osns[code]
+        views[osn] = SAEFDigitalObjectView(inventory_df, osn, order[bounds[code]:bounds[code + 1]])
+    return views
+
+class SAEFInventoryRelationships():
+    """
+    Relationship tables (PDS, MSFT and OCR) for every digital object in a FileInventory,
+    computed in one pass with grouped joins rather than one SAEFDigitalObject at a time.
+    Each table has an object_osn column followed by the relationship columns
+    written by SAEFDigitalObject::write_relationships.
+
+    Methods
+    -------
+    from_inventory : FileInventory
+        Compute the relationship tables for all objects in the inventory.
+    get_relationships : str (ocr|pds|msft)
+        Get a named relationships DataFrame.
+    write_relationships : str, str (ocr|pds|msft), bool
+        Write a named relationships DataFrame, for all objects, to one file (or Parquet dataset).
+    write_partitioned_relationships : str, str, str (ocr|pds|msft)
+        Write a named relationships DataFrame to one file per object.
+    initd : void
+        Get the initialization status of the instance.
+    """
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        # roles of the msft files (see MSFT_FORMATS), whose counts must match
+        self._msft_roles = list(MSFT_FORMATS.keys())
+        # relationship dataframes keyed by relationship name
+        self._relationships = {'pds':pd.DataFrame(), 'msft':pd.DataFrame(), 'ocr':pd.DataFrame()}
+        # instance is/not initialized
+        self._initd = False
+
+    def __select(self, inventory_df, formats):
+        """
+        Private: Select the rows with one of formats, ordered by object (in inventory order) 
+        and then by the position of their format in formats.
+
+        Return
+        ------
+        DataFrame
+        """
+        rows = inventory_df[inventory_df['file_format'].isin(formats)]
+        # note: integer ranks; mapping a categorical file_format would give categorical ranks,
+        # which sort by category order rather than by value
+        rank = rows['file_format'].map({f:i for i, f in enumerate(formats)}).astype('int64')
+        order = pd.DataFrame({'object':rows['_object_order'], 'rank':rank})
+        return rows.loc[order.sort_values(['object', 'rank'], kind='stable').index]
+
+    def __add_object_osn(self, relationships, sources):
+        """
+        Private: Prefix a relationships DataFrame with the object_osn of its rows.
+        Each source row produced two relationship rows (entry and reciprocal).
+
+        Return
+        ------
+        DataFrame
+        """
+        if (relationships.empty):
+            return relationships
+        relationships.insert(0, 'object_osn', sources['object_osn'].repeat(2).to_numpy())
+        return relationships
+
+    def from_inventory(self, file_inventory):
+        """
+        Compute the relationship tables for all objects in the inventory.
+        As in SAEFDigitalObject, objects that cannot be ingested (no METS file, more
+        than one METS file, no image file or a file without a file_path; see
+        SAEFInventoryValidation) get no relationships at all, and objects whose
+        MSFT image, JSON and TXT counts differ get no MSFT relationships.
+
+        Parameter
+        ---------
+        file_inventory : FileInventory
+
+        Return
+        ------
+        bool
+        """
+        if ((file_inventory == None) or
+            (file_inventory.initd() == False)):
+            return False
+        inventory_df = file_inventory.get_inventory()
+        if (inventory_df.empty == True):
+            return False
+
+        # objects rejected by SAEFDigitalObject, from grouped counts, are skipped
+        validation = SAEFInventoryValidation()
+        validation.from_inventory(file_inventory)
+        rejected = validation.get_invalid_objects()
+        if (len(rejected) > 0):
+            print('SAEFInventoryRelationships::from_inventory: Warning - objects failing validation: {}'.format(rejected))
+            inventory_df = inventory_df[~inventory_df['object_osn'].isin(rejected)]
+
+        # order of the objects in the inventory
+        inventory_df = inventory_df.assign(_object_order=pd.factorize(inventory_df['object_osn'])[0])
+
+        # mets files (one per remaining object) and images; the formats of each role are
+        # read from the registry (see lcd.FILE_FORMAT_ROLES), so registered formats are included
+        mets = self.__select(inventory_df, lcd.get_role_formats('mets'))
+        images = self.__select(inventory_df, lcd.get_role_formats('image'))
+
+        # msft files; objects with mismatched msft file counts, per role, are skipped
+        msft = self.__select(inventory_df, lcd.get_role_formats(self._msft_roles))
+        roles = msft['file_format'].astype('object').map(lcd.FILE_FORMAT_ROLES)
+        counts = pd.crosstab(msft['object_osn'].astype('object'), roles)
+        counts = counts.reindex(columns=self._msft_roles, fill_value=0)
+        valid = counts.index[counts.nunique(axis=1) == 1]
+        if (len(valid) < len(counts)):
+            print('SAEFInventoryRelationships::from_inventory: Warning - mismatch in count of Microsoft transcription files for: {}'.format(
+                list(counts.index.difference(valid))))
+        msft = msft[msft['object_osn'].isin(valid)]
+        ocr = self.__select(inventory_df, lcd.get_role_formats('ocr_txt'))
+
+        # pds relationships: images joined to their object's mets file
+        pds = define_pds_relationships(mets, images)
+        pds_sources = images[images['object_osn'].isin(mets['object_osn'])]
+        self._relationships['pds'] = self.__add_object_osn(pds, pds_sources)
+
+        # derivative relationships: msft and ocr files joined to their source images
+        keys = ['object_osn', 'file_osn']
+        image_keys = pd.MultiIndex.from_frame(images[keys])
+        for name, derivatives in [('msft', msft), ('ocr', ocr)]:
+            relationships = define_derivative_relationships(images, derivatives)
+            sources = derivatives[pd.MultiIndex.from_frame(derivatives[keys]).isin(image_keys)]
+            self._relationships[name] = self.__add_object_osn(relationships, sources)
+
+        self._initd = True
+        return True
+
+    def get_relationships(self, relationship):
+        """
+        Get a named relationships DataFrame.
+
+        Parameter
+        ---------
+        relationship : str (msft | ocr | pds)
+
+        Return
+        ------
+        DataFrame
+        """
+        return self._relationships.get(relationship)
+
+    def write_relationships(self, filename, relationship, partitioned=False):
+        """
+        Write a named relationships DataFrame, for all objects, to one file.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the file to write; Parquet if it ends in .parquet or .pq, otherwise CSV
+        relationship : str (msft | ocr | pds)
+        partitioned : bool, optional
+            Write a Parquet dataset directory with one partition per object (default: False).
+
+        Return
+        ------
+        bool
+        """
+        # filename cannot be blank or consist of spaces
+        if not (filename and filename.strip()):
+            return False
+        df = self._relationships.get(relationship)
+        if ((df is None) or (df.empty == True)):
+            return False
+        return columnar.write_table(df, filename, partitioned=partitioned)
+
+    def write_partitioned_relationships(self, directory, suffix, relationship):
+        """
+        Write a named relationships DataFrame to one file per object, named
+        directory/<object_osn>_<suffix> as expected by SAEFDataset (see the
+        digital_object_*_relationships options of the .ini file).
+
+        Parameters
+        ----------
+        directory : str
+            Relationships directory
+        suffix : str
+            Filename suffix, e.g. pds_relationships.csv
+        relationship : str (msft | ocr | pds)
+
+        Return
+        ------
+        list
+            Names of the files written.
+        """
+        filenames = []
+        df = self._relationships.get(relationship)
+        if ((df is None) or (df.empty == True)):
+            return filenames
+        for osn, rows in df.groupby('object_osn', sort=False):
+            filename = os.path.join(directory, '{}_{}'.format(osn, suffix))
+            rows.drop(columns='object_osn').to_csv(filename, sep=',', header=True, index=False)
+            filenames.append(filename)
+        return filenames
+
+    def initd(self):
+        """
+        Get the initialization status of the instance.
+
+        Return
+        ------
+        bool
+        """
+        return self._initd
+
+class SAEFInventoryValidation():
+    """
+    Validation of every digital object in a FileInventory against the rules applied one
+    object at a time by SAEFDigitalObject::from_dataframe, PDSDocument and MSFTInventory.
+    The files of all objects are counted by role (see lcd.FILE_FORMAT_ROLES) in one pass,
+    and every rule is evaluated on the counts, so each object gets all its violations
+    rather than the first one, before any request is made to Dataverse.
+
+    Rules (error: the object cannot be ingested; warning: it is ingested without some files)
+    -----
+    missing_field : error
+        The inventory has no mms_id or object_tags field.
+    file_path_missing : error
+        Files without a file_path.
+    no_mets : error
+        No METS file.
+    too_many_mets : error
+        More than one METS file.
+    no_images : error
+        No JP2 or JPEG image file.
+    msft_count_mismatch : warning
+        Different numbers of MSFT image, JSON and TXT files; the MSFT files are not ingested.
+
+    Methods
+    -------
+    from_inventory : FileInventory
+        Validate all objects in the inventory.
+    from_dataframe : DataFrame
+        Validate all objects in an inventory DataFrame, e.g. read with only the validated fields.
+    get_report : void
+        Get the per-object report.
+    get_violations : void
+        Get the violations, one row per object and rule.
+    get_invalid_objects : void
+        Get the owner-supplied names of the objects with errors.
+    get_unassigned_rows : void
+        Get the labels of the rows without an object_osn, which belong to no object.
+    write_report : str
+        Write the per-object report to a CSV or Parquet file.
+    initd : void
+        Get the initialization status of the instance.
+    """
+    # roles counted per object, in report order
+    ROLES = ['mets', 'image', 'msft_img', 'msft_json', 'msft_txt', 'ocr_txt']
+    # rules, in report order
+    RULES = ['missing_field', 'file_path_missing', 'no_mets', 'too_many_mets', 'no_images', 'msft_count_mismatch']
+    # fields read by the rules, and fields that need only be present
+    REQUIRED_FIELDS = ['object_osn', 'file_format', 'file_path']
+    FIELDS = REQUIRED_FIELDS + ['mms_id', 'object_tags']
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        # per-object report
+        self._report = pd.DataFrame()
+        # violations, one row per object and rule
+        self._violations = pd.DataFrame(columns=['object_osn', 'rule', 'severity', 'message'])
+        # labels of the rows without an object_osn
+        self._unassigned = pd.Index([])
+        # instance is/not initialized
+        self._initd = False
+
+    def __count(self, inventory_df):
+        """
+        Private: Count the files of each object by role, and the files without a file_path.
+
+        Return
+        ------
+        tuple (Index, array, array, array)
+            object_osn of each object (in inventory order), counts (objects x ROLES),
+            files without a file_path and files per object.
+        """
+        # one code per row for the object and for the role of its format (-1: not counted)
+        objects, osns = pd.factorize(inventory_df['object_osn'])
+        formats, format_values = pd.factorize(inventory_df['file_format'])
+        role_of_format = np.array([self.ROLES.index(lcd.FILE_FORMAT_ROLES.get(f))
+                                   if lcd.FILE_FORMAT_ROLES.get(f) in self.ROLES else -1
+                                   for f in format_values] + [-1], dtype='int64')
+        # note: a missing format (code -1) takes the last entry, -1
+        roles = role_of_format[formats]
+        # rows without an object_osn are not part of any object
+        rows = (objects >= 0)
+        counted = rows & (roles >= 0)
+        size = len(osns) * len(self.ROLES)
+        counts = np.bincount(objects[counted] * len(self.ROLES) + roles[counted], minlength=size)
+        counts = counts.reshape(len(osns), len(self.ROLES))
+        missing = np.bincount(objects[rows], weights=inventory_df['file_path'].isna().to_numpy()[rows],
+                              minlength=len(osns)).astype('int64')
+        files = np.bincount(objects[rows], minlength=len(osns))
+        return pd.Index(osns, dtype='object'), counts, missing, files
+
+    def from_inventory(self, file_inventory):
+        """
+        Validate all objects in the inventory.
+
+        Parameter
+        ---------
+        file_inventory : FileInventory
+
+        Return
+        ------
+        bool
+            False if the inventory is not initialized or empty (not whether objects are valid).
+        """
+        if ((file_inventory == None) or
+            (file_inventory.initd() == False)):
+            return False
+        return self.from_dataframe(file_inventory.get_inventory())
+
+    def from_dataframe(self, inventory_df):
+        """
+        Validate all objects in an inventory DataFrame. Only the fields in FIELDS are
+        read; mms_id and object_tags need only be present, so a caller can read an
+        inventory file with just these columns (see columnar.read_table).
+
+        Parameter
+        ---------
+        inventory_df : DataFrame
+
+        Return
+        ------
+        bool
+            False if the DataFrame is empty or lacks object_osn, file_format or file_path
+            (not whether objects are valid).
+        """
+        if ((inventory_df is None) or
+            (inventory_df.empty == True)):
+            return False
+        absent = [field for field in self.REQUIRED_FIELDS if field not in inventory_df.columns]
+        if (len(absent) > 0):
+            print('SAEFInventoryValidation::from_dataframe: Error - missing fields: {}'.format(absent))
+            return False
+
+        # rows without an object_osn belong to no object: reported, not validated
+        self._unassigned = inventory_df.index[inventory_df['object_osn'].isna()]
+        if (len(self._unassigned) > 0):
+            print('SAEFInventoryValidation::from_dataframe: Warning - {} rows without an object_osn, at rows: {}'.format(
+                len(self._unassigned), list(self._unassigned[:10])))
+
+        osns, counts, missing, files = self.__count(inventory_df)
+        count = {role:counts[:, i] for i, role in enumerate(self.ROLES)}
+        msft = np.stack([count.get('msft_img'), count.get('msft_json'), count.get('msft_txt')], axis=1)
+
+        # every rule, for every object: (rule, severity, mask, message of one object)
+        absent = [field for field in ['mms_id', 'object_tags'] if field not in inventory_df.columns]
+        rules = [('missing_field', 'error', np.full(len(osns), len(absent) > 0),
+                  lambda i: 'missing field: {}'.format(', '.join(absent))),
+                 ('file_path_missing', 'error', missing > 0,
+                  lambda i: '{} files without a file_path'.format(missing[i])),
+                 ('no_mets', 'error', count.get('mets') == 0,
+                  lambda i: 'no METS file'),
+                 ('too_many_mets', 'error', count.get('mets') > 1,
+                  lambda i: '{} METS files'.format(count.get('mets')[i])),
+                 ('no_images', 'error', count.get('image') == 0,
+                  lambda i: 'no image file'),
+                 ('msft_count_mismatch', 'warning', msft.min(axis=1) != msft.max(axis=1),
+                  lambda i: 'mismatch in count of Microsoft transcription files (img/json/txt: {}/{}/{})'.format(*msft[i]))]
+        violations = []
+        for rule, severity, mask, message in rules:
+            positions = np.flatnonzero(mask)
+            if (len(positions) == 0):
+                continue
+            violations.append(pd.DataFrame({'object_osn':osns[positions], 'rule':rule, 'severity':severity,
+                                            'message':[message(i) for i in positions], '_object':positions}))
+        if (len(violations) > 0):
+            # by object, in inventory order, then by rule
+            violations = pd.concat(violations, ignore_index=True).sort_values('_object', kind='stable')
+        else:
+            violations = pd.DataFrame(columns=['object_osn', 'rule', 'severity', 'message', '_object'])
+
+        # per-object report
+        report = pd.DataFrame({'object_osn':osns, 'files':files})
+        for role in self.ROLES:
+            report[role] = count.get(role)
+        report['missing_file_path'] = missing
+        errors = np.bincount(violations.loc[violations['severity'] == 'error', '_object'].to_numpy(dtype='int64'),
+                             minlength=len(osns))
+        warnings = np.bincount(violations.loc[violations['severity'] == 'warning', '_object'].to_numpy(dtype='int64'),
+                               minlength=len(osns))
+        report['errors'] = errors
+        report['warnings'] = warnings
+        report['valid'] = (errors == 0)
+        messages = violations.groupby('_object')['message'].agg('; '.join)
+        report['violations'] = messages.reindex(range(len(osns)), fill_value='').to_numpy()
+
+        self._report = report
+        self._violations = violations.drop(columns='_object').reset_index(drop=True)
+        self._initd = True
+        return True
+
+    def get_report(self):
+        """
+        Get the per-object report: object_osn, files, the number of files of each role
+        (mets, image, msft_img, msft_json, msft_txt, ocr_txt), missing_file_path, errors,
+        warnings, valid (no errors) and violations (their messages).
+
+        Return
+        ------
+        DataFrame
+        """
+        return self._report
+
+    def get_violations(self):
+        """
+        Get the violations, one row per object and rule: object_osn, rule, severity and message.
+
+        Return
+        ------
+        DataFrame
+        """
+        return self._violations
+
+    def get_invalid_objects(self):
+        """
+        Get the owner-supplied names of the objects with errors.
+
+        Return
+        ------
+        list
+        """
+        if (self._report.empty == True):
+            return []
+        return list(self._report.loc[self._report['valid'] == False, 'object_osn'])
+
+    def get_unassigned_rows(self):
+        """
+        Get the labels of the inventory rows without an object_osn. They belong to no
+        object, so they are in neither the report nor the violations.
+
+        Return
+        ------
+        list
+        """
+        return list(self._unassigned)
+
+    def write_report(self, filename):
+        """
+        Write the per-object report to a file.
+
+        Parameter
+        ---------
+        filename : str
+            Path of the file to write; Parquet if it ends in .parquet or .pq, otherwise CSV
+
+        Return
+        ------
+        bool
+        """
+        # filename cannot be blank or consist of spaces
+        if not (filename and filename.strip()):
+            return False
+        if (self._report.empty == True):
+            return False
+        return columnar.write_table(self._report, filename)
+
+    def initd(self):
+        """
+        Get the initialization status of the instance.
+
+        Return
+        ------
+        bool
+        """
+        return self._initd
+
 class SAEFDatasetMetadata():
     """
     Class containing Dataverse installation configuration information 
@@ -1382,12 +2039,18 @@ class SAEFDataset():
         Upload tabular relationship files, if any, using the API. Use with caution.
     direct_upload_relationships : api
         Upload the dataset's relationship files, if any, using direct upload method.
+    get_upload_results : void
+        Get the per-file results of the most recent direct upload.
+    set_journal : SAEFJournal
+        Record ingest progress in a journal, so that a re-run skips completed work.
+    set_lock_watcher : DatasetLockWatcher, float
+        Wait for dataset locks with a shared background poller.
     upload_saef_metadata : dict
         Upload or update the dataset's SAEF custom metadata block.
     publish_dataset : api, pid
         TO DO: Publish the dataverse dataset. Note: see also scripts/publish_saef_inventory.ipynb
-    log_api_message : str, str, bool, str
-        Write an API response string to a log file.
+    log_api_message : str, str, str, str, **fields
+        Write an API event to the audit log.
     """
 
     def __init__(self):
@@ -1407,42 +2070,49 @@ class SAEFDataset():
         self._object_osn = None
         # api logfile
         self._api_logfile = None
+        # per-file results of the most recent direct upload
+        self._upload_results = []
+        # ingest journal (SAEFJournal), if any
+        self._journal = None
+        # shared dataset lock watcher (dvlocks.DatasetLockWatcher), if any
+        self._lock_watcher = None
+        # seconds to wait for a dataset lock to clear
+        self._lock_timeout = 3600
         
         # instance is/not initialized
         self._initd = False
 
-    def __get_lock_status(self, api):
+    def __wait_for_unlock(self, api, lock_types=dvlocks.TRANSIENT_LOCKS, client=None):
         """
-        Private: Check the dataset lock status on tabular file ingest
-        Prevents failure of successive tabular file uploads via API
+        Private: Wait until the dataset is not locked, e.g. by tabular file ingest.
+        Prevents failure of successive uploads, edits and publication via API
         See: https://github.com/IQSS/dataverse-uploader/blob/master/dataverse.py#L92-L94
+        Uses the shared lock watcher, if any, otherwise polls with backoff in this thread.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         api : pyDataverse API
+        lock_types : list, optional
+            Lock types to wait for (default: dvlocks.TRANSIENT_LOCKS).
+        client : DataverseClient, optional
 
         Return
         ------
         bool
+            False if the dataset is still locked after the lock timeout.
         """
-        # get dataverse server
-        dataverse_installation_url = self._metadata.get('dataverse').get('dataverse_installation_url')
-
-        # create the query string
-        query_str = dataverse_installation_url + '/api/datasets/' + str(self._dataset_dbid) + '/locks/'
-        
-        # import requests library
-        resp_ = requests.get(query_str, auth = (api.api_token, ""))
-        
-        # request lock status
-        locks = resp_.json()['data']
-        
-        # handle dataset locks
-        if bool(locks):
-            return True
-        
-        # otherwise, return false
-        return False     
+        # the database id avoids a persistent id lookup on every poll
+        dataset_id = self._dataset_dbid if (self._dataset_dbid != None) else self._dataset_pid
+        with metrics.span('lock_wait', object=self._object_osn):
+            if (self._lock_watcher != None):
+                unlocked = self._lock_watcher.wait(dataset_id, lock_types=lock_types, timeout=self._lock_timeout)
+            else:
+                unlocked = dvlocks.wait_for_unlock(api.base_url, api.api_token, dataset_id, lock_types=lock_types,
+                                                   timeout=self._lock_timeout, client=client)
+        if (unlocked == False):
+            msg = '{} - {} still locked after {} seconds'.format(self._object_osn, self._dataset_pid, self._lock_timeout)
+            self.log_api_message('SAEF::wait_for_unlock', 'api.locks', 'Timeout', msg)
+        return unlocked
 
     def initialize(self, saef_digital_object, saef_project_config):   
         """
@@ -1491,9 +2161,9 @@ class SAEFDataset():
         
         # set values on the saef metadata dictionary
         md = {}
-        md['pds_filename'] = directory + '/' + object_osn + '_' + pds_file
-        md['msft_filename'] = directory + '/' + object_osn + '_' + msft_file
-        md['ocr_filename'] = directory + '/' + object_osn + '_' + ocr_file
+        md['pds_filename'] = os.path.join(directory, '{}_{}'.format(object_osn, pds_file))
+        md['msft_filename'] = os.path.join(directory, '{}_{}'.format(object_osn, msft_file))
+        md['ocr_filename'] = os.path.join(directory, '{}_{}'.format(object_osn, ocr_file))
         md['title'] = object_osn
         md['author_name'] = options.get('dataset').get('dataset_author')
         md['author_affiliation'] = options.get('dataset').get('dataset_author_affiliation')
@@ -1527,13 +2197,15 @@ class SAEFDataset():
         self._initd = True
         return True
     
-    def create(self, api):
+    def create(self, api, client=None):
         """
         Create the Dataverse dataset.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         api : pyDataverse API
+        client : DataverseClient, optional
+            Pooled HTTP client; if None, a new connection is used.
 
         Return
         ------
@@ -1543,6 +2215,17 @@ class SAEFDataset():
         if (self._initd == False):
             return False
         
+        # if an earlier run created the dataset, reuse it
+        if (self._journal != None):
+            entry = self._journal.get_object(self._object_osn)
+            if (entry.get('dataset_pid') != None):
+                self._dataset_pid = entry.get('dataset_pid')
+                self._metadata['dataset']['doi'] = self._dataset_pid
+                self._dataset_dbid = entry.get('dataset_dbid')
+                msg = '{} - dataset_pid={} (journal)'.format(self._object_osn, self._dataset_pid)
+                self.log_api_message('SAEF::create_dataset', 'journal.get_object', 'Resumed', msg)
+                return True
+        
         # if the dataset has been initialized, create a pydataverse dataset model
         #
         # note: as of 2022/08/09, pydataverse does not support custom metadata,
@@ -1573,8 +2256,8 @@ class SAEFDataset():
         # prepare to create the dataset via the dataverse api
         #
         
-        # import requests library
-        import requests
+        # get the pooled client, if any, otherwise the requests library
+        http = dvclient.api_http(client)
         # get the base url
         base_url = api.base_url
         # get the api token
@@ -1586,13 +2269,17 @@ class SAEFDataset():
         # create the request url
         request_url = '{}/api/dataverses/{}/datasets'.format(base_url, dataverse_url)
         # call the requests library using the request url
-        response = requests.post(request_url, headers=headers, data=ds.json())
+        # note: a POST is not idempotent; the retry policy does not resend it after a
+        # read timeout or a server error other than 503, which could create a duplicate dataset
+        with metrics.span('create', object=self._object_osn):
+            response = http.post(request_url, headers=headers, data=ds.json())
         # get the status and message from the response
         status = int(response.status_code)
         message = response.json().get('message')
         # log the event
         msg = '{} = {}'.format(self._object_osn, message)
-        self.log_api_message('SAEF::create_dataset', 'api.create_dataset', status, msg)
+        self.log_api_message('SAEF::create_dataset', 'api.create_dataset', status, msg,
+                             latency=response.elapsed.total_seconds())
         
         # handle responses
         if (not ((status >= 200) and
@@ -1606,6 +2293,9 @@ class SAEFDataset():
         self._dataset_dbid = response.json().get('data').get('id')
         msg = '{} - dataset_pid={}'.format(self._object_osn, self._dataset_pid)
         self.log_api_message('SAEF::create_dataset', 'api.create_dataset', status, msg)
+        # record the dataset before anything is uploaded to it
+        if (self._journal != None):
+            self._journal.record_dataset(self._object_osn, self._dataset_pid, self._dataset_dbid)
         
         return True
             
@@ -1644,9 +2334,6 @@ class SAEFDataset():
         saefdo = self._saef_digital_object
         inventory = saefdo.get_files()
         
-        # import time library to support waits
-        import time
-        
         # iterate through the inventory
         for row in inventory.iterrows():         
             # prepare the datafile metadata
@@ -1676,6 +2363,10 @@ class SAEFDataset():
             datafile.set({'pid': pid, 'filename': filepath, 'restrict':restrict,
                           'description':description, 'categories':categories})
             
+            # wait for the ingest of the previous datafile, if any, to finish
+            if (self.__wait_for_unlock(api) == False):
+                return False
+            
             # upload the datafile via the api
             response = api.upload_datafile(pid, filepath, datafile.json(), is_pid=True)
             status = int(response.status_code)
@@ -1685,26 +2376,33 @@ class SAEFDataset():
                 print('SAEFDataset::upload_datafiles: Error - failed to upload datafile {}. {}'.format(filepath, msg))
                 # log the event
                 message = '{} - filename: {} - {}'.format(self._object_osn, filepath, msg)
-                self.log_api_message('SAEF::upload_datafiles', 'api.upload_datafile: {}'.format(filepath), status, message)
+                self.log_api_message('SAEF::upload_datafiles', 'api.upload_datafile: {}'.format(filepath), status, message,
+                                     latency=response.elapsed.total_seconds())
             else:
                 # log the successful event
                 msg = '{} - {}'.format(self._object_osn, filepath)
-                self.log_api_message('SAEF::upload_datafiles', 'api.upload_datafile', status, msg)
-                        
-            # sleep 5 seconds to all for reindexing
-            time.sleep(5)
+                self.log_api_message('SAEF::upload_datafiles', 'api.upload_datafile', status, msg,
+                                     latency=response.elapsed.total_seconds(), size=os.path.getsize(filepath))
                 
         # return 
         return True 
     
-    def direct_upload_datafiles(self, api):
+    def direct_upload_datafiles(self, api, max_workers=4, checksum_algorithm='MD5', client=None):
         """
         Upload dataset's datafiles using a direct upload approach.
         This method does not require reindexing and has better performance characteristics.
+        Files are uploaded concurrently and finalized with a single addFiles call.
+        Per-file results are available from get_upload_results.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         api : pyDataverse API
+        max_workers : int, optional
+            Maximum number of files uploaded at the same time (default: 4).
+        checksum_algorithm : str, optional
+            MD5, SHA-1, SHA-256 or SHA-512; should match the installation's fixity algorithm (default: MD5).
+        client : DataverseClient, optional
+            Pooled HTTP client shared by the upload threads.
 
         Return
         ------
@@ -1722,11 +2420,6 @@ class SAEFDataset():
         saefdo = self._saef_digital_object
         inventory = saefdo.get_files()
         
-        # set direct upload function variables
-        dataverse_url = api.base_url
-        key = api.api_token
-        dataset_pid = self._dataset_pid
-        
         # get mets file metadata
         mets = saefdo.get_mets_file()
         index = list(mets.index)[0]
@@ -1746,45 +2439,233 @@ class SAEFDataset():
         for tag in tags:
             categories.append(tag)
             
-        # per file json_data array
-        json_data = []
+        # list of files to upload
+        files = []
         
         # iterate through the inventory
         for row in inventory.iterrows():
-            filepath = None
-            file_format = row[1].get('file_format')
             filepath = row[1].get('file_path')
             mime_type = mimetypes.guess_type(filepath, strict=True)[0]
             components = os.path.split(filepath)
-            path = components[0]
-            filename = components[1]
+            files.append({'path':components[0], 'filename':components[1], 'mime_type':mime_type})
+            
+        # upload the datafiles concurrently and finalize them
+        return self.__direct_upload_files(api, journal.SAEFJournal.DATAFILE, files, description, categories,
+                                          'SAEF::direct_upload_datafiles', 'api.direct_upload_datafiles',
+                                          max_workers, checksum_algorithm, client)
+    
+    def __direct_upload_files(self, api, kind, files, description, categories, function, api_operation,
+                              max_workers, checksum_algorithm, client):
+        """
+        Private: Upload files concurrently with ddu.direct_upload_files and finalize them.
+        If a journal is set, files uploaded by an earlier run are not uploaded again,
+        and nothing is done if the files of this kind have already been finalized.
+
+        Parameters
+        ----------
+        api : pyDataverse API
+        kind : str
+            SAEFJournal.DATAFILE or SAEFJournal.RELATIONSHIP
+        files : list
+            Files to upload (path, filename, mime_type).
+        description : str or list
+            Description shared by all files, or list of descriptions (one per file).
+        categories : list
+            Categories shared by all files, or list of lists of categories (one per file).
+        function : str
+        api_operation : str
+        max_workers : int
+        checksum_algorithm : str
+        client : DataverseClient
+
+        Return
+        ------
+        bool
+        """
+        # per file descriptions and categories must match the files
+        per_file_description = isinstance(description, list)
+        per_file_categories = (isinstance(categories, list) and
+                               (len(categories) > 0) and
+                               all(isinstance(category, list) for category in categories))
+        if ((per_file_description and (len(description) != len(files))) or
+            (per_file_categories and (len(categories) != len(files)))):
+            print('{}: Error - descriptions or categories do not match the {} files for: {}'.format(function, len(files),
+                                                                                                 self._object_osn))
+            return False
+        
+        dataverse_url = api.base_url
+        key = api.api_token
+        dataset_pid = self._dataset_pid
+        
+        # files uploaded by an earlier run, keyed by file path, and files already finalized
+        uploaded = {}
+        finalized = set()
+        on_result = None
+        if (self._journal != None):
+            column = 'datafiles_finalized' if (kind == journal.SAEFJournal.DATAFILE) else 'relationships_finalized'
+            if (self._journal.get_object(self._object_osn).get(column) == True):
+                msg = '{} - {} files already finalized (journal)'.format(self._object_osn, kind)
+                self.log_api_message(function, 'journal.get_object', 'Skipped', msg)
+                return True
+            uploaded = self._journal.get_uploads(self._object_osn, kind)
+            finalized = self._journal.get_finalized(self._object_osn, kind)
+            # record each upload as soon as it ends
+            def on_result(result):
+                if (result.get('status') == True):
+                    self._journal.record_upload(self._object_osn, result.get('file_path'), kind, result.get('json_data'))
+        
+        # only upload the files missing from the journal
+        pending = []
+        for file in files:
+            file_path = file.get('path') + '/' + file.get('filename') if file.get('path') else file.get('filename')
+            if file_path in finalized:
+                continue
+            if file_path not in uploaded:
+                pending.append(file)
+        with metrics.span('upload_' + kind, object=self._object_osn, files=len(pending)):
+            new_results = ddu.direct_upload_files(dataverse_url, dataset_pid, key, pending, max_workers=max_workers, retries=10,
+                                                  checksum_algorithm=checksum_algorithm, client=client, on_result=on_result)
+        new_results = iter(new_results)
+        
+        # per file results, in the order of files
+        results = []
+        descriptions = []
+        file_categories = []
+        for i, file in enumerate(files):
+            file_path = file.get('path') + '/' + file.get('filename') if file.get('path') else file.get('filename')
+            if file_path in finalized:
+                continue
+            descriptions.append(description[i] if per_file_description else description)
+            file_categories.append(categories[i] if per_file_categories else categories)
+            if file_path in uploaded:
+                results.append({'file_path':file_path, 'status':True, 'json_data':uploaded.get(file_path), 'error':None})
+            else:
+                results.append(next(new_results))
+        
+        # per file json_data array
+        # every file was finalized by earlier runs
+        if (len(results) == 0):
+            if (self._journal != None):
+                self._journal.record_finalized(self._object_osn, kind)
+            return True
+        json_data = self.__collect_upload_results(function, api_operation, results, descriptions, file_categories)
+
+        # nothing to finalize if every upload failed
+        if (len(json_data) == 0):
+            return False
             
-            # upload the datafile
-            data = {}
-            data = ddu.direct_upload(dataverse_url, dataset_pid, key, filename, path, mime_type, retries=10)
+        # finalize the direct upload once earlier tabular ingests are done
+        if (self.__wait_for_unlock(api, client=client) == False):
+            return False
+        status, code, message = ddu.finalize_direct_upload(dataverse_url, dataset_pid, json_data, key, client=client)
+        # log the event
+        if (status == True):
+            msg = '{} - {} {} files finalized'.format(self._object_osn, len(json_data), kind)
+        else:
+            msg = '{} - {}'.format(self._object_osn, message)
+        self.log_api_message(function, 'ddu.finalize_direct_upload', code, msg)
+        if (status == True) and (self._journal != None):
+            complete = (len(json_data) == len(results))
+            self._journal.record_finalized(self._object_osn, kind, complete=complete)
+        return status
+    
+    def __collect_upload_results(self, function, api_operation, results, description, categories):
+        """
+        Private: Log the per-file results of a concurrent direct upload and 
+        gather the json_data entries of the successful uploads.
 
+        Parameters
+        ----------
+        function : str
+        api_operation : str
+        results : list
+            Per-file results returned by ddu.direct_upload_files.
+        description : str or list
+            File description, or list of descriptions (one per result).
+        categories : list
+            File categories, or list of categories (one per result).
+
+        Return
+        ------
+        list
+        """
+        # keep the results for get_upload_results
+        self._upload_results = results
+        # per file json_data array
+        json_data = []
+        failed = 0
+        for i, result in enumerate(results):
+            filepath = result.get('file_path')
+            data = result.get('json_data')
             # if direct file upload failed
-            if (data == None):
-                msg = 'Upload failed: {}'.format('direct_upload failed')
+            if (result.get('status') == False):
+                failed = failed + 1
+                msg = 'Upload failed: {}'.format(result.get('error'))
                 # log the event
                 message = '{} - filename: {} - {}'.format(self._object_osn, filepath, msg)
-                self.log_api_message('SAEF::direct_upload_datafiles', 'api.upload_datafile: {}'.format(filepath), 
-                                     'Direct upload failed', message)
+                self.log_api_message(function, '{}: {}'.format(api_operation, filepath), 'Direct upload failed', message,
+                                     latency=result.get('seconds'))
             else:
                 # log the successful event
-                msg = '{} - {}'.format(self._object_osn, filepath)
-                self.log_api_message('SAEF::direct_upload_datafiles', 'api.direct_upload_datafiles', data, msg)
-                
-                # capture the file metadata for later user
-                data['description'] = description
-                data['categories'] = categories
+                msg = '{} - {} ({})'.format(self._object_osn, filepath, data.get('storageIdentifier'))
+                self.log_api_message(function, api_operation, 'Uploaded', msg, latency=result.get('seconds'),
+                                     size=data.get('fileSize'))
+                # capture the file metadata for later use
+                if isinstance(description, list):
+                    data['description'] = description[i]
+                    data['categories'] = categories[i]
+                else:
+                    data['description'] = description
+                    data['categories'] = categories
                 json_data.append(data)
-            
-        # finalize the direct upload
-        status = ddu.finalize_direct_upload(dataverse_url, dataset_pid, json_data, key)
-        return status
+        
+        # report partial failures
+        if (failed > 0):
+            print('{}: Warning - {} of {} files failed to upload for: {}'.format(function, failed, len(results), self._object_osn))
+        return json_data
+    
+    def get_upload_results(self):
+        """
+        Get the per-file results of the most recent direct upload.
+
+        Return
+        ------
+        list of dict
+            file_path, status, json_data, error
+        """
+        return self._upload_results
     
-    def api_upload_relationships(self, api):
+    def set_journal(self, saef_journal):
+        """
+        Record ingest progress in a journal, so that a re-run skips completed work:
+        an existing dataset is reused, uploaded files are not uploaded again, and
+        finalized files and applied metadata are skipped.
+
+        Parameter
+        ---------
+        saef_journal : SAEFJournal
+            Open journal, or None to stop journaling.
+        """
+        self._journal = saef_journal
+    
+    def set_lock_watcher(self, lock_watcher, timeout=None):
+        """
+        Wait for dataset locks with a shared background poller, so that uploads
+        and edits proceed as soon as a lock clears. Without a watcher, each wait
+        polls the locks API in the calling thread.
+
+        Parameters
+        ----------
+        lock_watcher : dvlocks.DatasetLockWatcher
+            Shared watcher, or None to poll in the calling thread.
+        timeout : float, optional
+            Seconds to wait for a lock to clear (default: unchanged, initially 3600).
+        """
+        self._lock_watcher = lock_watcher
+        if (timeout != None):
+            self._lock_timeout = timeout
+    
+    def api_upload_relationships(self, api, client=None):
         """
         Upload tabular relationship files, if any, using the API.
         Note: This method has negative impact on Dataverse installation performance.
@@ -1794,6 +2675,8 @@ class SAEFDataset():
         ----------
         api
             pyDataverse API instance
+        client : DataverseClient, optional
+            Pooled HTTP client used to poll the dataset locks.
         
         Return
         ------
@@ -1859,14 +2742,11 @@ class SAEFDataset():
                           'categories':categories})
             datafiles.append(datafile)
             
-        # import time (for time.sleep())
-        import time
-        
         # upload the datafile via the api
         for datafile in datafiles:
             # wait for any dataset locks to clear
-            while (self.__get_lock_status(api) == True):
-                time.sleep(2)
+            if (self.__wait_for_unlock(api, client=client) == False):
+                return False
             
             # get datafile metadata
             md = datafile.get()
@@ -1880,22 +2760,30 @@ class SAEFDataset():
                 print('SAEFDataset::upload_relationships: Error - failed to upload datafile {}. {}'.format(filename, msg))
                 # log the event
                 message = '{} - filename: {} - {}'.format(self._object_osn, filename, msg)
-                self.log_api_message('SAEF::upload_relationships', 'api.upload_datafile: {}'.format(filename), status, message)                
+                self.log_api_message('SAEF::upload_relationships', 'api.upload_datafile: {}'.format(filename), status, message,
+                                     latency=response.elapsed.total_seconds())
             else:
                 # log the event
                 msg = '{} - {}'.format(self._object_osn, filename)
-                self.log_api_message('SAEF::upload_relationships', 'api.upload_datafile', status, msg)
+                self.log_api_message('SAEF::upload_relationships', 'api.upload_datafile', status, msg,
+                                     latency=response.elapsed.total_seconds(), size=os.path.getsize(filename))
 
         # return
         return True
 
-    def direct_upload_relationships(self, api):
+    def direct_upload_relationships(self, api, max_workers=3, checksum_algorithm='MD5', client=None):
         """
         Upload the dataset's relationship files, if any using direct upload method.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         api : pyDataverse API
+        max_workers : int, optional
+            Maximum number of files uploaded at the same time (default: 3).
+        checksum_algorithm : str, optional
+            MD5, SHA-1, SHA-256 or SHA-512; should match the installation's fixity algorithm (default: MD5).
+        client : DataverseClient, optional
+            Pooled HTTP client shared by the upload threads.
 
         Return
         ------
@@ -1913,11 +2801,6 @@ class SAEFDataset():
         saefdo = self._saef_digital_object
         uid = self._object_osn
         
-        # set direct upload function variables
-        dataverse_url = api.base_url
-        api_key = api.api_token
-        dataset_pid = self._dataset_pid
-        
         # dictionary of relationships data
         reldata = {}
         reldata['pds'] = {'filename':self._metadata.get('digital_object').get('pds_filename'), 'tag':'PDS'}
@@ -1927,9 +2810,6 @@ class SAEFDataset():
         # dictionary of relationships files
         relationships = {}
         
-        # per file json_data array
-        json_data = []
-        
         # write and record the relationships, if any
         for key in reldata.keys():
             tag = reldata.get(key).get('tag')
@@ -1955,58 +2835,47 @@ class SAEFDataset():
             return False        
         
         # upload each relationship file and its metadata
+        files = []
+        descriptions = []
+        categories = []
         for key in relationships.keys():
             filepath = relationships.get(key).get('filename')
-            mime_type = 'text/csv'
             components = os.path.split(filepath)
-            path = components[0]
-            filename = components[1]
-            
-            # upload the datafile
-            data = {}
-            data = ddu.direct_upload(dataverse_url, dataset_pid, api_key, filename, path, mime_type, retries=10)
-            data['description'] = relationships[key]['description']
-            data['categories'] = relationships[key]['categories']
-            
-            # populate the json_data array
-            json_data.append(data)
-            
-            # manage status
-            if (data == None):
-                msg = 'Upload failed: {}'.format('direct_upload failed')
-                print('SAEFDataset::direct_upload_relationships: Error - failed to upload datafile: {}. {}'.format(filepath, msg))
-                # log the event
-                message = '{} - filename: {} - {}'.format(self._object_osn, filepath, msg)
-                self.log_api_message('SAEF::direct_upload_relationships', 'api.direct_upload_relationships: {}'.format(filepath), status, message)
-            else:
-                # log the successful event
-                msg = '{} - {}'.format(self._object_osn, filepath)
-                self.log_api_message('SAEF::direct_upload_relationships', 'api.direct_upload_relationships', data, msg)
-            
-        # finalize the direct upload
-        status = ddu.finalize_direct_upload(dataverse_url, dataset_pid, json_data, api_key)
-        return status
-
-        # return
-        return True        
+            files.append({'path':components[0], 'filename':components[1], 'mime_type':'text/csv'})
+            descriptions.append(relationships[key]['description'])
+            categories.append(relationships[key]['categories'])
+        
+        # upload the relationship files concurrently and finalize them
+        return self.__direct_upload_files(api, journal.SAEFJournal.RELATIONSHIP, files, descriptions, categories,
+                                          'SAEF::direct_upload_relationships', 'api.direct_upload_relationships',
+                                          max_workers, checksum_algorithm, client)
         
-    def upload_saef_metadata(self, api, metadata):
+    def upload_saef_metadata(self, api, metadata, client=None):
         """
         Upload or update the dataset's SAEF custom metadata block.
 
-        Parameter
-        ---------
+        Parameters
+        ----------
         api : pyDataverse api
         metadata : dict
             SAEF custom metadata values.
             Also: self._metadata[dataset][customSAEF]
+        client : DataverseClient, optional
+            Pooled HTTP client; if None, a new connection is used.
         
         Return
         ------
         bool
         """
-       # set up the request
-        import requests
+        # skip if an earlier run applied the metadata
+        if ((self._journal != None) and
+            (self._journal.get_object(self._object_osn).get('metadata_applied') == True)):
+            msg = '{} - {} (journal)'.format(self._object_osn, self._dataset_pid)
+            self.log_api_message('SAEF::upload_saef_metadata', 'journal.get_object', 'Skipped', msg)
+            return True
+        
+        # get the pooled client, if any, otherwise the requests library
+        http = dvclient.api_http(client)
         # get the base url
         base_url = api.base_url
         # get the api token
@@ -2017,40 +2886,52 @@ class SAEFDataset():
         # create the request url
         request_url = '{}/api/datasets/:persistentId/editMetadata/?persistentId={}&replace=true'.format(base_url, self._dataset_pid)
 
+        # edits fail while the dataset is locked
+        if (self.__wait_for_unlock(api, client=client) == False):
+            return False
+
         # call the requests library using the request url
-        response = requests.put(request_url, headers=headers, data=metadata)
+        with metrics.span('metadata', object=self._object_osn):
+            response = http.put(request_url, headers=headers, data=metadata)
         status = int(response.status_code)
         if (not ((status >= 200) and
             (status < 300))):
             msg = 'Metadata update failed: {}'.format(response.status_code)
             print('SAEFDataset::upload_saef_metadata: Error - failed to update custom metadata {}.'.format(msg))
             # log the event
-            self.log_api_message('SAEF::upload_saef_metadata', 'api.editMetadata: {}'.format(self._dataset_pid), status, msg)
+            self.log_api_message('SAEF::upload_saef_metadata', 'api.editMetadata: {}'.format(self._dataset_pid), status, msg,
+                                 latency=response.elapsed.total_seconds())
             return False                
         else:
             # log the event
             msg = '{} - {}'.format(self._object_osn, self._dataset_pid)
-            self.log_api_message('SAEF::upload_saef_metadata', 'api.editMetadata', status, msg)
+            self.log_api_message('SAEF::upload_saef_metadata', 'api.editMetadata', status, msg,
+                                 latency=response.elapsed.total_seconds())
+            if (self._journal != None):
+                self._journal.record_metadata(self._object_osn)
             return True
     
-    def log_api_message(self, function, api_operation, status, message):
+    def log_api_message(self, function, api_operation, status, message, latency=None, size=None):
         """
-        Write an API response string to a log file.
+        Write an API event to the audit log (see apilog).
+        The event is queued; the caller does not wait for the write.
 
         Parameters
         ----------
         function : str
         api_operation : str
-        status : str
+        status : int or str
+            HTTP status code, or a short text (e.g. Skipped, Timeout).
         message : str
-
+        latency : float, optional
+            Seconds taken by the operation.
+        size : int, optional
+            Bytes sent.
         """
-        import datetime
-        now = datetime.datetime.now()
         # if api logging is available, log event
-        if (self._api_logging == True): 
-            string = '{}\t{}\t{}\t{}'.format(function, api_operation, status, message)
-            logging.info(string)
+        if (self._api_logging == True):
+            apilog.log(message, object_osn=self._object_osn, pid=self._dataset_pid, function=function,
+                       operation=api_operation, status=status, latency=latency, bytes=size)
         return
 
     def get_dataset_pid(self):
@@ -0,0 +1,155 @@
+"""
+Synthetic SAEF inventories.
+
+Generate realistic file inventories, with the columns of a SAEF project inventory,
+for benchmarking the inventory and object-building layer at scale (see benchmark.py).
+Each digital object has a METS file and one image per page; a configurable share of
+the objects also has Microsoft transcription files (PNG, JSON and TXT per page) and
+OCR text files (one per page). Rows are generated with vectorized operations, and
+written in chunks of objects, so inventories of millions of rows take seconds.
+
+Usage: python synthetic.py <inventory.csv> [--objects N] [--pages N] [--msft-ratio R] [--ocr-ratio R]
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+# inventory columns, in the order of the project inventories
+COLUMNS = ['mms_id', 'object_delivery_urn', 'object_osn', 'object_oasis_urn', 'file_urn', 'file_format',
+           'file_osn', 'object_title', 'object_access', 'filename', 'file_path', 'object_tags']
+
+# file formats and filename suffixes
+METS_FORMAT = 'Extensible Markup Language'
+IMAGE_FORMATS = {'JPEG':'.jpg', 'JPEG 2000 JP2':'.jp2'}
+MSFT_FORMATS = {'MSFT-PNG':'.handprint-microsoft.png', 'MSFT-JSON':'.handprint-microsoft.json',
+                'MSFT-TXT':'.handprint-microsoft.txt'}
+OCR_FORMAT = 'Plain text'
+
+def generate_objects(objects, pages=20, min_pages=None, max_pages=None, msft_ratio=0.5, ocr_ratio=0.5,
+                     image_format='JPEG 2000 JP2', prefix='syn', start=0, seed=None):
+    """
+    Generate the inventory rows of a number of digital objects.
+
+    Parameters
+    ----------
+    objects : int
+        Number of digital objects.
+    pages : int, optional
+        Average number of pages (images) per object (default: 20).
+    min_pages, max_pages : int, optional
+        Page counts are drawn uniformly from [min_pages, max_pages]
+        (default: from 1 to 2 * pages - 1).
+    msft_ratio : float, optional
+        Share of the objects with Microsoft transcription files (default: 0.5).
+    ocr_ratio : float, optional
+        Share of the objects with OCR text files (default: 0.5).
+    image_format : str, optional
+        JPEG or JPEG 2000 JP2 (default: JPEG 2000 JP2).
+    prefix : str, optional
+        Prefix of the object owner-supplied names (default: syn).
+    start : int, optional
+        Number of the first object, to generate an inventory in chunks (default: 0).
+    seed : int, optional
+        Random seed.
+
+    Return
+    ------
+    DataFrame
+        One row per file; the files of an object are contiguous: METS, images, MSFT, OCR.
+    """
+    rng = np.random.default_rng(None if seed is None else [seed, start])
+    low = min_pages if min_pages else 1
+    high = max_pages if max_pages else max(low, 2 * pages - 1)
+    page_counts = rng.integers(low, high + 1, size=objects)
+    has_msft = rng.random(objects) < msft_ratio
+    has_ocr = rng.random(objects) < ocr_ratio
+
+    numbers = np.arange(start, start + objects)
+    osn = pd.Series(numbers).map(lambda n: '{}{:08d}'.format(prefix, n)).to_numpy()
+    # a few distinct titles and tags, as in a real collection
+    titles = np.array(['Synthetic digital object {}. Houghton Library, Harvard University, Cambridge, Mass.'.format(n % 97)
+                       for n in numbers], dtype=object)
+    tags = np.array(['Created:{};City:Richmond;State:Virginia'.format(1800 + n % 100) for n in numbers], dtype=object)
+
+    def expand(mask, per_page_formats, suffixes, urn):
+        # one row per page and format of the objects selected by mask
+        counts = np.where(mask, page_counts, 0)
+        index = np.repeat(np.arange(objects), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        page = np.arange(len(index)) - first + 1
+        file_osn = pd.Series(osn[index]) + '_' + pd.Series(page).astype(str).str.zfill(4)
+        frames = []
+        for rank, (file_format, suffix) in enumerate(zip(per_page_formats, suffixes)):
+            frame = pd.DataFrame({'_object':index, '_page':page, '_rank':rank, 'file_format':file_format,
+                                  'file_osn':file_osn, 'filename':file_osn + suffix})
+            if urn:
+                frame['file_urn'] = 'URN-3:FHCL.HOUGH:' + pd.Series(numbers[index] * 10000 + page).astype(str)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    mets = pd.DataFrame({'_object':np.arange(objects), '_page':0, '_rank':0, 'file_format':METS_FORMAT,
+                         'file_osn':np.nan, 'filename':pd.Series(osn) + '_mets.xml'})
+    images = expand(np.ones(objects, dtype=bool), [image_format], [IMAGE_FORMATS.get(image_format)], True)
+    msft = expand(has_msft, list(MSFT_FORMATS.keys()), list(MSFT_FORMATS.values()), False)
+    ocr = expand(has_ocr, [OCR_FORMAT], ['.txt'], False)
+    # group the files of each object: mets, then images, msft and ocr files page by page
+    parts = []
+    for kind, frame in enumerate([mets, images, msft, ocr]):
+        parts.append(frame.assign(_kind=kind))
+    df = pd.concat(parts, ignore_index=True)
+    df = df.sort_values(['_object', '_kind', '_page', '_rank'], kind='stable').reset_index(drop=True)
+
+    index = df['_object'].to_numpy()
+    df['object_osn'] = osn[index]
+    df['mms_id'] = pd.Series(990000000000203941 + numbers[index] * 10000).astype(str)
+    df['object_delivery_urn'] = 'URN-3:FHCL.HOUGH:' + pd.Series(numbers[index]).astype(str)
+    df['object_oasis_urn'] = np.nan
+    df['object_title'] = titles[index]
+    df['object_access'] = 'P'
+    df['object_tags'] = tags[index]
+    # msft files live in a shared directory, as in the test data
+    directory = np.where(df['file_format'].isin(MSFT_FORMATS.keys()), './data/msft', './data/' + df['object_osn'])
+    df['file_path'] = np.where(df['file_format'] == METS_FORMAT, './data/' + df['filename'],
+                               directory + '/' + df['filename'])
+    return df.reindex(columns=COLUMNS)
+
+def write_inventory(filename, objects, chunk_objects=10000, **kwargs):
+    """
+    Write a synthetic inventory to a CSV file, generating chunk_objects objects at a time.
+    Other keyword arguments are passed to generate_objects.
+
+    Return
+    ------
+    int
+        Number of rows written.
+    """
+    rows = 0
+    for start in range(0, objects, chunk_objects):
+        df = generate_objects(min(chunk_objects, objects - start), start=start, **kwargs)
+        df.to_csv(filename, mode='w' if start == 0 else 'a', header=(start == 0), index=False)
+        rows = rows + len(df)
+    return rows
+
+def main():
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description='Generate a synthetic SAEF inventory.')
+    parser.add_argument('inventory', help='inventory (CSV) to write')
+    parser.add_argument('--objects', type=int, default=1000, help='number of digital objects')
+    parser.add_argument('--pages', type=int, default=20, help='average number of pages per object')
+    parser.add_argument('--msft-ratio', type=float, default=0.5, help='share of objects with MSFT transcriptions')
+    parser.add_argument('--ocr-ratio', type=float, default=0.5, help='share of objects with OCR text')
+    parser.add_argument('--image-format', default='JPEG 2000 JP2', choices=list(IMAGE_FORMATS.keys()))
+    parser.add_argument('--seed', type=int, default=None, help='random seed')
+    args = parser.parse_args()
+    rows = write_inventory(args.inventory, args.objects, pages=args.pages, msft_ratio=args.msft_ratio,
+                           ocr_ratio=args.ocr_ratio, image_format=args.image_format, seed=args.seed)
+    print('{} rows written to {}'.format(rows, args.inventory))
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
+
+# end file